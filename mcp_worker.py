@@ -0,0 +1,44 @@
+"""
+MCP 工作进程
+config.json 中 mcp.mode 为 worker 时由 server_callbacks 启动：FastMCP 服务器运行在这个独立进程中，
+工具调用经 Unix 套接字转发给 ComfyUI 进程内的 RPC 服务端执行
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+
+# 确保插件目录在 Python 路径中
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+def watch_parent(interval: float = 2.0):
+    """ComfyUI 进程退出后工作进程随之退出"""
+    parent_pid = os.getppid()
+    while True:
+        time.sleep(interval)
+        if os.getppid() != parent_pid:
+            os._exit(0)
+
+def main():
+    from tools.worker_ipc import RpcClient
+    import server_callbacks
+    
+    threading.Thread(target=watch_parent, daemon=True).start()
+    
+    try:
+        client = RpcClient.from_env()
+        mcp = server_callbacks.build_mcp_server(client)
+    except Exception as e:
+        print(f"❌ MCP 工作进程启动失败: {e}")
+        logging.error(f"MCP 工作进程启动失败: {e}")
+        sys.exit(1)
+    
+    # 阻塞运行，直到进程被终止
+    server_callbacks.run_mcp_server(mcp)
+
+if __name__ == "__main__":
+    main()
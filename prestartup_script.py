@@ -120,68 +120,55 @@ try:
             logging.error(f"服务器启动回调执行失败: {e}")
 
     
+    def get_prompt_server():
+        """获取进程内的 PromptServer 实例（尚未创建时返回 None）"""
+        server_module = sys.modules.get("server")
+        prompt_server_class = getattr(server_module, "PromptServer", None)
+        return getattr(prompt_server_class, "instance", None)
+    
+    def is_server_listening():
+        """ComfyUI 在端口开始监听后才会设置 PromptServer.instance.address"""
+        prompt_server = get_prompt_server()
+        return prompt_server is not None and hasattr(prompt_server, "address")
+    
     def check_server_health():
-        """检查服务器健康状态"""
+        """检查服务器健康状态（进程内检查，不再请求自身的 HTTP 接口）"""
         try:
-            # 尝试导入requests，如果不可用则跳过健康检查
-            try:
-                import requests
-            except ImportError:
-                print("⚠️ requests库不可用，跳过健康检查")
+            if not is_server_listening():
+                print("⚠️ 服务器尚未开始监听")
                 return
             
-            response = requests.get(f"http://{server_listen}:{server_port}/system_stats", timeout=5)
-            if response.status_code == 200:
-                stats = response.json()
-                # print("✅ 服务器健康检查通过")
-            else:
-                print(f"⚠️ 服务器响应异常: {response.status_code}")
+            # MCP 服务器启动后由进程内健康检查汇总事件循环延迟和执行进度
+            tools = sys.modules.get("tools")
+            if tools is not None:
+                health = tools.get_health()
+                if health.get("error") or health.get("status") != "ok":
+                    print(f"⚠️ 服务器健康状态异常: {health}")
         except Exception as e:
             print(f"❌ 服务器健康检查失败: {e}")
     
     def wait_for_server_start():
         """等待服务器启动的监控线程"""
-        max_attempts = 60  # 最多等待60秒
+        # 进程内检查开销很小，缩短轮询间隔，总等待时间仍为 120 秒
+        poll_interval = 0.5
+        max_attempts = 240
         attempt = 0
-        callback_executed = False  # 标记回调是否已执行
         
         print(f"📡 开始监控服务器启动状态...")
         print(f"   目标地址: http://{server_listen}:{server_port}")
         
-        while attempt < max_attempts and not callback_executed:
+        while attempt < max_attempts:
             try:
-                # 尝试导入requests
-                try:
-                    import requests
-                except ImportError:
-                    print("⚠️ requests库不可用，使用简单连接检查")
-                    # 使用socket进行简单连接检查
-                    import socket
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(2)
-                    result = sock.connect_ex((server_listen, server_port))
-                    sock.close()
-                    
-                    if result == 0:
-                        # print(f"🚀 检测到服务器已启动 (尝试 {attempt + 1}/{max_attempts})")
-                        on_server_started()
-                        callback_executed = True
-                        break
-                else:
-                    # 使用requests进行HTTP检查
-                    response = requests.get(f"http://{server_listen}:{server_port}/system_stats", timeout=2)
-                    if response.status_code == 200:
-                        # print(f"🚀 检测到服务器已启动 (尝试 {attempt + 1}/{max_attempts})")
-                        on_server_started()
-                        callback_executed = True
-                        break
-                        
+                if is_server_listening():
+                    # print(f"🚀 检测到服务器已启动 (尝试 {attempt + 1}/{max_attempts})")
+                    on_server_started()
+                    break
             except Exception as e:
-                # 静默处理连接错误，避免过多日志输出
+                # 静默处理，避免过多日志输出
                 pass
             
             attempt += 1
-            time.sleep(2)
+            time.sleep(poll_interval)
     
     # 启动监控线程
     monitor_thread = threading.Thread(target=wait_for_server_start, daemon=True)
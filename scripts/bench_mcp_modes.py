@@ -0,0 +1,183 @@
+"""
+MCP 服务器基准测试 - 对比进程内模式（mcp.mode=thread）与工作进程模式（mcp.mode=worker）
+
+并发调用一组工具，记录每个工具的延迟分位数和响应大小；同时轮询 /health，
+记录测试期间 ComfyUI 事件循环的延迟（反映 MCP 流量对服务器和执行线程的影响）
+
+用法:
+    # 分别在两种模式下启动 ComfyUI 后运行
+    python scripts/bench_mcp_modes.py --label thread --output bench_thread.json
+    python scripts/bench_mcp_modes.py --label worker --output bench_worker.json
+    # 对比两次结果
+    python scripts/bench_mcp_modes.py --compare bench_thread.json bench_worker.json
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import urllib.request
+from typing import Dict, Any, List, Optional
+
+DEFAULT_TOOLS = "get_object_info_tool,get_queue_info_tool,get_history_tool,get_system_stats_tool"
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+def fetch_health(base_url: str) -> Optional[Dict[str, Any]]:
+    try:
+        with urllib.request.urlopen(f"{base_url}/health", timeout=5) as response:
+            return json.loads(response.read())
+    except Exception as e:
+        # 卡顿时 /health 返回 503，响应体同样是健康状态
+        body = getattr(e, "read", None)
+        if body is not None:
+            try:
+                return json.loads(body())
+            except ValueError:
+                pass
+        return None
+
+async def sample_loop_lag(base_url: str, interval: float, samples: List[float], stop: asyncio.Event):
+    """测试期间定期读取事件循环延迟"""
+    while not stop.is_set():
+        health = await asyncio.to_thread(fetch_health, base_url)
+        lag = ((health or {}).get("loop") or {}).get("lag_ms")
+        if lag is not None:
+            samples.append(lag)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    from fastmcp import Client
+
+    tool_names = [name.strip() for name in args.tools.split(",") if name.strip()]
+    latencies: Dict[str, List[float]] = {name: [] for name in tool_names}
+    sizes: Dict[str, List[int]] = {name: [] for name in tool_names}
+    errors: Dict[str, int] = {name: 0 for name in tool_names}
+
+    async with Client(f"{args.url}/sse") as client:
+        # 预热：首次调用会触发工具模块的延迟导入
+        for name in tool_names:
+            await client.call_tool(name, {}, raise_on_error=False)
+
+        calls = [name for _ in range(args.iterations) for name in tool_names]
+        position = 0
+
+        async def worker():
+            nonlocal position
+            while position < len(calls):
+                name = calls[position]
+                position += 1
+                start = time.perf_counter()
+                try:
+                    result = await client.call_tool(name, {}, raise_on_error=False)
+                except Exception:
+                    errors[name] += 1
+                    continue
+                latencies[name].append((time.perf_counter() - start) * 1000)
+                if result.is_error:
+                    errors[name] += 1
+                sizes[name].append(sum(len(getattr(item, "text", "") or "") for item in result.content))
+
+        lag_samples: List[float] = []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_loop_lag(args.url, args.health_interval, lag_samples, stop))
+        health_before = await asyncio.to_thread(fetch_health, args.url)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+        health_after = await asyncio.to_thread(fetch_health, args.url)
+
+    tools = {}
+    for name in tool_names:
+        values = latencies[name]
+        tools[name] = {
+            "calls": len(values),
+            "errors": errors[name],
+            "mean_ms": round(statistics.mean(values), 3) if values else None,
+            "p50_ms": round(percentile(values, 0.5), 3) if values else None,
+            "p95_ms": round(percentile(values, 0.95), 3) if values else None,
+            "p99_ms": round(percentile(values, 0.99), 3) if values else None,
+            "mean_chars": round(statistics.mean(sizes[name])) if sizes[name] else None,
+        }
+
+    def stall_count(health):
+        return ((health or {}).get("loop") or {}).get("stall_count")
+
+    return {
+        "label": args.label,
+        "url": args.url,
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "calls_per_second": round(len(calls) / elapsed, 2) if elapsed > 0 else None,
+        "tools": tools,
+        "loop_lag": {
+            "samples": len(lag_samples),
+            "mean_ms": round(statistics.mean(lag_samples), 3) if lag_samples else None,
+            "p95_ms": round(percentile(lag_samples, 0.95), 3) if lag_samples else None,
+            "max_ms": round(max(lag_samples), 3) if lag_samples else None,
+            "new_stalls": (stall_count(health_after) - stall_count(health_before))
+                          if stall_count(health_before) is not None and stall_count(health_after) is not None else None,
+        },
+    }
+
+def compare(paths: List[str]):
+    """并排打印多次结果的延迟和事件循环延迟"""
+    results = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            results.append(json.load(f))
+
+    labels = [result.get("label") or path for result, path in zip(results, paths)]
+    print(f"{'指标':<40}" + "".join(f"{label:>18}" for label in labels))
+
+    def row(title: str, values: List[Any]):
+        print(f"{title:<40}" + "".join(f"{'-' if value is None else value:>18}" for value in values))
+
+    row("calls_per_second", [result.get("calls_per_second") for result in results])
+    row("loop_lag.mean_ms", [result["loop_lag"].get("mean_ms") for result in results])
+    row("loop_lag.p95_ms", [result["loop_lag"].get("p95_ms") for result in results])
+    row("loop_lag.max_ms", [result["loop_lag"].get("max_ms") for result in results])
+    tool_names = list(dict.fromkeys(name for result in results for name in result["tools"]))
+    for name in tool_names:
+        for metric in ("p50_ms", "p95_ms", "mean_chars"):
+            row(f"{name}.{metric}", [(result["tools"].get(name) or {}).get(metric) for result in results])
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 服务器基准测试（进程内模式 vs 工作进程模式）")
+    parser.add_argument("--url", default="http://127.0.0.1:7397", help="MCP 服务器地址")
+    parser.add_argument("--label", default="", help="本次结果的标签（如 thread、worker）")
+    parser.add_argument("--tools", default=DEFAULT_TOOLS, help="逗号分隔的工具名（均以默认参数调用）")
+    parser.add_argument("--iterations", type=int, default=50, help="每个工具的调用次数")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发调用数")
+    parser.add_argument("--health-interval", type=float, default=0.5, help="读取事件循环延迟的间隔（秒）")
+    parser.add_argument("--output", help="结果保存路径（JSON）")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT", help="对比已保存的结果文件")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return 0
+
+    result = asyncio.run(run_benchmark(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
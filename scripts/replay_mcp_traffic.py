@@ -0,0 +1,204 @@
+"""
+工具调用回放 - 按录制时间（可缩放）向 MCP 服务器重放 capture 录制的工具调用，统计各工具延迟，
+并与另一次回放结果（如上一个版本）对比
+
+配合 scripts/standin_comfyui.py 在本机回放，不需要 GPU 和真实模型
+
+用法:
+    # 终端 1：启动替身 ComfyUI 和 MCP 服务器
+    python scripts/standin_comfyui.py
+    # 终端 2：按原速回放并保存结果
+    python scripts/replay_mcp_traffic.py mcp_traffic.jsonl.gz --output replay_old.json
+    # 切换到新版本后按 2 倍速回放，与旧版本对比（有工具 p95 变慢超过阈值时返回码为 1）
+    python scripts/replay_mcp_traffic.py mcp_traffic.jsonl.gz --rate 2 --baseline replay_old.json
+"""
+
+import sys
+import gzip
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Dict, Any, List, Optional
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+def resolve_blobs(value: Any, blobs: Dict[str, str]) -> Any:
+    """把 {"$blob": 哈希} 引用还原为原始字符串"""
+    if isinstance(value, dict):
+        if len(value) == 1 and "$blob" in value:
+            return blobs[value["$blob"]]
+        return {key: resolve_blobs(item, blobs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_blobs(item, blobs) for item in value]
+    return value
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    """读取录制文件（.gz 或纯文本），返回按时间排序的调用；录制进程被中断时最后一行可能不完整，直接忽略"""
+    opener = gzip.open if path.endswith(".gz") else open
+    blobs: Dict[str, str] = {}
+    calls: List[Dict[str, Any]] = []
+    # 多次启动录制会追加到同一文件，每段的 t 相对各自的 start 记录
+    offset = 0.0
+    segment_end = 0.0
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                if item.get("type") == "blob":
+                    blobs[item["id"]] = item["data"]
+                elif item.get("type") == "start":
+                    offset = segment_end
+                elif item.get("type") == "call":
+                    item["t"] += offset
+                    segment_end = max(segment_end, item["t"])
+                    calls.append(item)
+        except (EOFError, OSError):
+            # gzip 文件在写入中途截断
+            pass
+    for call in calls:
+        call["args"] = resolve_blobs(call.get("args") or {}, blobs)
+    calls.sort(key=lambda call: call["t"])
+    return calls
+
+async def replay(args, calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    from fastmcp import Client
+
+    latencies: Dict[str, List[float]] = {}
+    sizes: Dict[str, List[int]] = {}
+    errors: Dict[str, int] = {}
+    original: Dict[str, List[float]] = {}
+    behind: List[float] = []
+    semaphore = asyncio.Semaphore(args.max_in_flight)
+
+    async with Client(f"{args.url}/sse") as client:
+        started = time.perf_counter()
+
+        async def run(call: Dict[str, Any]):
+            name = call["tool"]
+            if args.rate > 0:
+                delay = call["t"] / args.rate - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # 服务器跟不上录制速率时，调用会晚于计划时间发出
+                    behind.append(-delay * 1000)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await client.call_tool(name, call["args"], raise_on_error=False)
+                except Exception:
+                    errors[name] = errors.get(name, 0) + 1
+                    return
+                latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+                if result.is_error:
+                    errors[name] = errors.get(name, 0) + 1
+                sizes.setdefault(name, []).append(sum(len(getattr(item, "text", "") or "") for item in result.content))
+            original.setdefault(name, []).append(call["ms"])
+
+        await asyncio.gather(*(run(call) for call in calls))
+        elapsed = time.perf_counter() - started
+
+    tools = {}
+    for name in sorted(set(latencies) | set(errors)):
+        values = latencies.get(name, [])
+        tools[name] = {
+            "calls": len(values),
+            "errors": errors.get(name, 0),
+            "mean_ms": round(statistics.mean(values), 3) if values else None,
+            "p50_ms": round(percentile(values, 0.5), 3) if values else None,
+            "p95_ms": round(percentile(values, 0.95), 3) if values else None,
+            "mean_chars": round(statistics.mean(sizes[name])) if sizes.get(name) else None,
+            # 录制时（生产环境）的服务端耗时，仅供参考
+            "captured_p50_ms": round(percentile(original[name], 0.5), 3) if original.get(name) else None,
+        }
+
+    return {
+        "label": args.label,
+        "capture": args.capture,
+        "url": args.url,
+        "rate": args.rate,
+        "calls": len(calls),
+        "elapsed_seconds": round(elapsed, 3),
+        "behind_schedule": {
+            "calls": len(behind),
+            "max_ms": round(max(behind), 3) if behind else None,
+        },
+        "tools": tools,
+    }
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """打印与基准结果的延迟差异，返回是否有工具的 p95 变慢超过 threshold（比例）"""
+    regressed = False
+    print(f"{'工具':<36}{'基准 p50':>12}{'本次 p50':>12}{'基准 p95':>12}{'本次 p95':>12}{'p95 变化':>12}")
+    for name in sorted(set(result["tools"]) | set(baseline["tools"])):
+        current = result["tools"].get(name) or {}
+        base = baseline["tools"].get(name) or {}
+        delta = None
+        if current.get("p95_ms") is not None and base.get("p95_ms"):
+            delta = (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"]
+        flag = ""
+        if delta is not None and delta > threshold:
+            regressed = True
+            flag = "  ← 变慢"
+
+        def cell(value):
+            return f"{'-' if value is None else value:>12}"
+
+        change = f"{delta * 100:+.1f}%" if delta is not None else "-"
+        print(f"{name:<36}{cell(base.get('p50_ms'))}{cell(current.get('p50_ms'))}"
+              f"{cell(base.get('p95_ms'))}{cell(current.get('p95_ms'))}{change:>12}{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制的 MCP 工具调用")
+    parser.add_argument("capture", help="录制文件（capture.path）")
+    parser.add_argument("--url", default="http://127.0.0.1:7397", help="MCP 服务器地址")
+    parser.add_argument("--label", default="", help="本次结果的标签（如版本号）")
+    parser.add_argument("--rate", type=float, default=1.0, help="回放速率倍数，0 表示不等待、尽快发出")
+    parser.add_argument("--tools", help="只回放这些工具（逗号分隔）")
+    parser.add_argument("--exclude", help="不回放这些工具（逗号分隔）")
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的调用数，0 表示全部")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="同时进行的调用数上限")
+    parser.add_argument("--output", help="结果保存路径（JSON）")
+    parser.add_argument("--baseline", help="对比的基准结果文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 变慢超过该比例视为性能回退")
+    args = parser.parse_args()
+
+    calls = load_capture(args.capture)
+    if args.tools:
+        names = {name.strip() for name in args.tools.split(",")}
+        calls = [call for call in calls if call["tool"] in names]
+    if args.exclude:
+        names = {name.strip() for name in args.exclude.split(",")}
+        calls = [call for call in calls if call["tool"] not in names]
+    if args.limit > 0:
+        calls = calls[:args.limit]
+    if not calls:
+        print("录制文件中没有可回放的调用")
+        return 1
+
+    result = asyncio.run(replay(args, calls))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
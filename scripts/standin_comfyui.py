@@ -0,0 +1,340 @@
+"""
+ComfyUI 替身 - 不加载模型和真实节点，只提供插件用到的 PromptServer / nodes / folder_paths 接口，
+在本机启动 MCP 服务器，用于回放录制的工具调用和基准测试
+
+提交的工作流由替身执行线程按节点顺序"执行"（每个节点等待 --node-delay 秒），
+发送与 ComfyUI 相同的执行消息并写入历史记录
+
+用法:
+    python scripts/standin_comfyui.py [--node-delay 0.05] [--mode thread|worker] [--duration 0]
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import heapq
+import types
+import uuid
+import asyncio
+import argparse
+import tempfile
+import threading
+from collections import namedtuple
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ExecutionStatus = namedtuple("ExecutionStatus", ["status_str", "completed", "messages"])
+
+# 替身节点：只提供 INPUT_TYPES/RETURN_TYPES 等元数据
+NODE_DEFINITIONS = {
+    "CheckpointLoaderSimple": ({"ckpt_name": (["standin.safetensors"],)}, ("MODEL", "CLIP", "VAE"), "loaders", False),
+    "CLIPTextEncode": ({"text": ("STRING", {"multiline": True}), "clip": ("CLIP",)}, ("CONDITIONING",),
+                       "conditioning", False),
+    "EmptyLatentImage": ({"width": ("INT", {"default": 512}), "height": ("INT", {"default": 512}),
+                          "batch_size": ("INT", {"default": 1})}, ("LATENT",), "latent", False),
+    "KSampler": ({"model": ("MODEL",), "seed": ("INT", {"default": 0}), "steps": ("INT", {"default": 20}),
+                  "cfg": ("FLOAT", {"default": 8.0}), "sampler_name": (["euler", "dpmpp_2m"],),
+                  "scheduler": (["normal", "karras"],), "positive": ("CONDITIONING",),
+                  "negative": ("CONDITIONING",), "latent_image": ("LATENT",),
+                  "denoise": ("FLOAT", {"default": 1.0})}, ("LATENT",), "sampling", False),
+    "VAEDecode": ({"samples": ("LATENT",), "vae": ("VAE",)}, ("IMAGE",), "latent", False),
+    "LoadImage": ({"image": (["example.png"], {"image_upload": True})}, ("IMAGE", "MASK"), "image", False),
+    "SaveImage": ({"images": ("IMAGE",), "filename_prefix": ("STRING", {"default": "ComfyUI"})}, (), "image", True),
+    "PreviewImage": ({"images": ("IMAGE",)}, (), "image", True),
+}
+
+def make_node_class(name, inputs, return_types, category, output_node):
+    return type(name, (), {
+        "INPUT_TYPES": classmethod(lambda cls: {"required": inputs}),
+        "RETURN_TYPES": return_types,
+        "CATEGORY": category,
+        "OUTPUT_NODE": output_node,
+    })
+
+class JsonResponse:
+    """与 aiohttp 的 json_response 一样带 body 属性"""
+
+    def __init__(self, data, status=200):
+        self.body = json.dumps(data).encode("utf-8")
+        self.status = status
+
+class PromptQueue:
+    """ComfyUI PromptQueue 的简化实现（接口和加锁方式相同）"""
+
+    def __init__(self, server):
+        self.server = server
+        self.mutex = threading.RLock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.task_counter = 0
+        self.queue = []
+        self.currently_running = {}
+        self.history = {}
+        self.flags = {}
+
+    def put(self, item):
+        with self.mutex:
+            heapq.heappush(self.queue, item)
+            self.server.queue_updated()
+            self.not_empty.notify()
+
+    def get(self, timeout=None):
+        with self.not_empty:
+            while len(self.queue) == 0:
+                self.not_empty.wait(timeout=timeout)
+                if timeout is not None and len(self.queue) == 0:
+                    return None
+            item = heapq.heappop(self.queue)
+            i = self.task_counter
+            self.currently_running[i] = copy.deepcopy(item)
+            self.task_counter += 1
+            self.server.queue_updated()
+            return item, i
+
+    def task_done(self, item_id, history_result, status):
+        with self.mutex:
+            prompt = self.currently_running.pop(item_id)
+            self.history[prompt[1]] = {
+                "prompt": prompt,
+                "outputs": {},
+                "status": status._asdict() if status is not None else None,
+            }
+            self.history[prompt[1]].update(history_result)
+            self.server.queue_updated()
+
+    def get_current_queue(self):
+        with self.mutex:
+            return list(self.currently_running.values()), copy.deepcopy(self.queue)
+
+    def get_tasks_remaining(self):
+        with self.mutex:
+            return len(self.queue) + len(self.currently_running)
+
+    def wipe_queue(self):
+        with self.mutex:
+            self.queue = []
+            self.server.queue_updated()
+
+    def delete_queue_item(self, function):
+        with self.mutex:
+            for x in range(len(self.queue)):
+                if function(self.queue[x]):
+                    self.queue.pop(x)
+                    heapq.heapify(self.queue)
+                    self.server.queue_updated()
+                    return True
+        return False
+
+    def get_history(self, prompt_id=None, max_items=None, offset=-1):
+        with self.mutex:
+            if prompt_id is None:
+                keys = list(self.history)
+                if offset < 0 and max_items is not None:
+                    offset = len(keys) - max_items
+                keys = keys[max(offset, 0):]
+                if max_items is not None:
+                    keys = keys[:max_items]
+                return {key: copy.deepcopy(self.history[key]) for key in keys}
+            if prompt_id in self.history:
+                return {prompt_id: copy.deepcopy(self.history[prompt_id])}
+            return {}
+
+    def wipe_history(self):
+        with self.mutex:
+            self.history = {}
+
+    def delete_history_item(self, id_to_delete):
+        with self.mutex:
+            self.history.pop(id_to_delete, None)
+
+    def set_flag(self, name, data):
+        with self.mutex:
+            self.flags[name] = data
+            self.not_empty.notify()
+
+    def get_flags(self, reset=True):
+        with self.mutex:
+            if reset:
+                ret = self.flags
+                self.flags = {}
+                return ret
+            return self.flags.copy()
+
+class PromptServer:
+    """ComfyUI PromptServer 的替身，提供插件调用的路由处理函数"""
+
+    instance = None
+
+    def __init__(self, loop):
+        PromptServer.instance = self
+        self.loop = loop
+        self.prompt_queue = PromptQueue(self)
+        self.number = 0
+        self.client_id = None
+
+    def queue_updated(self):
+        pass
+
+    def send_sync(self, event, data, sid=None):
+        pass
+
+    def get_queue_info(self):
+        return {"exec_info": {"queue_remaining": self.prompt_queue.get_tasks_remaining()}}
+
+    async def post_prompt(self, request):
+        data = await request.json()
+        prompt = data.get("prompt") or {}
+        for node_id, node in prompt.items():
+            if node.get("class_type") not in NODE_DEFINITIONS:
+                return JsonResponse({"error": f"未知节点类型 {node.get('class_type')}", "node_errors": {node_id: {}}}, 400)
+        prompt_id = data.get("prompt_id") or str(uuid.uuid4())
+        number = self.number
+        self.number += 1
+        extra_data = dict(data.get("extra_data") or {})
+        extra_data["create_time"] = int(time.time() * 1000)
+        if "client_id" in data:
+            extra_data["client_id"] = data["client_id"]
+        outputs = [node_id for node_id, node in prompt.items() if NODE_DEFINITIONS[node["class_type"]][3]]
+        self.prompt_queue.put((number, prompt_id, prompt, extra_data, outputs))
+        return JsonResponse({"prompt_id": prompt_id, "number": number, "node_errors": {}})
+
+    async def system_stats(self, request):
+        return JsonResponse({
+            "system": {"os": sys.platform, "python_version": sys.version, "comfyui_version": "standin",
+                       "ram_total": 16 * 1024 ** 3, "ram_free": 8 * 1024 ** 3},
+            "devices": [{"name": "standin", "type": "cpu", "vram_total": 0, "vram_free": 0,
+                         "torch_vram_total": 0, "torch_vram_free": 0}],
+        })
+
+    async def get_features(self, request):
+        return JsonResponse({"supports_preview_metadata": True})
+
+    @staticmethod
+    def _node_info(name):
+        node_class = sys.modules["nodes"].NODE_CLASS_MAPPINGS[name]
+        return {
+            "input": node_class.INPUT_TYPES(),
+            "output": list(node_class.RETURN_TYPES),
+            "name": name,
+            "display_name": name,
+            "category": node_class.CATEGORY,
+            "output_node": node_class.OUTPUT_NODE,
+        }
+
+    async def get_object_info(self, request):
+        return JsonResponse({name: self._node_info(name) for name in NODE_DEFINITIONS})
+
+    async def get_object_info_node(self, request):
+        name = request.rel_url.match_info.get("node_class")
+        return JsonResponse({name: self._node_info(name)} if name in NODE_DEFINITIONS else {})
+
+    async def get_prompt(self, request):
+        return JsonResponse(self.get_queue_info())
+
+def install_modules(base_dir, loop):
+    """注册替身模块 server / nodes / folder_paths / comfy.model_management"""
+    server = types.ModuleType("server")
+    server.PromptServer = PromptServer
+    PromptServer(loop)
+    sys.modules["server"] = server
+
+    nodes = types.ModuleType("nodes")
+    nodes.NODE_CLASS_MAPPINGS = {name: make_node_class(name, *definition)
+                                 for name, definition in NODE_DEFINITIONS.items()}
+    nodes.NODE_DISPLAY_NAME_MAPPINGS = {name: name for name in NODE_DEFINITIONS}
+    nodes.interrupt_processing = lambda value=True: PromptServer.instance.prompt_queue.set_flag("interrupt", value)
+    sys.modules["nodes"] = nodes
+
+    directories = {folder: os.path.join(base_dir, folder) for folder in ("input", "output", "temp")}
+    for directory in directories.values():
+        os.makedirs(directory, exist_ok=True)
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.get_directory_by_type = directories.get
+    folder_paths.get_input_directory = lambda: directories["input"]
+    folder_paths.get_output_directory = lambda: directories["output"]
+    folder_paths.get_temp_directory = lambda: directories["temp"]
+    sys.modules["folder_paths"] = folder_paths
+
+    comfy = types.ModuleType("comfy")
+    model_management = types.ModuleType("comfy.model_management")
+    model_management.unload_all_models = lambda: None
+    model_management.soft_empty_cache = lambda *args, **kwargs: None
+    comfy.model_management = model_management
+    sys.modules["comfy"] = comfy
+    sys.modules["comfy.model_management"] = model_management
+
+def execute_forever(node_delay):
+    """替身执行线程：按节点顺序发送执行消息，每个节点等待 node_delay 秒"""
+    prompt_server = PromptServer.instance
+    prompt_queue = prompt_server.prompt_queue
+    while True:
+        queue_item = prompt_queue.get(timeout=1.0)
+        # 与 ComfyUI 的 prompt_worker 一样在任务间隙处理 free_memory / unload_models 标志
+        flags = prompt_queue.get_flags()
+        if flags.get("unload_models") or flags.get("free_memory"):
+            sys.modules["comfy.model_management"].soft_empty_cache()
+        if queue_item is None:
+            continue
+        item, item_id = queue_item
+        prompt_id, prompt, extra_data = item[1], item[2], item[3]
+        sid = extra_data.get("client_id")
+        started = int(time.time() * 1000)
+        prompt_server.send_sync("execution_start", {"prompt_id": prompt_id, "timestamp": started}, sid)
+        outputs = {}
+        for node_id, node in prompt.items():
+            prompt_server.send_sync("executing", {"node": node_id, "display_node": node_id,
+                                                  "prompt_id": prompt_id}, sid)
+            time.sleep(node_delay)
+            if node["class_type"] in ("SaveImage", "PreviewImage"):
+                outputs[node_id] = {"images": [{"filename": f"{prompt_id}_{node_id}.png", "subfolder": "",
+                                                "type": "output"}]}
+                prompt_server.send_sync("executed", {"node": node_id, "output": outputs[node_id],
+                                                     "prompt_id": prompt_id}, sid)
+        finished = int(time.time() * 1000)
+        prompt_server.send_sync("executing", {"node": None, "prompt_id": prompt_id}, sid)
+        prompt_server.send_sync("execution_success", {"prompt_id": prompt_id, "timestamp": finished}, sid)
+        messages = [("execution_start", {"prompt_id": prompt_id, "timestamp": started}),
+                    ("execution_success", {"prompt_id": prompt_id, "timestamp": finished})]
+        prompt_queue.task_done(item_id, {"outputs": outputs, "meta": {}},
+                               status=ExecutionStatus("success", True, messages))
+
+def main():
+    parser = argparse.ArgumentParser(description="ComfyUI 替身 + MCP 服务器")
+    parser.add_argument("--node-delay", type=float, default=0.05, help="每个节点的模拟执行时间（秒）")
+    parser.add_argument("--mode", choices=["thread", "worker"], help="MCP 服务器运行模式（默认读取 config.json）")
+    parser.add_argument("--data-dir", help="输入/输出目录（默认使用临时目录）")
+    parser.add_argument("--duration", type=float, default=0, help="运行多少秒后退出，0 表示一直运行")
+    args = parser.parse_args()
+
+    sys.path.insert(0, PLUGIN_DIR)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="standin-loop", daemon=True).start()
+    install_modules(args.data_dir or tempfile.mkdtemp(prefix="comfyui-standin-"), loop)
+    # 真实 ComfyUI 开始监听端口后才设置 address
+    PromptServer.instance.address = "127.0.0.1"
+
+    from tools.base_tools import load_config
+    config = load_config()
+    if args.mode:
+        config.setdefault("mcp", {})["mode"] = args.mode
+    # 回放的调用不再录制，避免追加到正在读取的录制文件（工作进程模式下由工作进程自行读取 config.json）
+    config.setdefault("capture", {})["enabled"] = "false"
+
+    import server_callbacks
+    if not server_callbacks.start_mcp_server():
+        return 1
+    threading.Thread(target=execute_forever, args=(args.node_delay,), name="standin-executor", daemon=True).start()
+
+    try:
+        if args.duration > 0:
+            time.sleep(args.duration)
+        else:
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,187 +4,466 @@ ComfyUI 服务器启动回调模块
 """
 
 import os
+import uuid
+import asyncio
 import logging
 import threading
-from typing import Optional
+from typing import Optional, List, Dict, Any
+
+def build_mcp_server(invoker):
+    """
+    创建 FastMCP 实例并注册全部工具
+    
+    Args:
+        invoker: 工具调用方式，进程内模式为 LocalInvoker，工作进程模式为转发到 ComfyUI 进程的 RpcClient
+    
+    Returns:
+        FastMCP 实例
+    """
+    from fastmcp import FastMCP, Context
+    
+    # 创建 FastMCP 实例
+    mcp = FastMCP("ComfyUI Workflow MCP 🚀")
+    
+    # 工具包只加载注册表，具体工具模块在首次调用时才导入
+    import tools
+    from tools.base_tools import get_config
+    
+    # 按配置录制每次工具调用（参数、耗时、响应大小），用 scripts/replay_mcp_traffic.py 回放
+    if get_config("capture", "enabled", False) and tools.start_traffic_capture().get("status") == "success":
+        from tools.traffic_capture import traffic_recorder
+        mcp.add_middleware(traffic_recorder.middleware())
+    
+    # 工作流执行相关工具
+    @mcp.tool
+    async def submit_workflow_tool(workflow_json: str, client_id: str = None, prompt_id: str = None,
+                                   stream_progress: bool = False, timeout: float = 600, prune: bool = True,
+                                   idempotency_key: str = None, ctx: Context = None) -> str:
+        """提交工作流执行请求（默认剪除不影响输出的节点）；stream_progress为真时等待执行结束并推送进度通知；相同idempotency_key的重试返回首次提交的prompt_id（需启用任务日志）"""
+        if stream_progress and not client_id:
+            # ComfyUI 只向带 client_id 的任务发送执行消息
+            client_id = f"mcp-{uuid.uuid4().hex}"
+        result = await asyncio.to_thread(invoker.call, "submit_workflow", workflow_json, client_id, prompt_id, prune,
+                                       idempotency_key)
+        if stream_progress and isinstance(result, dict) and result.get("prompt_id"):
+            result["progress"] = await invoker.call_async(
+                "wait_for_prompt", result["prompt_id"], report=ctx.report_progress,
+                session_key=ctx.session_id, timeout=timeout
+            )
+        return str(result)
+    
+    @mcp.tool
+    def analyze_workflow_tool(workflow_json: str) -> str:
+        """分析工作流图而不提交：拓扑序、输出节点、可剪除节点、环和悬空连线"""
+        result = invoker.call("analyze_workflow", workflow_json)
+        return str(result)
+    
+    @mcp.tool
+    def get_queue_info_tool(since_version: str = None) -> str:
+        """获取队列信息，传入上次返回的version时只返回增量变化"""
+        result = invoker.call("get_queue_info", since_version)
+        return tools.apply_response_budget("get_queue_info", result)
+    
+    @mcp.tool
+    def clear_queue_tool() -> str:
+        """清除队列中的所有任务"""
+        result = invoker.call("clear_queue")
+        return str(result)
+    
+    @mcp.tool
+    def delete_queue_item_tool(prompt_id: str) -> str:
+        """删除队列中的特定任务"""
+        result = invoker.call("delete_queue_item", prompt_id)
+        return str(result)
+    
+    @mcp.tool
+    def delete_queue_items_tool(prompt_ids: List[str] = None, client_id: str = None, older_than: float = None) -> str:
+        """批量删除队列中的任务（按ID列表、客户端ID或入队时长筛选）"""
+        result = invoker.call("delete_queue_items", prompt_ids, client_id, older_than)
+        return str(result)
+    
+    @mcp.tool
+    def get_prompt_progress_tool(prompt_id: str) -> str:
+        """获取任务的执行进度（当前节点、采样步数、缓存节点）"""
+        result = invoker.call("get_prompt_progress", prompt_id)
+        return str(result)
+    
+    @mcp.tool
+    async def wait_for_prompt_tool(prompt_id: str, timeout: float = 600, ctx: Context = None) -> str:
+        """等待任务执行结束，期间以MCP进度通知推送执行进度"""
+        result = await invoker.call_async("wait_for_prompt", prompt_id, report=ctx.report_progress,
+                                         session_key=ctx.session_id, timeout=timeout)
+        return str(result)
+    
+    @mcp.tool
+    def reorder_queue_by_model_tool(window: int = None) -> str:
+        """按模型亲和性重排等待中的任务，减少模型切换"""
+        result = invoker.call("reorder_queue_by_model", window)
+        return str(result)
+    
+    @mcp.tool
+    def get_scheduler_stats_tool() -> str:
+        """获取模型亲和性调度统计（避免的模型切换次数等）"""
+        result = invoker.call("get_scheduler_stats")
+        return str(result)
+    
+    @mcp.tool
+    def get_lock_stats_tool(top: int = 10, reset: bool = False) -> str:
+        """获取各工具等待和持有ComfyUI队列锁的时间统计，列出拖慢执行线程的主要工具和最慢的调用"""
+        result = invoker.call("get_lock_stats", top, reset)
+        return str(result)
+    
+    @mcp.tool
+    def get_job_journal_status_tool() -> str:
+        """获取任务日志状态（未完成任务数、幂等键数量、重放次数）"""
+        result = invoker.call("get_job_journal_status")
+        return str(result)
+    
+    @mcp.tool
+    def get_admission_stats_tool() -> str:
+        """获取准入控制统计（队列深度、通过和被拒绝的提交次数）"""
+        result = invoker.call("get_admission_stats")
+        return str(result)
+    
+    @mcp.tool
+    def estimate_workflow_tool(workflow_json: str) -> str:
+        """根据历史节点耗时预估工作流的运行时间（按节点类型、采样步数和分辨率）"""
+        result = invoker.call("estimate_workflow", workflow_json)
+        return str(result)
+    
+    @mcp.tool
+    def interrupt_processing_tool() -> str:
+        """中断当前处理"""
+        result = invoker.call("interrupt_processing")
+        return str(result)
+    
+    @mcp.tool
+    def free_memory_tool(unload_models: bool = False, free_memory_param: bool = False) -> str:
+        """释放内存和模型"""
+        result = invoker.call("free_memory", unload_models, free_memory_param)
+        return str(result)
+    
+    @mcp.tool
+    def get_memory_policy_status_tool() -> str:
+        """获取自动内存压力策略的状态和动作日志"""
+        result = invoker.call("get_memory_policy_status")
+        return str(result)
+    
+    # 历史记录管理工具
+    @mcp.tool
+    def get_history_tool(max_items: int = None, since_seq: int = None, since_time: float = None) -> str:
+        """获取历史记录；传入since_seq或since_time时只返回此后完成的记录及next_seq"""
+        result = invoker.call("get_history", max_items, since_seq, since_time)
+        return tools.apply_response_budget("get_history", result)
+    
+    @mcp.tool
+    def get_history_by_id_tool(prompt_id: str) -> str:
+        """根据ID获取特定的历史记录"""
+        result = invoker.call("get_history_by_id", prompt_id)
+        return str(result)
+    
+    @mcp.tool
+    def query_history_tool(status: str = None, client_id: str = None, node_class: str = None, limit: int = 100) -> str:
+        """按状态、客户端ID或节点类型查询已持久化的任务"""
+        result = invoker.call("query_history", status, client_id, node_class, limit)
+        return str(result)
+    
+    @mcp.tool
+    def search_history_tool(query: str = None, node_class: str = None, model: str = None, limit: int = 50) -> str:
+        """按提示词内容、节点类型或模型文件名检索历史任务"""
+        result = invoker.call("search_history", query, node_class, model, limit)
+        return str(result)
+    
+    @mcp.tool
+    def clear_history_tool() -> str:
+        """清除所有历史记录"""
+        result = invoker.call("clear_history")
+        return str(result)
+    
+    @mcp.tool
+    def delete_history_item_tool(prompt_id: str) -> str:
+        """删除特定的历史记录项"""
+        result = invoker.call("delete_history_item", prompt_id)
+        return str(result)
+    
+    @mcp.tool
+    def delete_history_items_tool(prompt_ids: List[str] = None, client_id: str = None, older_than: float = None) -> str:
+        """批量删除历史记录（按ID列表、客户端ID或完成时长筛选）"""
+        result = invoker.call("delete_history_items", prompt_ids, client_id, older_than)
+        return str(result)
+    
+    @mcp.tool
+    def upload_image_tool(image_base64: str, filename: str, subfolder: str = "", upload_type: str = "input", overwrite: bool = False) -> str:
+        """上传base64格式的图片文件"""
+        result = invoker.call("upload_image", image_base64, filename, subfolder, upload_type, overwrite)
+        return str(result)
+    
+    @mcp.tool
+    def view_image_tool(filename: str, image_type: str = "output", subfolder: str = "", channel: str = "rgba", preview: str = None) -> str:
+        """查看图片文件"""
+        result = invoker.call("view_image", filename, image_type, subfolder, channel, preview)
+        return str(result)
+    
+    @mcp.tool
+    def import_local_image_tool(filename: str, source_path: str = None, shm_name: str = None, shm_size: int = None,
+                                subfolder: str = "", overwrite: bool = False) -> str:
+        """同机客户端从本机路径（硬链接/复制）或共享内存导入图片到输入目录，无需base64编码"""
+        result = invoker.call("import_local_image", filename, source_path, shm_name, shm_size, subfolder, overwrite)
+        return str(result)
+    
+    @mcp.tool
+    def export_output_image_tool(filename: str, image_type: str = "output", subfolder: str = "",
+                                 dest_path: str = None, shm_name: str = None) -> str:
+        """同机客户端获取输出图片：返回本机路径，或链接/复制到dest_path，或写入新建的共享内存"""
+        result = invoker.call("export_output_image", filename, image_type, subfolder, dest_path, shm_name)
+        return str(result)
+    
+    @mcp.tool
+    def get_output_variants_tool(prompt_id: str, generate: bool = False) -> str:
+        """获取任务输出图片的变体（WebP缩略图等，任务完成后在转码子进程中生成），可用view_image查看"""
+        result = invoker.call("get_output_variants", prompt_id, generate)
+        return str(result)
+    
+    # 系统信息工具
+    @mcp.tool
+    def get_system_stats_tool() -> str:
+        """获取系统状态信息"""
+        result = invoker.call("get_system_stats")
+        return str(result)
+    
+    @mcp.tool
+    def get_health_tool() -> str:
+        """获取服务器健康状态（进程内检查：事件循环延迟、执行线程是否在推进、队列长度）"""
+        result = invoker.call("get_health")
+        return str(result)
+    
+    @mcp.tool
+    def get_import_profile_tool() -> str:
+        """获取工具模块及重量级依赖的导入耗时，以及尚未加载的工具模块"""
+        result = invoker.call("get_import_profile")
+        return str(result)
+    
+    # 健康检查 HTTP 接口，事件循环卡顿时返回 503
+    @mcp.custom_route("/health", methods=["GET"])
+    async def health_route(request):
+        from starlette.responses import JSONResponse
+        result = await asyncio.to_thread(invoker.call, "get_health")
+        status_code = 503 if result.get("error") or result.get("status") == "stalled" else 200
+        return JSONResponse(result, status_code=status_code)
+    
+    @mcp.tool
+    def get_features_tool() -> str:
+        """获取功能特性信息"""
+        result = invoker.call("get_features")
+        return str(result)
+    
+    @mcp.tool
+    def get_object_info_tool() -> str:
+        """获取所有节点信息"""
+        result = invoker.call("get_object_info")
+        return tools.apply_response_budget("get_object_info", result)
+    
+    @mcp.tool
+    def get_continuation_tool(handle: str, offset: int = 0, max_chars: int = None) -> str:
+        """获取被截断的大响应（truncated为真时）的后续内容，offset取上一段的next_offset"""
+        result = tools.get_continuation(handle, offset, max_chars)
+        return str(result)
+    
+    @mcp.tool
+    def get_object_info_by_node_tool(node_class: str) -> str:
+        """获取特定节点的信息"""
+        result = invoker.call("get_object_info_by_node", node_class)
+        return str(result)
+    
+    @mcp.tool
+    def search_nodes_tool(query: str = None, input_type: str = None, output_type: str = None,
+                          category: str = None, limit: int = 20) -> str:
+        """按名称、显示名、分类或输入/输出类型检索节点（如 input_type=IMAGE, output_type=LATENT），返回精简描述"""
+        result = invoker.call("search_nodes", query, input_type, output_type, category, limit)
+        return str(result)
+    
+    @mcp.tool
+    def get_queue_status_tool(since_version: str = None) -> str:
+        """获取队列状态信息，传入上次返回的version时只返回增量变化"""
+        result = invoker.call("get_queue_status", since_version)
+        return tools.apply_response_budget("get_queue_status", result)
+    
+    @mcp.tool
+    def get_prompt_status_tool() -> str:
+        """获取提示状态信息"""
+        result = invoker.call("get_prompt_status")
+        return str(result)
+    
+    # 批量提交工具
+    @mcp.tool
+    def plan_batch_tool(workflows_json: List[str], submit: bool = False, client_id: str = None) -> str:
+        """按共享子图排序一批工作流以最大化执行缓存复用，返回预计复用的节点数；submit为真时按该顺序提交"""
+        result = invoker.call("plan_batch", workflows_json, submit, client_id)
+        return str(result)
+    
+    @mcp.tool
+    def get_batch_plan_tool(plan_id: str) -> str:
+        """获取已提交批次每个任务预计与实际的缓存命中节点数"""
+        result = invoker.call("get_batch_plan", plan_id)
+        return str(result)
+    
+    # 参数扫描工具
+    @mcp.tool
+    def start_sweep_tool(workflow_json: str, axes: Dict[str, List[Any]], max_in_flight: int = 2,
+                         client_id: str = None) -> str:
+        """启动参数扫描：axes为轴路径到取值列表的映射（如 {"3.inputs.seed": [1, 2], "3.inputs.cfg": [4, 7]}），按笛卡尔积提交"""
+        result = invoker.call("start_sweep", workflow_json, axes, max_in_flight, client_id)
+        return str(result)
+    
+    @mcp.tool
+    def get_sweep_result_tool(sweep_id: str) -> str:
+        """获取参数扫描的进度和网格结果（每个组合的轴值、prompt_id、状态和输出图片）"""
+        result = invoker.call("get_sweep_result", sweep_id)
+        return str(result)
+    
+    @mcp.tool
+    def cancel_sweep_tool(sweep_id: str, delete_queued: bool = True) -> str:
+        """取消参数扫描，停止提交剩余组合"""
+        result = invoker.call("cancel_sweep", sweep_id, delete_queued)
+        return str(result)
+    
+    @mcp.tool
+    def list_workflow_templates_tool() -> str:
+        """列出 workflow_api 目录中的工作流模板及其参数（每个模板都注册为独立的 run_<模板名>_tool 工具）"""
+        result = invoker.call("list_workflow_templates")
+        return str(result)
+    
+    # 每个工作流模板注册为独立的带类型参数的工具，模板文件变化时重新注册
+    def register_template_tools(changes):
+        from tools.template_tools import build_template_function
+        
+        for name in changes["removed"]:
+            try:
+                mcp.local_provider.remove_tool(name)
+            except KeyError:
+                pass
+        for template in changes["changed"]:
+            try:
+                mcp.local_provider.remove_tool(template["name"])
+            except KeyError:
+                pass
+            try:
+                mcp.add_tool(build_template_function(template, invoker))
+            except Exception as e:
+                print(f"⚠️ 跳过工作流模板 {template['file']}: {e}")
+                continue
+            print(f"🧩 已注册工作流模板工具: {template['name']} ({len(template['parameters'])} 个参数)")
+    
+    if get_config("templates", "enabled", True):
+        # 模板目录由 ComfyUI 进程扫描（模板参数类型来自节点定义）
+        register_template_tools(invoker.call("scan_templates", True))
+        invoker.watch_templates(register_template_tools)
+    
+    return mcp
+
+def run_mcp_server(mcp):
+    """
+    以 SSE 传输协议运行 MCP 服务器（阻塞），并配置 CORS 支持
+    """
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.middleware import Middleware
+    
+    try:
+        # 配置 CORS 中间件
+        cors_middleware = [
+            Middleware(
+                CORSMiddleware,
+                allow_origins=["*"],  # 允许所有来源，生产环境中应该配置具体的域名
+                allow_methods=["GET", "POST", "DELETE", "OPTIONS"],  # MCP streamable HTTP 方法
+                allow_headers=["*"],  # 允许所有请求头
+                expose_headers=["Mcp-Session-Id"],  # 暴露 MCP 会话 ID 头
+                allow_credentials=True,  # 允许携带凭证
+            )
+        ]
+        
+        # 启动服务器，传入 CORS 中间件
+        mcp.run(
+            transport="sse", 
+            host="0.0.0.0", 
+            port=7397,
+            middleware=cors_middleware
+        )
+    except Exception as e:
+        print(f"❌ MCP 服务器启动失败: {e}")
+        logging.error(f"MCP 服务器启动失败: {e}")
+
+def start_comfyui_services():
+    """
+    启动必须运行在 ComfyUI 进程内的服务（两种模式相同）
+    """
+    import tools
+    from tools.base_tools import get_config
+    
+    # 订阅 ComfyUI 执行消息，用于进度推送
+    from tools.progress_tools import progress_tracker
+    progress_tracker.install()
+    
+    # 以下服务只在配置启用时启动，未启用的服务模块不会被导入
+    # 历史记录持久化（SQLite）
+    if get_config("database", "enabled", False):
+        tools.start_history_store()
+    
+    # 任务日志，重放上次退出时未完成的任务
+    if get_config("journal", "enabled", False):
+        journal_result = tools.start_job_journal()
+        if journal_result.get("replayed"):
+            print(f"🔁 已重放 {len(journal_result['replayed'])} 个未完成的任务")
+    
+    # 输出后处理（任务完成后在转码子进程中生成缩略图等变体）
+    if get_config("postprocess", "enabled", False):
+        tools.start_output_postprocess()
+    
+    # 进程内健康检查（事件循环延迟与执行进度）
+    if get_config("watchdog", "enabled", True):
+        tools.start_watchdog()
+    
+    # 内存压力策略（任务间隙自动释放内存）
+    if get_config("memory_policy", "enabled", False):
+        tools.start_memory_policy()
 
 def start_mcp_server():
     """
     启动 MCP 服务器，使用 SSE 传输协议，并配置 CORS 支持
+    
+    mcp.mode 为 worker 时 FastMCP 运行在子进程中，ComfyUI 进程只保留 Unix 套接字上的 RPC 服务端
     """
     try:
-        from fastmcp import FastMCP
-        from starlette.middleware.cors import CORSMiddleware
-        from starlette.middleware import Middleware
+        from tools.base_tools import get_config
+        from tools.worker_ipc import LocalInvoker, McpWorkerSupervisor
         
-        # 创建 FastMCP 实例
-        mcp = FastMCP("ComfyUI Workflow MCP 🚀")
+        start_comfyui_services()
         
-        # 导入所有工具
-        from tools import (
-            # 工作流执行相关工具
-            submit_workflow, get_queue_info, clear_queue, delete_queue_item, 
-            interrupt_processing, free_memory,
-            
-            # 历史记录管理工具
-            get_history, get_history_by_id, clear_history, delete_history_item,
-            
-            # 文件上传和管理工具
-            upload_image, view_image,
+        mode = get_config("mcp", "mode", "thread")
+        if mode == "worker":
+            # 启动 MCP 工作进程（意外退出时自动重启）
+            supervisor = McpWorkerSupervisor()
+            supervisor.start()
+            print(f"🧵 MCP 服务器运行在工作进程中，RPC 套接字: {supervisor.path}")
+        else:
+            mcp = build_mcp_server(LocalInvoker())
             
-            # 系统信息工具
-            get_system_stats, get_features, get_object_info, get_object_info_by_node,
-            get_queue_status, get_prompt_status
-        )
-        
-        # 工作流执行相关工具
-        @mcp.tool
-        def submit_workflow_tool(workflow_json: str, client_id: str = None, prompt_id: str = None) -> str:
-            """提交工作流执行请求"""
-            result = submit_workflow(workflow_json, client_id, prompt_id)
-            return str(result)
-        
-        @mcp.tool
-        def get_queue_info_tool() -> str:
-            """获取队列信息"""
-            result = get_queue_info()
-            return str(result)
-        
-        @mcp.tool
-        def clear_queue_tool() -> str:
-            """清除队列中的所有任务"""
-            result = clear_queue()
-            return str(result)
-        
-        @mcp.tool
-        def delete_queue_item_tool(prompt_id: str) -> str:
-            """删除队列中的特定任务"""
-            result = delete_queue_item(prompt_id)
-            return str(result)
-        
-        @mcp.tool
-        def interrupt_processing_tool() -> str:
-            """中断当前处理"""
-            result = interrupt_processing()
-            return str(result)
-        
-        @mcp.tool
-        def free_memory_tool(unload_models: bool = False, free_memory_param: bool = False) -> str:
-            """释放内存和模型"""
-            result = free_memory(unload_models, free_memory_param)
-            return str(result)
-        
-        # 历史记录管理工具
-        @mcp.tool
-        def get_history_tool(max_items: int = None) -> str:
-            """获取历史记录"""
-            result = get_history(max_items)
-            return str(result)
-        
-        @mcp.tool
-        def get_history_by_id_tool(prompt_id: str) -> str:
-            """根据ID获取特定的历史记录"""
-            result = get_history_by_id(prompt_id)
-            return str(result)
-        
-        @mcp.tool
-        def clear_history_tool() -> str:
-            """清除所有历史记录"""
-            result = clear_history()
-            return str(result)
-        
-        @mcp.tool
-        def delete_history_item_tool(prompt_id: str) -> str:
-            """删除特定的历史记录项"""
-            result = delete_history_item(prompt_id)
-            return str(result)
-        
-        @mcp.tool
-        def upload_image_tool(image_base64: str, filename: str, subfolder: str = "", upload_type: str = "input", overwrite: bool = False) -> str:
-            """上传base64格式的图片文件"""
-            result = upload_image(image_base64, filename, subfolder, upload_type, overwrite)
-            return str(result)
-        
-        @mcp.tool
-        def view_image_tool(filename: str, image_type: str = "output", subfolder: str = "", channel: str = "rgba", preview: str = None) -> str:
-            """查看图片文件"""
-            result = view_image(filename, image_type, subfolder, channel, preview)
-            return str(result)
-        
-        # 系统信息工具
-        @mcp.tool
-        def get_system_stats_tool() -> str:
-            """获取系统状态信息"""
-            result = get_system_stats()
-            return str(result)
-        
-        @mcp.tool
-        def get_features_tool() -> str:
-            """获取功能特性信息"""
-            result = get_features()
-            return str(result)
-        
-        @mcp.tool
-        def get_object_info_tool() -> str:
-            """获取所有节点信息"""
-            result = get_object_info()
-            return str(result)
-        
-        @mcp.tool
-        def get_object_info_by_node_tool(node_class: str) -> str:
-            """获取特定节点的信息"""
-            result = get_object_info_by_node(node_class)
-            return str(result)
-        
-        @mcp.tool
-        def get_queue_status_tool() -> str:
-            """获取队列状态信息"""
-            result = get_queue_status()
-            return str(result)
-        
-        @mcp.tool
-        def get_prompt_status_tool() -> str:
-            """获取提示状态信息"""
-            result = get_prompt_status()
-            return str(result)
-        
-        # 在后台线程中启动 MCP 服务器
-        def run_mcp_server():
-            try:
-                # 配置 CORS 中间件
-                cors_middleware = [
-                    Middleware(
-                        CORSMiddleware,
-                        allow_origins=["*"],  # 允许所有来源，生产环境中应该配置具体的域名
-                        allow_methods=["GET", "POST", "DELETE", "OPTIONS"],  # MCP streamable HTTP 方法
-                        allow_headers=["*"],  # 允许所有请求头
-                        expose_headers=["Mcp-Session-Id"],  # 暴露 MCP 会话 ID 头
-                        allow_credentials=True,  # 允许携带凭证
-                    )
-                ]
-                
-                # 启动服务器，传入 CORS 中间件
-                mcp.run(
-                    transport="sse", 
-                    host="0.0.0.0", 
-                    port=7397,
-                    middleware=cors_middleware
-                )
-            except Exception as e:
-                print(f"❌ MCP 服务器启动失败: {e}")
-                logging.error(f"MCP 服务器启动失败: {e}")
-        
-        # 启动 MCP 服务器线程
-        mcp_thread = threading.Thread(target=run_mcp_server, daemon=True)
-        mcp_thread.start()
+            # 启动 MCP 服务器线程
+            mcp_thread = threading.Thread(target=run_mcp_server, args=(mcp,), daemon=True)
+            mcp_thread.start()
         
         print("✅ MCP 服务器已启动 (SSE 模式 + CORS 支持) - http://127.0.0.1:7397")
         print("🌐 CORS 已启用，支持跨域请求")
+        print("💓 健康检查: http://127.0.0.1:7397/health")
         print("🔧 已集成 ComfyUI API 工具:")
-        print("   - 工作流执行: submit_workflow, get_queue_info, clear_queue, delete_queue_item, interrupt_processing, free_memory")
-        print("   - 历史记录管理: get_history, get_history_by_id, clear_history, delete_history_item")
-        print("   - 文件管理: upload_image, view_image")
-        print("   - 系统信息: get_system_stats, get_features, get_object_info, get_queue_status, get_prompt_status")
+        print("   - 工作流执行: submit_workflow, get_queue_info, clear_queue, delete_queue_item, delete_queue_items, interrupt_processing, free_memory, get_memory_policy_status")
+        print("   - 工作流模板: list_workflow_templates, run_<模板名>_tool")
+        print("   - 参数扫描: start_sweep, get_sweep_result, cancel_sweep")
+        print("   - 批量提交: plan_batch, get_batch_plan")
+        print("   - 执行进度: get_prompt_progress, wait_for_prompt")
+        print("   - 调度: reorder_queue_by_model, get_scheduler_stats, get_lock_stats, get_admission_stats, estimate_workflow, get_job_journal_status")
+        print("   - 历史记录管理: get_history, get_history_by_id, query_history, search_history, clear_history, delete_history_item, delete_history_items")
+        print("   - 文件管理: upload_image, view_image, import_local_image, export_output_image, get_output_variants")
+        print("   - 系统信息: get_system_stats, get_health, get_features, get_object_info, get_continuation, search_nodes, get_queue_status, get_prompt_status, analyze_workflow, get_import_profile")
         return True
         
     except ImportError:
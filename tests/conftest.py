@@ -0,0 +1,91 @@
+"""
+测试公共设置 - 把插件根目录加入导入路径，并提供替身 PromptServer，测试不依赖 ComfyUI
+"""
+
+import os
+import sys
+import copy
+import time
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def fake_config(monkeypatch):
+    """
+    替换模块中的 get_config，返回给定的配置值（按默认值的类型返回，与 config.json 的字符串无关）
+
+    用法：fake_config(module, {("section", "key"): value})
+    """
+    def install(module, values):
+        def get_config(section, key, default=None):
+            return values.get((section, key), default)
+        monkeypatch.setattr(module, "get_config", get_config)
+    return install
+
+class FakePromptQueue:
+    """ComfyUI PromptQueue 中插件用到的部分（锁、队列、历史记录和标志）"""
+
+    def __init__(self):
+        self.mutex = threading.RLock()
+        self.queue = []
+        self.currently_running = {}
+        self.history = {}
+        self.flags = {}
+
+    def get_history(self, prompt_id=None, max_items=None, offset=-1):
+        with self.mutex:
+            if prompt_id is not None:
+                return {prompt_id: copy.deepcopy(self.history[prompt_id])} if prompt_id in self.history else {}
+            keys = list(self.history)
+            if max_items is not None:
+                keys = keys[-max_items:]
+            return {key: copy.deepcopy(self.history[key]) for key in keys}
+
+    def get_current_queue_volatile(self):
+        with self.mutex:
+            return list(self.currently_running.values()), list(self.queue)
+
+    def set_flag(self, name, data):
+        with self.mutex:
+            self.flags[name] = data
+
+    def get_flags(self):
+        """与 ComfyUI 的 prompt_worker 一样读取并清除标志"""
+        with self.mutex:
+            flags, self.flags = self.flags, {}
+            return flags
+
+class FakePromptServer:
+    def __init__(self):
+        self.prompt_queue = FakePromptQueue()
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """把 tools_base 指向替身 PromptServer，并隔离全局事件中心的监听器"""
+    from tools.base_tools import tools_base
+    from tools.events import event_hub
+
+    server = FakePromptServer()
+    monkeypatch.setattr(tools_base, "_prompt_server", server)
+    monkeypatch.setattr(event_hub, "_listeners", [])
+    monkeypatch.setattr(event_hub, "install", lambda: True)
+    return server
+
+def history_item(prompt_id, graph=None, status="success", client_id=None, completed_at=None):
+    """构造 prompt_queue.history 中的一条记录"""
+    completed_at = completed_at if completed_at is not None else time.time()
+    return {
+        "prompt": [0, prompt_id, graph or {}, {"client_id": client_id}, []],
+        "outputs": {},
+        "status": {
+            "status_str": status,
+            "completed": status == "success",
+            "messages": [["execution_start", {"prompt_id": prompt_id, "timestamp": int(completed_at * 1000) - 500}],
+                         ["execution_success", {"prompt_id": prompt_id, "timestamp": int(completed_at * 1000)}]],
+        },
+    }
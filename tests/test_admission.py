@@ -0,0 +1,103 @@
+import pytest
+
+from tools import admission
+from tools.admission import AdmissionController, ANONYMOUS_CLIENT
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission, "time", fake)
+    return fake
+
+@pytest.fixture
+def controller(monkeypatch, fake_config):
+    fake_config(admission, {
+        ("admission", "enabled"): True,
+        ("admission", "rate_per_client"): 1.0,
+        ("admission", "burst"): 2.0,
+        ("admission", "max_pending"): 10,
+        ("admission", "retry_after"): 5.0,
+        ("admission", "estimate_retry_after"): False,
+    })
+    monkeypatch.setattr(AdmissionController, "pending_depth", staticmethod(lambda: 0))
+    return AdmissionController()
+
+def test_take_token_spends_burst_then_waits(clock):
+    controller = AdmissionController()
+    assert controller._take_token("c", rate=2.0, burst=2.0) == 0.0
+    assert controller._take_token("c", rate=2.0, burst=2.0) == 0.0
+    assert controller._take_token("c", rate=2.0, burst=2.0) == pytest.approx(0.5)
+
+def test_take_token_refills_up_to_burst(clock):
+    controller = AdmissionController()
+    for _ in range(2):
+        controller._take_token("c", rate=1.0, burst=2.0)
+    clock.now += 0.5
+    assert controller._take_token("c", rate=1.0, burst=2.0) == pytest.approx(0.5)
+    clock.now += 100
+    # 补充的令牌不超过 burst
+    assert controller._take_token("c", rate=1.0, burst=2.0) == 0.0
+    assert controller._take_token("c", rate=1.0, burst=2.0) == 0.0
+    assert controller._take_token("c", rate=1.0, burst=2.0) > 0
+
+def test_take_token_zero_rate_never_refills(clock):
+    controller = AdmissionController()
+    assert controller._take_token("c", rate=0.0, burst=1.0) == 0.0
+    assert controller._take_token("c", rate=0.0, burst=1.0) == float("inf")
+
+def test_take_token_evicts_least_recently_used(clock, monkeypatch):
+    monkeypatch.setattr(admission, "MAX_BUCKETS", 2)
+    controller = AdmissionController()
+    controller._take_token("a", rate=1.0, burst=1.0)
+    controller._take_token("b", rate=1.0, burst=1.0)
+    controller._take_token("a", rate=1.0, burst=1.0)
+    controller._take_token("c", rate=1.0, burst=1.0)
+    assert list(controller._buckets) == ["a", "c"]
+
+def test_admit_disabled(fake_config):
+    fake_config(admission, {("admission", "enabled"): False})
+    assert AdmissionController().admit("c") is None
+
+def test_admit_rejects_by_client_rate(clock, controller):
+    assert controller.admit("c") is None
+    assert controller.admit("c") is None
+    rejection = controller.admit("c")
+    assert rejection["reason"] == "rate"
+    assert rejection["retry_after"] == pytest.approx(1.0)
+    # 其他客户端有独立的令牌桶
+    assert controller.admit("other") is None
+    assert controller.stats == {"admitted": 3, "rejected_rate": 1, "rejected_depth": 0}
+
+def test_admit_anonymous_clients_share_bucket(clock, controller):
+    controller.admit()
+    controller.admit(None)
+    assert controller.admit("")["reason"] == "rate"
+    assert list(controller._buckets) == [ANONYMOUS_CLIENT]
+
+def test_admit_rejects_when_queue_saturated_without_spending_tokens(clock, controller, monkeypatch):
+    monkeypatch.setattr(AdmissionController, "pending_depth", staticmethod(lambda: 10))
+    rejection = controller.admit("c")
+    assert rejection["reason"] == "depth"
+    assert rejection["retry_after"] == 5.0
+    assert "c" not in controller._buckets
+
+    monkeypatch.setattr(AdmissionController, "pending_depth", staticmethod(lambda: 9))
+    assert controller.admit("c") is None
+    assert controller.admit("c") is None
+
+def test_admit_uses_estimated_retry_after(clock, controller, fake_config, monkeypatch):
+    fake_config(admission, {
+        ("admission", "enabled"): True,
+        ("admission", "max_pending"): 1,
+        ("admission", "estimate_retry_after"): True,
+    })
+    monkeypatch.setattr(AdmissionController, "pending_depth", staticmethod(lambda: 1))
+    monkeypatch.setattr(AdmissionController, "depth_retry_after", staticmethod(lambda default: 42.0))
+    assert controller.admit("c")["retry_after"] == 42.0
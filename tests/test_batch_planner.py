@@ -0,0 +1,21 @@
+from tools.batch_planner import expected_cached, order_for_cache_reuse
+
+def test_order_groups_jobs_with_shared_nodes():
+    hash_sets = [{"a", "x1"}, {"b", "y1"}, {"a", "x2"}, {"b", "y2"}, {"a", "x3"}]
+    order = order_for_cache_reuse(hash_sets)
+    assert order == [0, 2, 4, 1, 3]
+    assert expected_cached(hash_sets, order) == [0, 1, 1, 0, 1]
+    assert sum(expected_cached(hash_sets, list(range(5)))) == 0
+
+def test_order_starts_with_most_shared_job():
+    hash_sets = [{"u"}, {"a", "b", "c"}, {"a", "b"}, {"b", "c"}]
+    assert order_for_cache_reuse(hash_sets)[0] == 1
+
+def test_order_is_stable_for_ties():
+    hash_sets = [{"a"}, {"b"}, {"c"}]
+    assert order_for_cache_reuse(hash_sets) == [0, 1, 2]
+
+def test_order_empty_and_single():
+    assert order_for_cache_reuse([]) == []
+    assert order_for_cache_reuse([{"a"}]) == [0]
+    assert expected_cached([{"a"}], [0]) == [0]
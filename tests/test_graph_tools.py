@@ -0,0 +1,122 @@
+import pytest
+
+from tools import graph_tools
+from tools.graph_tools import analyze_graph, prune_graph
+
+@pytest.fixture(autouse=True)
+def output_classes(monkeypatch):
+    # 不依赖 ComfyUI 的 NODE_CLASS_MAPPINGS
+    monkeypatch.setattr(graph_tools, "is_output_class", lambda class_type: class_type in {"SaveImage", "PreviewImage"})
+
+def txt2img():
+    return {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}},
+        "5": {"class_type": "EmptyLatentImage", "inputs": {"width": 512, "height": 512, "batch_size": 1}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a cat", "clip": ["4", 1]}},
+        "3": {"class_type": "KSampler", "inputs": {"model": ["4", 0], "positive": ["6", 0],
+                                                   "latent_image": ["5", 0], "steps": 20}},
+        "8": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["4", 2]}},
+        "9": {"class_type": "SaveImage", "inputs": {"images": ["8", 0]}},
+    }
+
+def test_analyze_graph_orders_reachable_nodes():
+    analysis = analyze_graph(txt2img())
+    assert analysis["valid"]
+    assert analysis["node_count"] == 6
+    assert analysis["output_nodes"] == ["9"]
+    order = analysis["order"]
+    assert sorted(order) == ["3", "4", "5", "6", "8", "9"]
+    for upstream, downstream in [("4", "6"), ("6", "3"), ("5", "3"), ("3", "8"), ("8", "9")]:
+        assert order.index(upstream) < order.index(downstream)
+    assert analysis["pruned_nodes"] == []
+
+def test_analyze_graph_reports_unused_nodes():
+    prompt = txt2img()
+    prompt["10"] = {"class_type": "LoraLoader", "inputs": {"model": ["4", 0], "lora_name": "x.safetensors"}}
+    prompt["11"] = {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["10", 0]}}
+    analysis = analyze_graph(prompt)
+    assert analysis["valid"]
+    assert analysis["pruned_nodes"] == [{"id": "10", "class_type": "LoraLoader"},
+                                        {"id": "11", "class_type": "VAEDecode"}]
+    assert "10" not in analysis["order"]
+
+def test_analyze_graph_detects_cycles():
+    prompt = txt2img()
+    prompt["3"]["inputs"]["latent_image"] = ["8", 0]
+    analysis = analyze_graph(prompt)
+    assert not analysis["valid"]
+    assert analysis["cycles"] == ["3", "8", "9"]
+
+def test_analyze_graph_detects_dangling_links():
+    prompt = txt2img()
+    prompt["8"]["inputs"]["vae"] = ["99", 0]
+    analysis = analyze_graph(prompt)
+    assert not analysis["valid"]
+    assert analysis["dangling_links"] == [{"node": "8", "input": "vae", "target": "99"}]
+
+def test_analyze_graph_ignores_dangling_links_in_pruned_nodes():
+    prompt = txt2img()
+    prompt["10"] = {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["99", 0]}}
+    analysis = analyze_graph(prompt)
+    assert analysis["valid"]
+    assert len(analysis["dangling_links"]) == 1
+
+def test_analyze_graph_without_output_nodes_is_invalid():
+    prompt = txt2img()
+    del prompt["9"]
+    analysis = analyze_graph(prompt)
+    assert not analysis["valid"]
+    assert analysis["output_nodes"] == []
+    assert analysis["order"] == []
+
+def test_analyze_graph_skips_non_node_entries():
+    prompt = txt2img()
+    prompt["extra"] = {"not": "a node"}
+    assert analyze_graph(prompt)["node_count"] == 6
+
+def test_prune_graph_removes_unused_nodes():
+    prompt = txt2img()
+    prompt["10"] = {"class_type": "PreviewImage", "inputs": {"images": ["8", 0]}}
+    prompt["11"] = {"class_type": "CLIPTextEncode", "inputs": {"text": "unused", "clip": ["4", 1]}}
+    pruned, analysis = prune_graph(prompt)
+    assert set(pruned) == {"3", "4", "5", "6", "8", "9", "10"}
+    assert pruned["3"] is prompt["3"]
+    assert [node["id"] for node in analysis["pruned_nodes"]] == ["11"]
+
+def test_prune_graph_keeps_everything_without_output_nodes():
+    prompt = txt2img()
+    del prompt["9"]
+    pruned, analysis = prune_graph(prompt)
+    assert pruned is prompt
+    assert len(analysis["pruned_nodes"]) == 5
+
+def test_analyze_workflow_rejects_invalid_json():
+    assert "error" in graph_tools.analyze_workflow("{not json")
+
+def test_subgraph_hashes_match_for_identical_upstream():
+    first, second = txt2img(), txt2img()
+    second["6"]["inputs"]["text"] = "a dog"
+    first_hashes, second_hashes = graph_tools.subgraph_hashes(first), graph_tools.subgraph_hashes(second)
+    assert set(first_hashes) == set(first)
+    # 未受改动影响的上游节点哈希相同，改动节点及其下游不同
+    for node_id in ("4", "5"):
+        assert first_hashes[node_id] == second_hashes[node_id]
+    for node_id in ("6", "3", "8", "9"):
+        assert first_hashes[node_id] != second_hashes[node_id]
+
+def test_subgraph_hashes_ignore_node_ids():
+    renumbered = {f"n{node_id}": {"class_type": node["class_type"], "inputs": {
+        name: [f"n{value[0]}", value[1]] if graph_tools.is_link(value) else value
+        for name, value in node["inputs"].items()}} for node_id, node in txt2img().items()}
+    assert graph_tools.subgraph_hashes(renumbered)["n9"] == graph_tools.subgraph_hashes(txt2img())["9"]
+
+def test_subgraph_hashes_distinguish_output_index():
+    first, second = txt2img(), txt2img()
+    second["8"]["inputs"]["vae"] = ["4", 0]
+    assert graph_tools.subgraph_hashes(first)["8"] != graph_tools.subgraph_hashes(second)["8"]
+
+def test_subgraph_hashes_skip_cycles_and_dangling_links():
+    prompt = txt2img()
+    prompt["3"]["inputs"]["latent_image"] = ["8", 0]
+    prompt["6"]["inputs"]["clip"] = ["99", 1]
+    assert set(graph_tools.subgraph_hashes(prompt)) == {"4", "5"}
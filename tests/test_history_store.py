@@ -0,0 +1,165 @@
+import json
+import sqlite3
+
+import pytest
+
+from conftest import history_item
+from tools import history_store as history_store_module
+from tools import history_tools
+from tools.events import TASK_DONE_EVENT
+from tools.history_store import SCHEMA_VERSION, HistoryStore
+
+def graph(text="a red fox", ckpt="sdxl.safetensors"):
+    return {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ckpt}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": text, "clip": ["4", 1]}},
+        "9": {"class_type": "SaveImage", "inputs": {"images": ["6", 0]}},
+    }
+
+@pytest.fixture
+def config(fake_config):
+    values = {}
+    fake_config(history_store_module, values)
+    return values
+
+@pytest.fixture
+def make_store(tmp_path, fake_server, config):
+    stores = []
+
+    def make():
+        store = HistoryStore(str(tmp_path / "history.db"))
+        store.start()
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.stop()
+        store._thread.join(5)
+
+def finish(server, store, prompt_id, **kwargs):
+    """模拟 ComfyUI 执行完一个任务：写入内存历史记录并分发任务结束事件"""
+    server.prompt_queue.history[prompt_id] = history_item(prompt_id, **kwargs)
+    store.on_event(TASK_DONE_EVENT, {"prompt_id": prompt_id})
+
+def test_write_then_read(fake_server, make_store):
+    store = make_store()
+    finish(fake_server, store, "p1", graph=graph(), client_id="c1")
+    finish(fake_server, store, "p2", graph=graph("a blue whale"), status="error")
+    assert store.flush()
+
+    assert store.get("p1") == {"p1": fake_server.prompt_queue.history["p1"]}
+    assert list(store.recent()) == ["p1", "p2"]
+    assert list(store.recent(1)) == ["p2"]
+    assert [row["prompt_id"] for row in store.query(status="error")] == ["p2"]
+    assert [row["prompt_id"] for row in store.query(client_id="c1")] == ["p1"]
+    assert [row["prompt_id"] for row in store.search(text="fox")] == ["p1"]
+    assert [row["prompt_id"] for row in store.search(model="sdxl")] == ["p2", "p1"]
+    assert store.stats["written"] == 2
+
+def test_since_pages_in_write_order(fake_server, make_store):
+    store = make_store()
+    for index in range(5):
+        finish(fake_server, store, f"p{index}")
+    store.flush()
+
+    page = store.since(0, limit=2)
+    assert list(page["history"]) == ["p0", "p1"] and page["has_more"]
+    page = store.since(page["next_seq"], limit=10)
+    assert list(page["history"]) == ["p2", "p3", "p4"] and not page["has_more"]
+    assert store.since(page["next_seq"])["history"] == {}
+
+def test_duplicate_task_done_is_written_once(fake_server, make_store):
+    store = make_store()
+    finish(fake_server, store, "p1")
+    store.on_event(TASK_DONE_EVENT, {"prompt_id": "p1"})
+    store.flush()
+    store.on_event(TASK_DONE_EVENT, {"prompt_id": "p1"})
+    store.flush()
+    assert store.stats["written"] == 1
+
+def test_backfills_prompts_completed_before_start(fake_server, make_store):
+    for prompt_id in ("old1", "old2"):
+        fake_server.prompt_queue.history[prompt_id] = history_item(prompt_id)
+    store = make_store()
+    # 启动后的第一次循环即扫描 prompt_queue.history
+    store.flush()
+    store.flush()
+    assert set(store.recent()) == {"old1", "old2"}
+    assert store._missing_from_queue() == []
+
+def test_delete_and_delete_matching(fake_server, make_store):
+    store = make_store()
+    finish(fake_server, store, "p1", graph=graph(), client_id="c1", completed_at=1000.0)
+    finish(fake_server, store, "p2", client_id="c1", completed_at=2000.0)
+    finish(fake_server, store, "p3", client_id="c2", completed_at=3000.0)
+    store.flush()
+
+    assert store.delete(["p1"]) == 1
+    assert store.get("p1") == {}
+    assert store.search(text="fox") == []
+
+    assert store.delete_matching(client_id="c1", completed_before=2500.0) == ["p2"]
+    assert list(store.recent()) == ["p3"]
+    assert store.delete() == 1
+    assert store.recent() == {}
+
+def test_max_rows_keeps_newest(fake_server, make_store, config):
+    config[("database", "max_rows")] = 2
+    store = make_store()
+    for index in range(4):
+        finish(fake_server, store, f"p{index}")
+    store.flush()
+    assert list(store.recent()) == ["p2", "p3"]
+
+def test_known_ids_are_bounded(fake_server, make_store, monkeypatch):
+    monkeypatch.setattr(history_store_module, "MAX_KNOWN_PROMPTS", 2)
+    store = make_store()
+    for index in range(3):
+        finish(fake_server, store, f"p{index}")
+    store.flush()
+    assert list(store._known) == ["p1", "p2"]
+
+    store.stop()
+    store._thread.join(5)
+    # 重启后只加载最新的记录
+    assert list(make_store()._known) == ["p1", "p2"]
+
+def test_migrates_old_database(tmp_path, fake_server, config):
+    path = str(tmp_path / "history.db")
+    connection = sqlite3.connect(path)
+    connection.executescript(history_store_module.SCHEMA.split("CREATE INDEX")[0])
+    connection.execute(
+        "INSERT INTO history (prompt_id, status, recorded_at, item) VALUES (?, ?, ?, ?)",
+        ("legacy", "success", 1.0, json.dumps(history_item("legacy", graph=graph("an old lighthouse")))),
+    )
+    connection.commit()
+    connection.close()
+
+    store = HistoryStore(path)
+    store.start()
+    try:
+        assert [row["prompt_id"] for row in store.search(text="lighthouse")] == ["legacy"]
+        version = store._reader().execute("PRAGMA user_version").fetchone()[0]
+        assert version == SCHEMA_VERSION
+        assert "legacy" in store._known
+    finally:
+        store.stop()
+
+def test_get_history_reads_database_with_default_limit(fake_server, make_store, fake_config, monkeypatch):
+    store = make_store()
+    for index in range(3):
+        finish(fake_server, store, f"p{index}")
+    monkeypatch.setattr(history_tools, "get_history_store", lambda: store)
+    fake_config(history_tools, {("database", "max_history_items"): 2})
+
+    assert list(history_tools.get_history()) == ["p1", "p2"]
+    assert list(history_tools.get_history(max_items=3)) == ["p0", "p1", "p2"]
+    page = history_tools.get_history(since_seq=0)
+    assert list(page["history"]) == ["p0", "p1"] and page["has_more"]
+
+def test_get_history_without_database(fake_server, monkeypatch):
+    fake_server.prompt_queue.history["p1"] = history_item("p1")
+    monkeypatch.setattr(history_tools, "get_history_store", lambda: None)
+    assert list(history_tools.get_history()) == ["p1"]
+    assert "error" in history_tools.get_history(since_seq=0)
@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+from conftest import history_item
+from tools import admission, graph_tools, history_store, job_journal, scheduler_tools, workflow_tools
+from tools.job_journal import JobJournal
+
+WORKFLOW = {"9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "x"}}}
+
+@pytest.fixture
+def posted(monkeypatch, fake_server, fake_config):
+    """替换 ComfyUI 的 post_prompt：记录提交，并像 ComfyUI 一样把任务放入队列"""
+    calls = []
+
+    def post_prompt(workflow_data, client_id=None, prompt_id=None):
+        calls.append({"workflow": workflow_data, "client_id": client_id, "prompt_id": prompt_id})
+        fake_server.prompt_queue.queue.append((len(calls), prompt_id, workflow_data, {}, []))
+        return {"prompt_id": prompt_id, "number": len(calls)}
+
+    monkeypatch.setattr(workflow_tools, "post_prompt", post_prompt)
+    monkeypatch.setattr(history_store, "get_history_store", lambda: None)
+    fake_config(job_journal, {("journal", "fsync"): False})
+    return calls
+
+@pytest.fixture
+def open_journal(tmp_path, posted):
+    journals = []
+
+    def open_():
+        journal = JobJournal(str(tmp_path / "jobs.jsonl"))
+        journal.start()
+        journals.append(journal)
+        return journal
+
+    yield open_
+    for journal in journals:
+        journal._file.close()
+
+def restart(fake_server, open_journal):
+    """模拟 ComfyUI 重启：队列清空，重新读取日志"""
+    fake_server.prompt_queue.queue.clear()
+    return open_journal()
+
+def test_replays_pending_jobs_after_restart(fake_server, open_journal, posted):
+    journal = open_journal()
+    journal.record_submit("p1", WORKFLOW, "c1")
+    journal.record_submit("p2", WORKFLOW, "c2")
+    journal.mark_finished(["p2"])
+
+    journal = restart(fake_server, open_journal)
+    results = journal.replay()
+
+    assert [result["prompt_id"] for result in results] == ["p1"]
+    assert posted == [{"workflow": WORKFLOW, "client_id": "c1", "prompt_id": "p1"}]
+    assert journal.status()["pending"] == 1
+
+    journal.mark_finished(["p1"], "success")
+    journal = restart(fake_server, open_journal)
+    assert journal.replay() == []
+    assert len(posted) == 1
+
+def test_replay_skips_jobs_already_in_history(fake_server, open_journal, posted):
+    journal = open_journal()
+    journal.record_submit("p1", WORKFLOW)
+
+    journal = restart(fake_server, open_journal)
+    fake_server.prompt_queue.history["p1"] = history_item("p1")
+    assert journal.replay() == []
+    assert posted == []
+    assert journal.status()["pending"] == 0
+
+def test_failed_replay_is_not_retried(fake_server, open_journal, monkeypatch):
+    journal = open_journal()
+    journal.record_submit("p1", WORKFLOW)
+    monkeypatch.setattr(workflow_tools, "post_prompt", lambda *args: {"error": "invalid prompt"})
+
+    journal = restart(fake_server, open_journal)
+    assert journal.replay()[0]["result"] == {"error": "invalid prompt"}
+    assert journal.status()["pending"] == 0
+
+def test_ignores_torn_last_line(fake_server, open_journal):
+    journal = open_journal()
+    journal.record_submit("p1", WORKFLOW, key="k1")
+    journal._file.write('{"op": "done", "prompt_')
+    journal._file.flush()
+
+    journal = restart(fake_server, open_journal)
+    assert journal.lookup("k1") == "p1"
+    assert journal.status()["pending"] == 1
+
+def test_duplicate_idempotency_key(fake_server, open_journal):
+    journal = open_journal()
+    assert journal.record_submit("p1", WORKFLOW, key="k1") is None
+    assert journal.record_submit("p2", WORKFLOW, key="k1") == "p1"
+    assert journal.lookup("k1") == "p1"
+    assert journal.lookup("k2") is None
+
+    # 幂等键在重启后仍然有效，提交被拒绝后释放
+    journal = restart(fake_server, open_journal)
+    assert journal.lookup("k1") == "p1"
+    journal.record_failed("p1")
+    assert journal.lookup("k1") is None
+    assert journal.record_submit("p3", WORKFLOW, key="k1") is None
+
+@pytest.fixture
+def submit(open_journal, monkeypatch):
+    """走 submit_workflow 的完整流程，使用临时任务日志"""
+    journal = open_journal()
+    monkeypatch.setattr(job_journal, "get_job_journal", lambda: journal)
+    monkeypatch.setattr(admission.admission_controller, "admit", lambda client_id=None: None)
+    monkeypatch.setattr(graph_tools, "is_output_class", lambda class_type: class_type == "SaveImage")
+    monkeypatch.setattr(scheduler_tools.model_scheduler, "reorder", lambda: None)
+
+    def submit_(**kwargs):
+        return workflow_tools.submit_workflow(json.dumps(WORKFLOW), **kwargs)
+
+    submit_.journal = journal
+    return submit_
+
+def test_submit_with_duplicate_key_returns_first_prompt(submit, posted):
+    first = submit(idempotency_key="k1")
+    second = submit(idempotency_key="k1")
+    assert second == {"prompt_id": first["prompt_id"], "duplicate": True}
+    assert len(posted) == 1
+
+def test_submit_rejected_by_comfyui_releases_key(submit, posted, monkeypatch):
+    monkeypatch.setattr(workflow_tools, "post_prompt", lambda *args: {"error": "invalid prompt"})
+    assert submit(idempotency_key="k1")["error"] == "invalid prompt"
+    assert submit.journal.lookup("k1") is None
+    assert submit.journal.status()["entries"] == 0
+
+def test_submit_timeout_before_enqueue_releases_key(submit, posted, monkeypatch):
+    def post_prompt(*args):
+        raise TimeoutError("post_prompt timed out")
+
+    monkeypatch.setattr(workflow_tools, "post_prompt", post_prompt)
+    assert "error" in submit(idempotency_key="k1")
+    assert submit.journal.lookup("k1") is None
+    assert submit.journal.status()["pending"] == 0
+
+def test_submit_timeout_after_enqueue_keeps_key(submit, posted, fake_server, monkeypatch):
+    original = workflow_tools.post_prompt
+
+    def post_prompt(*args):
+        # ComfyUI 已入队，但响应超时
+        original(*args)
+        raise TimeoutError("post_prompt timed out")
+
+    monkeypatch.setattr(workflow_tools, "post_prompt", post_prompt)
+    assert "error" in submit(idempotency_key="k1")
+    prompt_id = posted[0]["prompt_id"]
+    assert submit.journal.lookup("k1") == prompt_id
+    # 重试返回已入队的任务，不会重复提交
+    assert submit(idempotency_key="k1") == {"prompt_id": prompt_id, "duplicate": True}
+    assert len(posted) == 1
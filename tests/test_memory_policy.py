@@ -0,0 +1,81 @@
+import pytest
+
+from tools import memory_policy as memory_policy_module
+from tools.memory_policy import MemoryPressurePolicy
+
+GB = 1024 ** 3
+
+@pytest.fixture
+def prompt_queue(fake_server):
+    return fake_server.prompt_queue
+
+@pytest.fixture
+def config(fake_config):
+    values = {
+        ("memory_policy", "vram_low_free_ratio"): 0.1,
+        ("memory_policy", "vram_recover_free_ratio"): 0.25,
+        ("memory_policy", "unload_models"): True,
+        ("memory_policy", "retry_interval"): 60.0,
+    }
+    fake_config(memory_policy_module, values)
+    return values
+
+def vram(free_ratio):
+    return {"time": 0.0, "vram": {"free": int(free_ratio * 10 * GB), "total": 10 * GB, "free_ratio": free_ratio}}
+
+def policy_with(samples):
+    policy = MemoryPressurePolicy()
+    samples = iter(samples)
+    policy.sample = lambda: next(samples)
+    return policy
+
+def test_free_memory_does_not_unload_models(prompt_queue, config):
+    MemoryPressurePolicy()._request("vram", vram(0.05)["vram"], "free_memory")
+    # prompt_worker 把缺失的 unload_models 当作 free_memory 的值
+    assert prompt_queue.flags == {"free_memory": True, "unload_models": False}
+
+def test_unload_models_only_sets_unload_flag(prompt_queue, config):
+    MemoryPressurePolicy()._request("vram", vram(0.05)["vram"], "unload_models")
+    assert prompt_queue.flags == {"unload_models": True}
+
+def test_free_memory_keeps_existing_unload_request(prompt_queue, config):
+    prompt_queue.set_flag("unload_models", True)
+    MemoryPressurePolicy()._request("vram", vram(0.05)["vram"], "free_memory")
+    assert prompt_queue.flags == {"unload_models": True, "free_memory": True}
+
+def test_escalates_to_unload_models_when_free_memory_is_not_enough(prompt_queue, config):
+    policy = policy_with([vram(0.05), vram(0.06), vram(0.06), vram(0.5)])
+
+    assert policy.check()["action"] == "free_memory"
+    assert prompt_queue.get_flags() == {"free_memory": True, "unload_models": False}
+
+    entry = policy.check()
+    assert entry["action"] == "free_memory"
+    assert policy._pending["action"] == "unload_models"
+    assert prompt_queue.get_flags() == {"unload_models": True}
+
+    assert policy.check()["action"] == "unload_models"
+    assert policy._pending is None
+    assert policy.check() is None
+    assert policy._armed["vram"]
+
+def test_waits_until_worker_consumes_flags(prompt_queue, config):
+    policy = policy_with([vram(0.05), vram(0.05)])
+    policy.check()
+    assert policy.check() is None
+    assert policy._pending["action"] == "free_memory"
+
+def test_no_escalation_when_unloading_disabled(prompt_queue, config):
+    config[("memory_policy", "unload_models")] = False
+    policy = policy_with([vram(0.05), vram(0.05), vram(0.05)])
+
+    policy.check()
+    prompt_queue.get_flags()
+    entry = policy.check()
+
+    assert entry["action"] == "free_memory"
+    assert policy._pending is None
+    assert prompt_queue.flags == {}
+    # 冷却期内不再触发
+    assert policy._armed["vram"] and policy._retry_at["vram"] > 0
+    assert policy.check() is None
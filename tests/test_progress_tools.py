@@ -0,0 +1,32 @@
+import asyncio
+
+from tools.progress_tools import ProgressTracker
+
+def test_stream_clears_session_throttle_when_last_prompt_finishes():
+    tracker = ProgressTracker()
+    tracker.install = lambda: True
+    sent = []
+
+    async def report(progress, total, message):
+        sent.append((progress, message))
+
+    async def run():
+        tracker.watch("p1", {"1": {"class_type": "KSampler"}})
+        tracker.watch("p2", {"1": {"class_type": "KSampler"}})
+        first = asyncio.ensure_future(tracker.stream("p1", report, session_key="s", timeout=5))
+        await asyncio.sleep(0.01)
+
+        tracker.on_event("execution_success", {"prompt_id": "p2"})
+        assert (await tracker.stream("p2", report, session_key="s", timeout=5))["status"] == "success"
+        # 同一会话还有任务在推送进度，保留节流记录
+        assert tracker._session_streams == {"s": 1}
+        assert "s" in tracker._last_notify
+
+        tracker.on_event("execution_success", {"prompt_id": "p1"})
+        assert (await first)["status"] == "success"
+
+    asyncio.run(run())
+    assert sent
+    assert tracker._session_streams == {}
+    assert tracker._last_notify == {}
+    assert tracker._waiters == {}
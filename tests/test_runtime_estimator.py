@@ -0,0 +1,92 @@
+import pytest
+
+from tools import graph_tools, runtime_estimator
+from tools.graph_tools import node_features
+from tools.runtime_estimator import RuntimeEstimator
+
+@pytest.fixture(autouse=True)
+def output_classes(monkeypatch):
+    monkeypatch.setattr(graph_tools, "is_output_class", lambda class_type: class_type == "SaveImage")
+
+@pytest.fixture(autouse=True)
+def config(fake_config):
+    fake_config(runtime_estimator, {("estimator", "default_node_seconds"): 0.25})
+
+def sample(seconds, steps=None, megapixels=None):
+    return {"seconds": seconds, "steps": steps, "megapixels": megapixels}
+
+def estimator_with(models):
+    estimator = RuntimeEstimator()
+    estimator.model = lambda class_type: models.get(class_type)
+    return estimator
+
+def test_build_model_without_samples():
+    assert RuntimeEstimator()._build_model([]) is None
+
+def test_build_model_rates_per_feature_shape():
+    model = RuntimeEstimator()._build_model([
+        sample(10.0, steps=20, megapixels=1.0),
+        sample(6.0, steps=20, megapixels=0.5),
+        sample(2.0, steps=10),
+        sample(1.0),
+    ])
+    assert model["samples"] == 4
+    assert model["mean_seconds"] == pytest.approx(4.75)
+    # (有步数, 有尺寸) -> (每单位工作量的秒数, 样本数)
+    assert model["rates"][(True, True)] == (pytest.approx(16.0 / 30.0), 2)
+    assert model["rates"][(True, False)] == (pytest.approx(0.2), 1)
+    assert model["rates"][(False, False)] == (pytest.approx(1.0), 1)
+
+def test_estimate_node_scales_by_work():
+    model = RuntimeEstimator()._build_model([sample(10.0, steps=20, megapixels=1.0)])
+    estimate = estimator_with({"KSampler": model}).estimate_node("KSampler", 40, 0.5)
+    assert estimate == {"seconds": pytest.approx(10.0), "basis": "scaled", "samples": 1}
+
+def test_estimate_node_falls_back_to_mean():
+    model = RuntimeEstimator()._build_model([sample(10.0, steps=20, megapixels=1.0), sample(2.0, steps=20, megapixels=1.0)])
+    estimator = estimator_with({"KSampler": model})
+    # 没有该特征组合的样本
+    assert estimator.estimate_node("KSampler", 20, None) == {"seconds": 6.0, "basis": "mean", "samples": 2}
+    # 不带特征的节点不按工作量折算
+    model = RuntimeEstimator()._build_model([sample(3.0), sample(5.0)])
+    assert estimator_with({"CLIPTextEncode": model}).estimate_node("CLIPTextEncode", None, None)["basis"] == "mean"
+
+def test_estimate_node_default_without_history():
+    assert estimator_with({}).estimate_node("KSampler", 20, 1.0) == {"seconds": 0.25, "basis": "default", "samples": 0}
+
+def test_estimate_sums_reachable_nodes():
+    prompt = {
+        "5": {"class_type": "EmptyLatentImage", "inputs": {"width": 1024, "height": 1024, "batch_size": 2}},
+        "3": {"class_type": "KSampler", "inputs": {"latent_image": ["5", 0], "steps": 10}},
+        "8": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0]}},
+        "9": {"class_type": "SaveImage", "inputs": {"images": ["8", 0]}},
+        "10": {"class_type": "UnusedNode", "inputs": {}},
+    }
+    estimator = estimator_with({
+        "KSampler": RuntimeEstimator()._build_model([sample(5.0, steps=20, megapixels=1.048576)]),
+        "VAEDecode": RuntimeEstimator()._build_model([sample(1.0, megapixels=1.048576)]),
+        "SaveImage": RuntimeEstimator()._build_model([sample(0.5)]),
+    })
+
+    result = estimator.estimate(prompt)
+
+    nodes = {node["node"]: node for node in result["nodes"]}
+    assert set(nodes) == {"5", "3", "8", "9"}
+    assert nodes["3"]["seconds"] == pytest.approx(5.0)
+    assert nodes["8"]["seconds"] == pytest.approx(2.0)
+    assert nodes["5"]["basis"] == "default"
+    assert result["estimated_seconds"] == pytest.approx(7.75)
+    assert result["coverage"] == 0.75
+    assert result["unknown_classes"] == ["EmptyLatentImage"]
+
+def test_node_features_follow_links_upstream():
+    features = node_features({
+        "5": {"class_type": "EmptyLatentImage", "inputs": {"width": 512, "height": 512, "batch_size": 4}},
+        "3": {"class_type": "KSampler", "inputs": {"latent_image": ["5", 0], "steps": 30}},
+        "8": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0]}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a cat"}},
+    })
+    assert features["3"] == {"class_type": "KSampler", "steps": 30, "megapixels": pytest.approx(1.048576)}
+    assert features["8"]["megapixels"] == pytest.approx(1.048576)
+    assert features["8"]["steps"] is None
+    assert features["6"]["megapixels"] is None
@@ -0,0 +1,66 @@
+from tools.scheduler_tools import ModelAffinityScheduler, count_model_swaps, model_signature
+
+def workflow(ckpt, lora=None):
+    prompt = {
+        "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ckpt}},
+        "2": {"class_type": "KSampler", "inputs": {"model": ["1", 0], "steps": 20}},
+    }
+    if lora:
+        prompt["3"] = {"class_type": "LoraLoader", "inputs": {"lora_name": lora, "model": ["1", 0]}}
+    return prompt
+
+def queue_item(number, prompt_id, prompt):
+    return (number, prompt_id, prompt, {}, [])
+
+def test_model_signature_collects_loader_files():
+    signature = model_signature(workflow("sdxl.safetensors", "style.safetensors"))
+    assert signature == (("CheckpointLoaderSimple", "sdxl.safetensors"), ("LoraLoader", "style.safetensors"))
+
+def test_model_signature_ignores_linked_inputs_and_other_nodes():
+    prompt = {
+        "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ["9", 0]}},
+        "2": {"class_type": "KSampler", "inputs": {"ckpt_name": "not-a-loader.safetensors"}},
+        "extra": "not a node",
+    }
+    assert model_signature(prompt) == ()
+
+def test_count_model_swaps():
+    a, b = model_signature(workflow("a")), model_signature(workflow("b"))
+    assert count_model_swaps([a, b, a, b]) == 3
+    assert count_model_swaps([a, a, b, b]) == 1
+    assert count_model_swaps([a, a], current=b) == 1
+    assert count_model_swaps([]) == 0
+
+def test_plan_groups_jobs_by_current_model():
+    items = [queue_item(1, "b1", workflow("b")), queue_item(2, "a1", workflow("a")),
+             queue_item(3, "b2", workflow("b")), queue_item(4, "a2", workflow("a"))]
+    signatures = {item[1]: model_signature(item[2]) for item in items}
+    scheduler = ModelAffinityScheduler()
+
+    ordered = scheduler._plan(items, signatures, signatures["a1"], max_deferrals=10)
+
+    assert [item[1] for item in ordered] == ["a1", "a2", "b1", "b2"]
+    before = count_model_swaps([signatures[item[1]] for item in items], signatures["a1"])
+    after = count_model_swaps([signatures[item[1]] for item in ordered], signatures["a1"])
+    assert (before, after) == (4, 1)
+
+def test_plan_keeps_order_without_current_model():
+    items = [queue_item(1, "a1", workflow("a")), queue_item(2, "b1", workflow("b")),
+             queue_item(3, "a2", workflow("a"))]
+    signatures = {item[1]: model_signature(item[2]) for item in items}
+
+    ordered = ModelAffinityScheduler()._plan(items, signatures, None, max_deferrals=10)
+
+    assert [item[1] for item in ordered] == ["a1", "a2", "b1"]
+
+def test_plan_promotes_starved_jobs():
+    items = [queue_item(1, "b1", workflow("b")), queue_item(2, "a1", workflow("a")),
+             queue_item(3, "a2", workflow("a")), queue_item(4, "a3", workflow("a"))]
+    signatures = {item[1]: model_signature(item[2]) for item in items}
+    scheduler = ModelAffinityScheduler()
+
+    ordered = scheduler._plan(items, signatures, signatures["a1"], max_deferrals=2)
+
+    # b1 被推迟两次后必须优先执行
+    assert [item[1] for item in ordered] == ["a1", "a2", "b1", "a3"]
+    assert scheduler._deferrals["b1"] == 2
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from tools import sweep_tools, workflow_tools
+from tools.events import TASK_DONE_EVENT
+from tools.sweep_tools import Sweep, SweepManager
+
+WORKFLOW = {"3": {"class_type": "KSampler", "inputs": {"seed": 0}}}
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "等待超时"
+        time.sleep(0.01)
+
+@pytest.fixture
+def manager(fake_server, monkeypatch):
+    monkeypatch.setattr(workflow_tools, "submit_workflow",
+                        lambda workflow_json, client_id=None, prompt_id=None: {"prompt_id": prompt_id, "number": 1})
+    manager = SweepManager()
+    monkeypatch.setattr(sweep_tools, "sweep_manager", manager)
+    return manager
+
+def start(manager, seeds, max_in_flight):
+    sweep = Sweep(WORKFLOW, [("3.inputs.seed", "3", "seed", seeds)], max_in_flight, None)
+    manager.start(sweep)
+    wait_for(lambda: sweep.summary()["in_flight"] == min(len(seeds), max_in_flight))
+    return sweep
+
+def finish(server, manager, prompt_id):
+    server.prompt_queue.history[prompt_id] = {
+        "outputs": {"9": {"images": [{"filename": f"{prompt_id}.png", "type": "output"}]}},
+        "status": {"status_str": "success"},
+    }
+    manager.on_event(TASK_DONE_EVENT, {"prompt_id": prompt_id, "status_str": "success"})
+
+def test_collects_outputs_into_grid(fake_server, manager):
+    sweep = start(manager, [1, 2], 2)
+    for cell in list(sweep.cells):
+        finish(fake_server, manager, cell["prompt_id"])
+    wait_for(lambda: sweep.state == "completed")
+    grid = sweep.summary()["grid"]
+    assert [cell["status"] for cell in grid] == ["success", "success"]
+    assert grid[0]["outputs"] == [{"node": "9", "filename": f"{grid[0]['prompt_id']}.png", "type": "output"}]
+
+def test_cancel_without_delete_keeps_collecting_in_flight_cells(fake_server, manager):
+    sweep = start(manager, [1, 2, 3], 2)
+    assert sweep_tools.cancel_sweep(sweep.sweep_id, delete_queued=False)["deleted"] == []
+    wait_for(lambda: sweep.state == "cancelled")
+
+    for cell in list(sweep.cells):
+        finish(fake_server, manager, cell["prompt_id"])
+    summary = sweep.summary()
+    # 第三个组合不再提交，已在队列中的两个任务完成后仍收集输出
+    assert summary["submitted"] == 2 and summary["in_flight"] == 0
+    assert summary["status_counts"] == {"success": 2}
+    assert all(cell["outputs"] for cell in summary["grid"])
@@ -0,0 +1,37 @@
+import inspect
+
+from tools.template_tools import build_template_function, derive_parameters
+
+def template(workflow):
+    return {"name": "run_test_tool", "file": "test.json", "parameters": derive_parameters(workflow)}
+
+def names(workflow):
+    return [parameter["name"] for parameter in derive_parameters(workflow)]
+
+def test_unique_input_names_are_used_directly():
+    workflow = {
+        "3": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": 20, "model": ["4", 0]}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a fox"}},
+    }
+    assert names(workflow) == ["seed", "steps", "text"]
+
+def test_colliding_identifiers_get_node_suffix():
+    workflow = {
+        "3": {"class_type": "Custom", "inputs": {"max-size": 1, "max_size": 2, "Max Size": 3}},
+        "6": {"class_type": "Custom", "inputs": {"max_size": 4}},
+    }
+    assert names(workflow) == ["max_size_3", "max_size_3_2", "max_size_3_3", "max_size_6"]
+
+def test_keywords_and_non_ascii_names():
+    workflow = {
+        "3": {"class_type": "Custom", "inputs": {"lambda": 0.5, "class": "a", "提示词": "b", "负面": "c"}},
+        "6": {"class_type": "Custom", "inputs": {"client_id": "d"}},
+    }
+    assert names(workflow) == ["lambda_", "class_", "w_3", "w_3_2", "client_id_6"]
+
+def test_build_signature_for_awkward_inputs():
+    workflow = {
+        "3": {"class_type": "Custom", "inputs": {"lambda": 0.5, "提示词": "b", "负面": "c", "a-b": 1, "a_b": 2}},
+    }
+    tool = build_template_function(template(workflow))
+    assert list(inspect.signature(tool).parameters) == ["lambda_", "w_3", "w_3_2", "a_b_3", "a_b_3_2", "client_id"]
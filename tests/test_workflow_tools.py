@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from tools import admission, graph_tools, job_journal, progress_tools, queue_snapshot, scheduler_tools, workflow_tools
+
+def txt2img():
+    return {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}},
+        "3": {"class_type": "KSampler", "inputs": {"model": ["4", 0], "steps": 20}},
+        "9": {"class_type": "SaveImage", "inputs": {"images": ["3", 0]}},
+    }
+
+@pytest.fixture
+def submitted(monkeypatch, fake_config):
+    """替换 ComfyUI 的 post_prompt，记录实际入队的工作流"""
+    calls = []
+
+    def post_prompt(workflow_data, client_id=None, prompt_id=None):
+        calls.append(workflow_data)
+        return {"prompt_id": prompt_id or f"p{len(calls)}", "number": len(calls)}
+
+    monkeypatch.setattr(workflow_tools, "post_prompt", post_prompt)
+    monkeypatch.setattr(graph_tools, "is_output_class", lambda class_type: class_type == "SaveImage")
+    monkeypatch.setattr(job_journal, "get_job_journal", lambda: None)
+    monkeypatch.setattr(admission.admission_controller, "admit", lambda client_id=None: None)
+    fake_config(workflow_tools, {("scheduler", "model_affinity"): True})
+    return calls
+
+@pytest.fixture
+def reorders(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scheduler_tools.model_scheduler, "reorder", lambda: calls.append(True))
+    return calls
+
+def test_submit_reorders_by_model_affinity(submitted, reorders):
+    result = workflow_tools.submit_workflow(json.dumps(txt2img()))
+    assert result["prompt_id"] == "p1"
+    assert reorders == [True]
+
+def test_submit_skips_reorder_when_requested(submitted, reorders):
+    result = workflow_tools.submit_workflow(json.dumps(txt2img()), reorder=False)
+    assert result["prompt_id"] == "p1"
+    assert reorders == []
+
+def test_reorder_failure_does_not_fail_queued_submit(submitted, monkeypatch):
+    def reorder():
+        raise RuntimeError("queue changed")
+
+    monkeypatch.setattr(scheduler_tools.model_scheduler, "reorder", reorder)
+    result = workflow_tools.submit_workflow(json.dumps(txt2img()))
+    assert result["prompt_id"] == "p1"
+    assert "error" not in result
+    assert len(submitted) == 1
+
+def test_progress_watch_failure_does_not_fail_queued_submit(submitted, reorders, monkeypatch):
+    def watch(prompt_id, workflow=None):
+        raise RuntimeError("tracker unavailable")
+
+    monkeypatch.setattr(progress_tools.progress_tracker, "watch", watch)
+    result = workflow_tools.submit_workflow(json.dumps(txt2img()))
+    assert result["prompt_id"] == "p1"
+    assert reorders == [True]
+
+def test_submit_invalidates_queue_snapshot(submitted, reorders, fake_server, monkeypatch):
+    snapshots = queue_snapshot.QueueSnapshotCache(ttl=60)
+    monkeypatch.setattr(queue_snapshot, "queue_snapshots", snapshots)
+    queue = fake_server.prompt_queue.queue
+    assert snapshots.get()["queue_pending"] == []
+
+    def post_prompt(workflow_data, client_id=None, prompt_id=None):
+        queue.append((1, "p1", workflow_data, {}, []))
+        return {"prompt_id": "p1", "number": 1}
+
+    monkeypatch.setattr(workflow_tools, "post_prompt", post_prompt)
+    workflow_tools.submit_workflow(json.dumps(txt2img()))
+    # 不等快照过期即可看到刚提交的任务
+    assert [item[1] for item in snapshots.get()["queue_pending"]] == ["p1"]
+
+def test_invalid_submissions_do_not_spend_admission_tokens(submitted, reorders, monkeypatch):
+    admitted = []
+    monkeypatch.setattr(admission.admission_controller, "admit", lambda client_id=None: admitted.append(client_id))
+    dangling = txt2img()
+    dangling["3"]["inputs"]["model"] = ["99", 0]
+
+    assert "error" in workflow_tools.submit_workflow("{not json", "c1")
+    assert "error" in workflow_tools.submit_workflow(json.dumps(dangling), "c1")
+    assert admitted == [] and submitted == []
+
+    workflow_tools.submit_workflow(json.dumps(txt2img()), "c1")
+    assert admitted == ["c1"] and len(submitted) == 1
@@ -4,36 +4,131 @@
 __version__ = "1.0.0"
 __author__ = "MIXLAB"
 
-# 导入所有工具模块
-from .workflow_tools import *
-from .history_tools import *
-from .file_tools import *
-from .system_tools import *
+import sys
+from typing import Dict, Any
+from .base_tools import lazy_import, get_import_profile as _get_import_profile
 
-__all__ = [
+# 工具注册表：工具名 -> 所在模块
+# 工具模块在首次访问对应工具时才会被导入，减少 MCP 启动时间和内存占用
+_TOOL_REGISTRY = {
     # 工作流执行相关工具
-    "submit_workflow",
-    "get_queue_info", 
-    "clear_queue",
-    "delete_queue_item",
-    "interrupt_processing",
-    "free_memory",
-    
+    "submit_workflow": "workflow_tools",
+    "get_queue_info": "workflow_tools",
+    "clear_queue": "workflow_tools",
+    "delete_queue_item": "workflow_tools",
+    "delete_queue_items": "workflow_tools",
+    "interrupt_processing": "workflow_tools",
+    "free_memory": "workflow_tools",
+
     # 历史记录管理工具
-    "get_history",
-    "get_history_by_id",
-    "clear_history",
-    "delete_history_item",
-    
-    # 文件上传和管理工具  
-    "upload_image",
-    "view_image",
-    
+    "get_history": "history_tools",
+    "get_history_by_id": "history_tools",
+    "clear_history": "history_tools",
+    "delete_history_item": "history_tools",
+    "delete_history_items": "history_tools",
+    "query_history": "history_store",
+    "search_history": "history_store",
+    "start_history_store": "history_store",
+
+    # 文件上传和管理工具
+    "upload_image": "file_tools",
+    "view_image": "file_tools",
+    "import_local_image": "file_tools",
+    "export_output_image": "file_tools",
+    "start_output_postprocess": "postprocess",
+    "get_output_variants": "postprocess",
+
     # 系统信息工具
-    "get_system_stats",
-    "get_features",
-    "get_object_info",
-    "get_object_info_by_node",
-    "get_queue_status",
-    "get_prompt_status",
-] 
\ No newline at end of file
+    "get_system_stats": "system_tools",
+    "get_features": "system_tools",
+    "get_object_info": "system_tools",
+    "get_object_info_by_node": "system_tools",
+    "get_queue_status": "system_tools",
+    "get_prompt_status": "system_tools",
+
+    # 进程内健康检查
+    "start_watchdog": "watchdog",
+    "get_health": "watchdog",
+
+    # 工具调用录制
+    "start_traffic_capture": "traffic_capture",
+
+    # 响应大小控制
+    "apply_response_budget": "response_budget",
+    "get_continuation": "response_budget",
+
+    # 节点目录
+    "search_nodes": "node_catalog",
+
+    # 工作流图分析工具
+    "analyze_workflow": "graph_tools",
+
+    # 缓存感知的批量提交
+    "plan_batch": "batch_planner",
+    "get_batch_plan": "batch_planner",
+
+    # 参数扫描工具
+    "start_sweep": "sweep_tools",
+    "get_sweep_result": "sweep_tools",
+    "cancel_sweep": "sweep_tools",
+
+    # 工作流模板工具
+    "list_workflow_templates": "template_tools",
+    "run_template": "template_tools",
+
+    # 执行进度工具
+    "get_prompt_progress": "progress_tools",
+    "wait_for_prompt": "progress_tools",
+
+    # 调度工具
+    "reorder_queue_by_model": "scheduler_tools",
+    "get_scheduler_stats": "scheduler_tools",
+
+    # 队列锁统计
+    "get_lock_stats": "lock_profiler",
+
+    # 任务日志
+    "start_job_journal": "job_journal",
+    "get_job_journal_status": "job_journal",
+
+    # 准入控制
+    "get_admission_stats": "admission",
+
+    # 运行时间预估
+    "estimate_workflow": "runtime_estimator",
+
+    # 内存压力策略
+    "start_memory_policy": "memory_policy",
+    "get_memory_policy_status": "memory_policy",
+}
+
+def __getattr__(name: str):
+    """按需导入工具所在模块"""
+    module_name = _TOOL_REGISTRY.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = lazy_import(f"{__name__}.{module_name}")
+    value = getattr(module, name)
+    # 缓存到包命名空间，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_TOOL_REGISTRY))
+
+def get_import_profile() -> Dict[str, Any]:
+    """
+    获取工具模块及重量级依赖的导入耗时报告
+
+    Returns:
+        导入耗时报告，包含尚未加载的工具模块
+    """
+    report = _get_import_profile()
+    # 以 sys.modules 为准：被其他工具模块直接导入的模块不会经过 lazy_import，导入耗时报告中没有记录
+    report["unloaded_tool_modules"] = sorted(
+        {module for module in _TOOL_REGISTRY.values() if f"{__name__}.{module}" not in sys.modules}
+    )
+    return report
+
+__all__ = list(_TOOL_REGISTRY) + ["get_import_profile"]
@@ -0,0 +1,151 @@
+"""
+准入控制 - 按客户端令牌桶限流，并限制队列中等待的任务总数
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from .base_tools import tools_base, get_config, lazy_import
+from .lock_profiler import queue_lock
+
+# 最多保留的客户端令牌桶数，超出后丢弃最久未使用的（被丢弃的客户端下次以满桶开始）
+MAX_BUCKETS = 1024
+# 未提供 client_id 的提交共用一个令牌桶
+ANONYMOUS_CLIENT = "anonymous"
+
+class AdmissionController:
+    """提交前检查队列深度和客户端速率，饱和时拒绝并给出重试等待时间"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 客户端ID -> [剩余令牌数, 上次补充时间]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.stats = {"admitted": 0, "rejected_rate": 0, "rejected_depth": 0}
+        self._rejected_by_client: Dict[str, int] = {}
+
+    @staticmethod
+    def limits() -> Dict[str, float]:
+        """读取准入配置"""
+        return {
+            "rate": get_config("admission", "rate_per_client", 1.0),
+            "burst": get_config("admission", "burst", 10.0),
+            "max_pending": get_config("admission", "max_pending", 100),
+            "retry_after": get_config("admission", "retry_after", 5.0),
+            "estimate_retry_after": get_config("admission", "estimate_retry_after", True),
+        }
+
+    @staticmethod
+    def depth_retry_after(default: float) -> float:
+        """队列饱和时的重试等待：按历史节点耗时预估的当前任务运行时间，无法预估时使用配置值"""
+        try:
+            estimate = lazy_import("tools.runtime_estimator").runtime_estimator.running_seconds()
+        except Exception:
+            estimate = None
+        return estimate if estimate else default
+
+    @staticmethod
+    def pending_depth() -> int:
+        """当前等待和执行中的任务数"""
+        prompt_server = tools_base.prompt_server
+        if prompt_server is None:
+            return 0
+        prompt_queue = prompt_server.prompt_queue
+        with queue_lock("submit_workflow"):
+            return len(prompt_queue.queue) + len(prompt_queue.currently_running)
+
+    def _take_token(self, client_id: str, rate: float, burst: float) -> float:
+        """
+        从客户端令牌桶中取一个令牌
+
+        Returns:
+            0 表示成功，否则为令牌补足所需的秒数
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = [burst, now]
+            self._buckets[client_id] = bucket
+            while len(self._buckets) > MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate if rate > 0 else float("inf")
+
+    def _reject(self, client_id: str, reason: str, retry_after: float, message: str) -> Dict[str, Any]:
+        self.stats[f"rejected_{reason}"] += 1
+        if client_id in self._rejected_by_client or len(self._rejected_by_client) < MAX_BUCKETS:
+            self._rejected_by_client[client_id] = self._rejected_by_client.get(client_id, 0) + 1
+        return {
+            "error": message,
+            "reason": reason,
+            "retry_after": round(retry_after, 3),
+        }
+
+    def admit(self, client_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        检查是否允许提交
+
+        Args:
+            client_id: 客户端ID（可选）
+
+        Returns:
+            允许时返回 None，拒绝时返回包含 retry_after（秒）的错误字典
+        """
+        if not get_config("admission", "enabled", False):
+            return None
+
+        client_id = client_id or ANONYMOUS_CLIENT
+        limits = self.limits()
+        depth = self.pending_depth()
+        saturated = limits["max_pending"] > 0 and depth >= limits["max_pending"]
+        retry_after = limits["retry_after"]
+        if saturated and limits["estimate_retry_after"]:
+            # 预估需要查询数据库，在加锁前完成
+            retry_after = self.depth_retry_after(retry_after)
+        with self._lock:
+            # 先检查队列深度，队列饱和时不消耗客户端令牌
+            if saturated:
+                return self._reject(client_id, "depth", retry_after,
+                                    f"队列已满（{depth}/{limits['max_pending']}），请稍后重试")
+            if limits["rate"] > 0:
+                wait = self._take_token(client_id, limits["rate"], limits["burst"])
+                if wait > 0:
+                    return self._reject(client_id, "rate", wait, f"客户端 {client_id} 提交过于频繁，请稍后重试")
+            self.stats["admitted"] += 1
+        return None
+
+    def status(self) -> Dict[str, Any]:
+        """获取准入配置、当前队列深度和拒绝计数"""
+        depth = self.pending_depth()
+        with self._lock:
+            top_rejected = sorted(self._rejected_by_client.items(), key=lambda item: item[1], reverse=True)[:10]
+            return {
+                "enabled": get_config("admission", "enabled", False),
+                "limits": self.limits(),
+                "pending": depth,
+                "tracked_clients": len(self._buckets),
+                **self.stats,
+                "rejected_by_client": dict(top_rejected),
+            }
+
+# 全局准入控制实例
+admission_controller = AdmissionController()
+
+def get_admission_stats() -> Dict[str, Any]:
+    """
+    获取准入控制统计
+
+    Returns:
+        准入配置、当前队列深度、通过和拒绝次数
+    """
+    try:
+        return admission_controller.status()
+    except Exception as e:
+        return {"error": f"获取准入控制统计失败: {e}"}
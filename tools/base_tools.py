@@ -4,9 +4,106 @@
 
 import sys
 import os
+import json
+import time
 import logging
+import threading
+import importlib
 from typing import Optional, Dict, Any
 
+# 延迟导入记录：模块名 -> 导入耗时等信息
+_import_profile: Dict[str, Dict[str, Any]] = {}
+_import_lock = threading.Lock()
+
+def lazy_import(module_name: str):
+    """
+    首次使用时才导入模块，并记录导入耗时
+    
+    Args:
+        module_name: 模块名（如 "torch"、"tools.workflow_tools"）
+    
+    Returns:
+        已导入的模块对象
+    """
+    module = sys.modules.get(module_name)
+    if module is not None and module_name in _import_profile:
+        return module
+    
+    with _import_lock:
+        if module_name in _import_profile:
+            return sys.modules[module_name]
+        
+        already_loaded = module_name in sys.modules
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        elapsed = time.perf_counter() - start
+        
+        _import_profile[module_name] = {
+            "seconds": round(elapsed, 6),
+            "already_loaded": already_loaded,
+            "first_use": time.time(),
+        }
+        return module
+
+# 插件根目录下的 config.json
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.json")
+_config_cache: Optional[Dict[str, Any]] = None
+
+def load_config() -> Dict[str, Any]:
+    """读取 config.json（只读取一次），文件缺失或格式错误时返回空配置"""
+    global _config_cache
+    if _config_cache is None:
+        try:
+            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                _config_cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.getLogger(__name__).warning(f"无法读取配置文件 {CONFIG_PATH}: {e}")
+            _config_cache = {}
+    return _config_cache
+
+def get_config(section: str, key: str, default: Any = None) -> Any:
+    """
+    读取配置项，并按默认值的类型转换（config.json 中的值均为字符串）
+    
+    Args:
+        section: 配置段名称
+        key: 配置项名称
+        default: 默认值，同时决定返回值类型
+    
+    Returns:
+        转换后的配置值
+    """
+    value = load_config().get(section, {}).get(key)
+    if value is None:
+        return default
+    try:
+        if isinstance(default, bool):
+            return str(value).strip().lower() in ("true", "1", "yes", "on")
+        if isinstance(default, int):
+            return int(value)
+        if isinstance(default, float):
+            return float(value)
+    except (TypeError, ValueError):
+        return default
+    return value
+
+def get_import_profile() -> Dict[str, Any]:
+    """
+    获取延迟导入的耗时报告
+    
+    Returns:
+        按耗时降序排列的模块导入记录
+    """
+    modules = sorted(
+        ({"module": name, **info} for name, info in _import_profile.items()),
+        key=lambda item: item["seconds"],
+        reverse=True,
+    )
+    return {
+        "total_seconds": round(sum(item["seconds"] for item in modules), 6),
+        "modules": modules,
+    }
+
 class ComfyUIToolsBase:
     """ComfyUI工具基础类，提供对服务器实例的访问"""
     
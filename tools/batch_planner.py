@@ -0,0 +1,151 @@
+"""
+缓存感知的批量提交 - 按共享子图排序一批工作流，使相邻任务尽量复用 ComfyUI 的执行缓存
+"""
+
+import json
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Set
+from .base_tools import lazy_import
+from .graph_tools import prune_graph, subgraph_hashes
+from .progress_tools import progress_tracker
+
+# 最多保留的批次记录数
+MAX_PLANS = 32
+
+def order_for_cache_reuse(hash_sets: List[Set[str]]) -> List[int]:
+    """
+    贪心排序：每次选择与上一个任务共享节点最多的任务
+
+    第一个任务选与其余任务共享节点总数最多的；共享数相同时保持原顺序
+
+    Returns:
+        排序后的下标列表
+    """
+    remaining = list(range(len(hash_sets)))
+    if not remaining:
+        return []
+    first = max(remaining, key=lambda i: (sum(len(hash_sets[i] & hash_sets[j]) for j in remaining if j != i), -i))
+    order = [first]
+    remaining.remove(first)
+    while remaining:
+        previous = hash_sets[order[-1]]
+        best = max(remaining, key=lambda i: (len(previous & hash_sets[i]), -i))
+        order.append(best)
+        remaining.remove(best)
+    return order
+
+def expected_cached(hash_sets: List[Set[str]], order: List[int]) -> List[int]:
+    """按给定顺序执行时，每个任务预计可从上一个任务复用的节点数"""
+    return [0 if position == 0 else len(hash_sets[index] & hash_sets[order[position - 1]])
+            for position, index in enumerate(order)]
+
+class BatchPlans:
+    """保存已提交的批次，用于对比预计与实际的缓存命中"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def add(self, plan: Dict[str, Any]) -> str:
+        plan_id = uuid.uuid4().hex
+        with self._lock:
+            self._plans[plan_id] = plan
+            while len(self._plans) > MAX_PLANS:
+                self._plans.popitem(last=False)
+        return plan_id
+
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._plans.get(plan_id)
+
+# 全局批次记录
+batch_plans = BatchPlans()
+
+def plan_batch(workflows_json: List[str], submit: bool = False, client_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    计算一批工作流的共享子图，并按缓存复用最大化的顺序排列（可选直接提交）
+
+    Args:
+        workflows_json: 工作流JSON字符串列表
+        submit: 是否按排好的顺序提交
+        client_id: 客户端ID（可选）；ComfyUI 只向带 client_id 的任务发送缓存命中消息，未提供时自动生成
+
+    Returns:
+        排序结果、每个任务预计复用的节点数（以及原顺序下的对比）；提交时附带 plan_id 和 prompt_id
+    """
+    try:
+        workflows = []
+        for position, workflow_json in enumerate(workflows_json):
+            try:
+                workflow, _ = prune_graph(json.loads(workflow_json))
+            except json.JSONDecodeError as e:
+                return {"error": f"第 {position} 个工作流不是有效的JSON: {e}"}
+            workflows.append(workflow)
+
+        hash_sets = [set(subgraph_hashes(workflow).values()) for workflow in workflows]
+        order = order_for_cache_reuse(hash_sets)
+        expected = expected_cached(hash_sets, order)
+        original = expected_cached(hash_sets, list(range(len(workflows))))
+        jobs = [{"index": index, "node_count": len(hash_sets[index]), "expected_cached": cached}
+                for index, cached in zip(order, expected)]
+        result = {
+            "order": order,
+            "jobs": jobs,
+            "expected_cached_total": sum(expected),
+            "original_order_cached_total": sum(original),
+        }
+        if not submit:
+            return result
+
+        client_id = client_id or f"mcp-plan-{uuid.uuid4().hex}"
+        progress_tracker.install()
+        submit_workflow = lazy_import("tools.workflow_tools").submit_workflow
+        for job in jobs:
+            # 已按剪除后的图计算，提交时不再重复剪除；顺序按缓存复用排好，不再按模型亲和性重排
+            response = submit_workflow(json.dumps(workflows[job["index"]]), client_id, None, False, reorder=False)
+            if isinstance(response, dict) and response.get("prompt_id"):
+                job["prompt_id"] = response["prompt_id"]
+            else:
+                job["error"] = response.get("error") if isinstance(response, dict) else str(response)
+
+        result["client_id"] = client_id
+        result["plan_id"] = batch_plans.add(result)
+        return result
+    except Exception as e:
+        return {"error": f"规划批量提交失败: {e}"}
+
+def get_batch_plan(plan_id: str) -> Dict[str, Any]:
+    """
+    获取已提交批次的预计与实际缓存命中节点数（实际值来自 execution_cached 消息）
+
+    Args:
+        plan_id: plan_batch 返回的 plan_id
+
+    Returns:
+        每个任务的状态、预计与实际缓存节点数及合计
+    """
+    try:
+        plan = batch_plans.get(plan_id)
+        if plan is None:
+            return {"error": f"批次 {plan_id} 不存在"}
+
+        jobs = []
+        observed_total = 0
+        for job in plan["jobs"]:
+            job = dict(job)
+            state = progress_tracker.get(job["prompt_id"]) if job.get("prompt_id") else None
+            if state is not None:
+                job["status"] = state["status"]
+                job["observed_cached"] = len(state["cached_nodes"])
+                observed_total += job["observed_cached"]
+            jobs.append(job)
+        return {
+            "plan_id": plan_id,
+            "jobs": jobs,
+            "expected_cached_total": plan["expected_cached_total"],
+            "observed_cached_total": observed_total,
+        }
+    except Exception as e:
+        return {"error": f"获取批次失败: {e}"}
@@ -0,0 +1,96 @@
+"""
+服务器事件中心 - 截获 PromptServer 发出的消息并分发给工具内部的监听器
+"""
+
+import logging
+import threading
+from typing import Callable, Any, List, Optional
+from .base_tools import tools_base
+
+# 任务执行结束（prompt_queue.task_done 之后）时分发的内部事件
+TASK_DONE_EVENT = "mcp_task_done"
+
+# 监听器签名: listener(event, data, sid)
+EventListener = Callable[[str, Any, Optional[str]], None]
+
+class ServerEventHub:
+    """
+    包装 PromptServer.send_sync，使执行过程中的消息（executing/progress/execution_cached 等）可被工具订阅
+
+    另外包装 prompt_queue.task_done，在每个任务写入历史记录后分发 TASK_DONE_EVENT
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._listeners: List[EventListener] = []
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def install(self) -> bool:
+        """
+        在 PromptServer 实例上安装消息钩子（重复调用无副作用）
+
+        Returns:
+            是否已安装
+        """
+        with self._lock:
+            if self._installed:
+                return True
+
+            prompt_server = tools_base.prompt_server
+            if prompt_server is None:
+                return False
+
+            original_send_sync = prompt_server.send_sync
+            hub = self
+
+            def send_sync(event, data, sid=None):
+                # 先交给 ComfyUI 原有逻辑，保证前端消息不受影响
+                original_send_sync(event, data, sid)
+                hub.dispatch(event, data, sid)
+
+            prompt_server.send_sync = send_sync
+
+            # 任务结束时 ComfyUI 不一定发送消息（没有 client_id 时），因此同时包装 task_done
+            prompt_queue = prompt_server.prompt_queue
+            original_task_done = prompt_queue.task_done
+
+            def task_done(item_id, *args, **kwargs):
+                with prompt_queue.mutex:
+                    item = prompt_queue.currently_running.get(item_id)
+                result = original_task_done(item_id, *args, **kwargs)
+                if item is not None:
+                    status = kwargs.get("status", args[1] if len(args) > 1 else None)
+                    hub.dispatch(TASK_DONE_EVENT, {
+                        "prompt_id": item[1],
+                        "status_str": getattr(status, "status_str", None),
+                    }, None)
+                return result
+
+            prompt_queue.task_done = task_done
+            self._installed = True
+            return True
+
+    def add_listener(self, listener: EventListener):
+        """注册监听器，并确保钩子已安装"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+        self.install()
+
+    def remove_listener(self, listener: EventListener):
+        """移除监听器"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def dispatch(self, event: str, data: Any, sid: Optional[str] = None):
+        """把消息分发给所有监听器，单个监听器的异常不影响 ComfyUI 执行"""
+        for listener in list(self._listeners):
+            try:
+                listener(event, data, sid)
+            except Exception as e:
+                self.logger.error(f"事件监听器处理 {event} 失败: {e}")
+
+# 全局事件中心实例
+event_hub = ServerEventHub()
@@ -6,8 +6,9 @@ import asyncio
 import os
 import base64
 import io
-from typing import Dict, Any, Optional
-from .base_tools import tools_base
+import shutil
+from typing import Dict, Any, Optional, List, Tuple
+from .base_tools import tools_base, lazy_import, get_config
 
 def upload_image(image_base64: str, filename: str, subfolder: str = "", upload_type: str = "input", overwrite: bool = False) -> Dict[str, Any]:
     """
@@ -158,4 +159,199 @@ def view_image(filename: str, image_type: str = "output", subfolder: str = "", c
         return result
         
     except Exception as e:
-        return {"error": f"查看图片失败: {e}"} 
\ No newline at end of file
+        return {"error": f"查看图片失败: {e}"} 
+
+
+def _allowed_dirs() -> List[str]:
+    """本地路径白名单（local_io.allowed_dirs，多个目录用系统路径分隔符分隔）"""
+    value = get_config("local_io", "allowed_dirs", "")
+    return [os.path.realpath(path) for path in value.split(os.pathsep) if path.strip()]
+
+def _is_within(path: str, root: str) -> bool:
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        return False
+
+def _check_local_path(path: str) -> str:
+    """解析符号链接后校验路径位于白名单目录内，返回真实路径"""
+    real_path = os.path.realpath(path)
+    if not any(_is_within(real_path, root) for root in _allowed_dirs()):
+        raise PermissionError(f"路径不在 local_io.allowed_dirs 白名单内: {path}")
+    return real_path
+
+def _check_shm_name(shm_name: str):
+    """共享内存名需以 local_io.shm_prefix 开头"""
+    prefix = get_config("local_io", "shm_prefix", "mcp_")
+    if not get_config("local_io", "allow_shm", True) or not shm_name.lstrip("/").startswith(prefix):
+        raise PermissionError(f"不允许访问共享内存 {shm_name}")
+
+def _comfy_path(filename: str, folder_type: str, subfolder: str = "") -> Tuple[str, str]:
+    """ComfyUI 目录（input/output/temp）中的文件路径，禁止跳出目录"""
+    folder_paths = lazy_import("folder_paths")
+    base_dir = os.path.realpath(folder_paths.get_directory_by_type(folder_type))
+    target_dir = os.path.realpath(os.path.join(base_dir, subfolder))
+    path = os.path.realpath(os.path.join(target_dir, filename))
+    if not _is_within(target_dir, base_dir) or os.path.dirname(path) != target_dir:
+        raise PermissionError(f"无效的文件路径: {os.path.join(subfolder, filename)}")
+    return target_dir, path
+
+def _unique_path(path: str) -> str:
+    """文件已存在时按 ComfyUI 上传的规则改名为 name (1).ext"""
+    base, ext = os.path.splitext(path)
+    index = 1
+    while os.path.exists(path):
+        path = f"{base} ({index}){ext}"
+        index += 1
+    return path
+
+def _link_or_copy(source: str, destination: str) -> str:
+    """
+    优先硬链接（同一文件系统时无需复制数据），失败时复制
+
+    目标文件以 O_EXCL|O_NOFOLLOW 独占创建：目标已存在（包括悬空的符号链接）时抛出 FileExistsError，
+    不会顺着符号链接写到白名单之外
+    """
+    if get_config("local_io", "link_mode", "hardlink") == "hardlink":
+        try:
+            os.link(source, destination)
+            return "hardlink"
+        except FileExistsError:
+            raise
+        except OSError:
+            pass
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_BINARY", 0)
+    fd = os.open(destination, flags, 0o644)
+    with open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    return "copy"
+
+def _open_shared_memory(name: str, create: bool = False, size: int = 0):
+    shared_memory = lazy_import("multiprocessing.shared_memory")
+    try:
+        # Python 3.13+: 不交给 resource_tracker，避免本进程退出时删除客户端的共享内存
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+        # 旧版本 Python 会登记到 resource_tracker，本进程退出时会删除该共享内存，这里取消登记
+        lazy_import("multiprocessing.resource_tracker").unregister(segment._name, "shared_memory")
+        return segment
+
+def import_local_image(filename: str, source_path: Optional[str] = None, shm_name: Optional[str] = None,
+                       shm_size: Optional[int] = None, subfolder: str = "", overwrite: bool = False) -> Dict[str, Any]:
+    """
+    从本机路径或共享内存导入图片到输入目录（同机客户端无需 base64 编码）
+    
+    Args:
+        filename: 保存到输入目录的文件名
+        source_path: 本机文件路径（需位于 local_io.allowed_dirs 内）
+        shm_name: 共享内存名（需以 local_io.shm_prefix 开头）
+        shm_size: 共享内存中数据的字节数（共享内存按页分配，需指明实际大小）
+        subfolder: 子文件夹（可选）
+        overwrite: 是否覆盖现有文件
+    
+    Returns:
+        导入结果，格式与 upload_image 相同，附带导入方式（hardlink/copy/shm）
+    """
+    try:
+        if not get_config("local_io", "enabled", False):
+            return {"error": "本地文件交换未启用（local_io.enabled）"}
+        if bool(source_path) == bool(shm_name):
+            return {"error": "需要且只能提供 source_path 或 shm_name 之一"}
+        
+        target_dir, destination = _comfy_path(filename, "input", subfolder)
+        os.makedirs(target_dir, exist_ok=True)
+        if os.path.exists(destination):
+            if overwrite:
+                os.remove(destination)
+            else:
+                destination = _unique_path(destination)
+        
+        if source_path:
+            source = _check_local_path(source_path)
+            if not os.path.isfile(source):
+                return {"error": f"文件不存在: {source_path}"}
+            mode = _link_or_copy(source, destination)
+        else:
+            _check_shm_name(shm_name)
+            segment = _open_shared_memory(shm_name)
+            try:
+                size = shm_size if shm_size is not None else segment.size
+                if size < 0 or size > segment.size:
+                    return {"error": f"shm_size 超出共享内存大小 {segment.size}"}
+                with open(destination, "wb") as f:
+                    f.write(segment.buf[:size])
+            finally:
+                segment.close()
+            mode = "shm"
+        
+        return {
+            "name": os.path.basename(destination),
+            "subfolder": subfolder,
+            "type": "input",
+            "mode": mode,
+        }
+        
+    except FileNotFoundError as e:
+        return {"error": f"导入图片失败，来源不存在: {e}"}
+    except PermissionError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"导入图片失败: {e}"}
+
+def export_output_image(filename: str, image_type: str = "output", subfolder: str = "",
+                        dest_path: Optional[str] = None, shm_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    把输出图片交给同机客户端：返回本机路径，或链接/复制到白名单目录，或写入共享内存
+    
+    Args:
+        filename: 文件名
+        image_type: 图片类型（output/input/temp）
+        subfolder: 子文件夹（可选）
+        dest_path: 目标路径（可选，需位于 local_io.allowed_dirs 内）
+        shm_name: 新建的共享内存名（可选，需以 local_io.shm_prefix 开头，由客户端负责释放）
+    
+    Returns:
+        本机路径、目标路径或共享内存名，以及文件大小
+    """
+    try:
+        if not get_config("local_io", "enabled", False):
+            return {"error": "本地文件交换未启用（local_io.enabled）"}
+        
+        _, path = _comfy_path(filename, image_type, subfolder)
+        if not os.path.isfile(path):
+            return {"error": f"文件不存在: {os.path.join(subfolder, filename)}"}
+        result = {"path": path, "size": os.path.getsize(path)}
+        
+        if dest_path:
+            destination = os.path.join(_check_local_path(os.path.dirname(dest_path) or "."),
+                                       os.path.basename(dest_path))
+            # lexists 对悬空的符号链接也返回真；最终路径解析符号链接后仍需位于白名单内
+            if os.path.lexists(destination):
+                return {"error": f"目标文件已存在: {dest_path}"}
+            _check_local_path(destination)
+            try:
+                result["mode"] = _link_or_copy(path, destination)
+            except FileExistsError:
+                return {"error": f"目标文件已存在: {dest_path}"}
+            result["dest_path"] = destination
+        elif shm_name:
+            _check_shm_name(shm_name)
+            with open(path, "rb") as f:
+                data = f.read()
+            segment = _open_shared_memory(shm_name, create=True, size=max(len(data), 1))
+            try:
+                segment.buf[:len(data)] = data
+            finally:
+                segment.close()
+            result["mode"] = "shm"
+            result["shm_name"] = shm_name
+        
+        return result
+        
+    except FileExistsError:
+        return {"error": f"共享内存已存在: {shm_name}"}
+    except PermissionError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"导出图片失败: {e}"}
@@ -0,0 +1,243 @@
+"""
+工作流图分析工具 - 拓扑排序、剪除无用节点、检测环和悬空连线
+"""
+
+import json
+import hashlib
+from collections import deque
+from typing import Dict, Any, List, Set, Tuple, Optional
+from .base_tools import lazy_import
+
+# 无法读取节点定义时使用的常见输出节点
+DEFAULT_OUTPUT_CLASSES = {
+    "SaveImage",
+    "PreviewImage",
+    "SaveAnimatedWEBP",
+    "SaveAnimatedPNG",
+    "SaveLatent",
+    "SaveVideo",
+    "SaveAudio",
+    "PreviewAudio",
+}
+
+def is_link(value: Any) -> bool:
+    """判断输入值是否为连线（[node_id, output_index]）"""
+    return (isinstance(value, list) and len(value) == 2
+            and isinstance(value[0], (str, int)) and isinstance(value[1], int))
+
+def iter_links(node: Dict[str, Any]):
+    """遍历节点的所有连线输入，产出 (输入名, 上游节点ID)"""
+    for input_name, value in node.get("inputs", {}).items():
+        if is_link(value):
+            yield input_name, str(value[0])
+
+def is_output_class(class_type: str) -> bool:
+    """判断节点类型是否为输出节点（OUTPUT_NODE）"""
+    try:
+        node_class = lazy_import("nodes").NODE_CLASS_MAPPINGS.get(class_type)
+    except ImportError:
+        node_class = None
+    if node_class is not None:
+        return bool(getattr(node_class, "OUTPUT_NODE", False))
+    return class_type in DEFAULT_OUTPUT_CLASSES
+
+def topological_order(prompt: Dict[str, Any], node_ids: Set[str]) -> Tuple[List[str], List[str]]:
+    """
+    对指定节点做拓扑排序（Kahn 算法）
+
+    Returns:
+        (拓扑序, 处于环中或依赖环而无法排序的节点)
+    """
+    indegree = {node_id: 0 for node_id in node_ids}
+    downstream: Dict[str, List[str]] = {node_id: [] for node_id in node_ids}
+    for node_id in node_ids:
+        for _, upstream in iter_links(prompt[node_id]):
+            if upstream in node_ids:
+                indegree[node_id] += 1
+                downstream[upstream].append(node_id)
+
+    ready = deque(sorted(node_id for node_id, degree in indegree.items() if degree == 0))
+    order = []
+    while ready:
+        node_id = ready.popleft()
+        order.append(node_id)
+        for child in downstream[node_id]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+
+    cyclic = sorted(node_id for node_id, degree in indegree.items() if degree > 0)
+    return order, cyclic
+
+def analyze_graph(prompt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    分析 API 格式的工作流图
+
+    Args:
+        prompt: API 格式的工作流
+
+    Returns:
+        拓扑序、输出节点、可剪除节点、环和悬空连线
+    """
+    nodes = {str(node_id): node for node_id, node in prompt.items()
+             if isinstance(node, dict) and "class_type" in node}
+    output_nodes = sorted(node_id for node_id, node in nodes.items() if is_output_class(node["class_type"]))
+
+    dangling_links = []
+    for node_id, node in nodes.items():
+        for input_name, upstream in iter_links(node):
+            if upstream not in nodes:
+                dangling_links.append({"node": node_id, "input": input_name, "target": upstream})
+
+    # 从输出节点反向遍历，找出所有会被执行的节点
+    reachable: Set[str] = set()
+    stack = list(output_nodes)
+    while stack:
+        node_id = stack.pop()
+        if node_id in reachable:
+            continue
+        reachable.add(node_id)
+        stack.extend(upstream for _, upstream in iter_links(nodes[node_id]) if upstream in nodes)
+
+    order, cycles = topological_order(nodes, reachable)
+    pruned = sorted(set(nodes) - reachable, key=lambda node_id: (len(node_id), node_id))
+    reachable_dangling = [link for link in dangling_links if link["node"] in reachable]
+
+    return {
+        "valid": bool(output_nodes) and not cycles and not reachable_dangling,
+        "node_count": len(nodes),
+        "output_nodes": output_nodes,
+        "order": order,
+        "pruned_nodes": [{"id": node_id, "class_type": nodes[node_id]["class_type"]} for node_id in pruned],
+        "cycles": cycles,
+        "dangling_links": dangling_links,
+    }
+
+def prune_graph(prompt: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    剪除不会影响任何输出节点的节点
+
+    Args:
+        prompt: API 格式的工作流
+
+    Returns:
+        (剪除后的工作流, 分析结果)；没有输出节点时不做剪除
+    """
+    analysis = analyze_graph(prompt)
+    if not analysis["output_nodes"]:
+        return prompt, analysis
+    removed = {node["id"] for node in analysis["pruned_nodes"]}
+    pruned = {node_id: node for node_id, node in prompt.items() if str(node_id) not in removed}
+    return pruned, analysis
+
+def subgraph_hashes(prompt: Dict[str, Any]) -> Dict[str, str]:
+    """
+    计算每个节点及其全部上游子图的 Merkle 哈希
+
+    两个工作流中哈希相同的节点输入完全一致，ComfyUI 连续执行时可以直接复用缓存的输出
+
+    Args:
+        prompt: API 格式的工作流
+
+    Returns:
+        节点ID -> 哈希；处于环中或依赖悬空连线的节点不参与比较
+    """
+    nodes = {str(node_id): node for node_id, node in prompt.items()
+             if isinstance(node, dict) and "class_type" in node}
+    hashes: Dict[str, str] = {}
+    visiting: Set[str] = set()
+
+    def visit(node_id: str) -> Optional[str]:
+        if node_id in hashes:
+            return hashes[node_id]
+        if node_id not in nodes or node_id in visiting:
+            return None
+        visiting.add(node_id)
+        node = nodes[node_id]
+        inputs = []
+        for input_name, value in sorted(node.get("inputs", {}).items()):
+            if is_link(value):
+                upstream = visit(str(value[0]))
+                if upstream is None:
+                    visiting.discard(node_id)
+                    return None
+                inputs.append([input_name, "link", upstream, value[1]])
+            else:
+                inputs.append([input_name, "value", value])
+        visiting.discard(node_id)
+        payload = json.dumps([node["class_type"], inputs], sort_keys=True, ensure_ascii=False, default=str)
+        hashes[node_id] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return hashes[node_id]
+
+    for node_id in nodes:
+        visit(node_id)
+    return hashes
+
+def _int_input(node: Dict[str, Any], name: str) -> Optional[int]:
+    value = node.get("inputs", {}).get(name)
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+def node_features(prompt: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    提取影响节点耗时的特征：采样步数和处理的图像尺寸
+
+    节点自身没有 width/height 输入时沿连线向上游查找最近的一个（如 KSampler 的 latent_image 来自
+    EmptyLatentImage），batch_size 计入总像素
+
+    Args:
+        prompt: API 格式的工作流
+
+    Returns:
+        节点ID -> {"class_type", "steps", "megapixels"}，无法确定的特征为 None
+    """
+    nodes = {str(node_id): node for node_id, node in prompt.items()
+             if isinstance(node, dict) and "class_type" in node}
+    resolutions: Dict[str, Optional[float]] = {}
+
+    def megapixels(node_id: str) -> Optional[float]:
+        # 广度优先，取离当前节点最近的尺寸
+        seen = {node_id}
+        frontier = deque([node_id])
+        while frontier:
+            current = frontier.popleft()
+            if current in resolutions:
+                # 已计算过的节点：有尺寸则直接使用，没有说明其上游也没有，不再展开
+                if resolutions[current] is not None:
+                    return resolutions[current]
+                continue
+            node = nodes[current]
+            width, height = _int_input(node, "width"), _int_input(node, "height")
+            if width and height:
+                return width * height * (_int_input(node, "batch_size") or 1) / 1e6
+            for _, upstream in iter_links(node):
+                if upstream in nodes and upstream not in seen:
+                    seen.add(upstream)
+                    frontier.append(upstream)
+        return None
+
+    features = {}
+    for node_id, node in nodes.items():
+        resolutions[node_id] = megapixels(node_id)
+        features[node_id] = {
+            "class_type": node["class_type"],
+            "steps": _int_input(node, "steps"),
+            "megapixels": resolutions[node_id],
+        }
+    return features
+
+def analyze_workflow(workflow_json: str) -> Dict[str, Any]:
+    """
+    分析工作流图，不提交执行
+
+    Args:
+        workflow_json: 工作流JSON字符串
+
+    Returns:
+        拓扑序、输出节点、可剪除节点、环和悬空连线
+    """
+    try:
+        return analyze_graph(json.loads(workflow_json))
+    except json.JSONDecodeError as e:
+        return {"error": f"无效的JSON格式: {e}"}
+    except Exception as e:
+        return {"error": f"分析工作流失败: {e}"}
@@ -0,0 +1,74 @@
+"""
+历史记录倒排索引 - 从工作流中提取节点类型、模型文件名和文本输入的检索词
+"""
+
+import re
+from typing import Dict, Any, List, Set, Tuple
+from .scheduler_tools import MODEL_LOADER_INPUTS
+
+# 视为模型文件的扩展名
+MODEL_EXTENSIONS = (".safetensors", ".ckpt", ".pt", ".pth", ".bin", ".gguf", ".onnx")
+# 单个任务最多索引的文本词数，避免超长提示词撑大索引
+MAX_TEXT_TERMS = 512
+
+# 连续的字母数字为一个词；中日韩文字没有空格分隔，按相邻两字（bigram）切分
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_WORD_RE = re.compile(f"[0-9a-z]+|[{_CJK_CHARS}]+")
+_CJK_RE = re.compile(f"[{_CJK_CHARS}]")
+
+Term = Tuple[str, str]
+
+def tokenize(text: str) -> List[str]:
+    """
+    把文本切分为检索词（查询和建索引使用同一规则）
+
+    Args:
+        text: 任意文本
+
+    Returns:
+        去重后按出现顺序排列的检索词
+    """
+    tokens = []
+    for run in _WORD_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return list(dict.fromkeys(tokens))
+
+def is_model_file(value: str) -> bool:
+    """判断字符串输入是否为模型文件名"""
+    return value.lower().endswith(MODEL_EXTENSIONS)
+
+def extract_terms(graph: Dict[str, Any]) -> Set[Term]:
+    """
+    提取工作流的检索词
+
+    Args:
+        graph: API 格式的工作流
+
+    Returns:
+        (字段, 检索词) 集合，字段为 class/model/text
+    """
+    terms: Set[Term] = set()
+    text_terms: List[str] = []
+    for node in graph.values():
+        if not isinstance(node, dict) or not node.get("class_type"):
+            continue
+        class_type = node["class_type"]
+        terms.add(("class", class_type.lower()))
+
+        model_inputs = MODEL_LOADER_INPUTS.get(class_type, ())
+        for input_name, value in node.get("inputs", {}).items():
+            if not isinstance(value, str) or not value:
+                continue
+            if input_name in model_inputs or is_model_file(value):
+                terms.add(("model", value.lower()))
+            else:
+                text_terms.extend(tokenize(value))
+
+    terms.update(("text", token) for token in list(dict.fromkeys(text_terms))[:MAX_TEXT_TERMS])
+    return terms
@@ -0,0 +1,642 @@
+"""
+持久化历史记录 - 把已完成的任务镜像到带索引的 SQLite 数据库
+"""
+
+import os
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Iterable
+from .base_tools import tools_base, get_config
+from .events import event_hub, TASK_DONE_EVENT
+from .history_index import extract_terms, tokenize
+from .graph_tools import node_features
+
+# 批量写入：攒够 BATCH_SIZE 条或等待 FLUSH_INTERVAL 秒后写一次
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 1.0
+# 扫描 prompt_queue.history 补齐漏掉任务的间隔（秒）
+SYNC_INTERVAL = 30.0
+# 数据库结构版本（PRAGMA user_version），低于该版本时在启动时迁移
+SCHEMA_VERSION = 2
+# 最多同时记录节点耗时的任务数（正常情况下任务结束后即写入数据库）
+MAX_TIMED_PROMPTS = 256
+# 内存中记住的已写入任务ID数量，需大于 ComfyUI prompt_queue.history 的上限（10000），
+# 否则补齐扫描会把已写入（或已被 max_rows 清理）的任务重复写入
+MAX_KNOWN_PROMPTS = 20000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_id TEXT NOT NULL UNIQUE,
+    number INTEGER,
+    status TEXT,
+    client_id TEXT,
+    created_at REAL,
+    started_at REAL,
+    completed_at REAL,
+    recorded_at REAL NOT NULL,
+    item TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_status ON history(status);
+CREATE INDEX IF NOT EXISTS idx_history_client_id ON history(client_id);
+CREATE INDEX IF NOT EXISTS idx_history_completed_at ON history(completed_at);
+CREATE TABLE IF NOT EXISTS history_terms (
+    field TEXT NOT NULL,
+    term TEXT NOT NULL,
+    prompt_id TEXT NOT NULL,
+    PRIMARY KEY (field, term, prompt_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_history_terms_prompt_id ON history_terms(prompt_id);
+CREATE TABLE IF NOT EXISTS node_timings (
+    prompt_id TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    class_type TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    steps INTEGER,
+    megapixels REAL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (prompt_id, node_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_node_timings_class ON node_timings(class_type, recorded_at);
+"""
+
+def _message_time(messages: Iterable[Any], events: Iterable[str]) -> Optional[float]:
+    """从状态消息中取出指定事件的时间戳（秒）"""
+    events = set(events)
+    for message in messages or ():
+        if len(message) == 2 and message[0] in events and isinstance(message[1], dict):
+            timestamp = message[1].get("timestamp")
+            if timestamp is not None:
+                return timestamp / 1000.0
+    return None
+
+def item_completed_at(item: Dict[str, Any]) -> Optional[float]:
+    """历史记录项的完成时间（秒），状态消息中没有时间戳时返回 None"""
+    messages = (item.get("status") or {}).get("messages") or []
+    return _message_time(messages, ("execution_success", "execution_error", "execution_interrupted"))
+
+def build_record(prompt_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把 ComfyUI 的历史记录项转换为数据库行
+
+    Args:
+        prompt_id: 任务ID
+        item: prompt_queue.history 中的记录（prompt/outputs/status）
+
+    Returns:
+        数据库行字段
+    """
+    prompt = item.get("prompt") or ()
+    graph = prompt[2] if len(prompt) > 2 and isinstance(prompt[2], dict) else {}
+    extra_data = prompt[3] if len(prompt) > 3 and isinstance(prompt[3], dict) else {}
+    status = item.get("status") or {}
+    messages = status.get("messages") or []
+    now = time.time()
+    created_at = extra_data.get("create_time")
+
+    return {
+        "prompt_id": prompt_id,
+        "number": prompt[0] if prompt else None,
+        "status": status.get("status_str"),
+        "client_id": extra_data.get("client_id"),
+        "created_at": created_at / 1000.0 if created_at else None,
+        "started_at": _message_time(messages, ("execution_start",)),
+        "completed_at": item_completed_at(item) or now,
+        "recorded_at": now,
+        "terms": extract_terms(graph),
+        "graph": graph,
+        "item": json.dumps(item, ensure_ascii=False, default=str),
+    }
+
+def build_timing_rows(prompt_id: str, graph: Dict[str, Any], timings: Dict[str, float],
+                      recorded_at: float) -> List[tuple]:
+    """把节点耗时与节点类型、步数、图像尺寸组合为 node_timings 行"""
+    features = node_features(graph)
+    rows = []
+    for node_id, seconds in timings.items():
+        feature = features.get(node_id)
+        if feature is not None:
+            rows.append((prompt_id, node_id, feature["class_type"], seconds, feature["steps"],
+                         feature["megapixels"], recorded_at))
+    return rows
+
+class HistoryStore:
+    """在后台线程中批量写入 SQLite，查询使用线程独立的只读连接"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self._pending: "queue.Queue[Any]" = queue.Queue()
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+        self._local = threading.local()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        # 执行中的节点 prompt_id -> (节点ID, 开始时间)，以及已完成节点的耗时 prompt_id -> {节点ID: 秒}
+        self._timing_lock = threading.Lock()
+        self._running_nodes: Dict[str, tuple] = {}
+        self._node_times: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self.stats = {"written": 0, "batches": 0, "last_flush": None, "node_timings": 0}
+
+    @staticmethod
+    def default_path() -> str:
+        """数据库路径：config.json 中的 database.path，相对路径以插件根目录为基准"""
+        path = get_config("database", "path", "comfyui_data.db")
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+        return path
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        """当前线程的查询连接"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """建表、加载已有任务ID并启动写入线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self.running:
+                return True
+            self.path = self.path or self.default_path()
+            connection = self._connect()
+            with connection:
+                connection.executescript(SCHEMA)
+            self._migrate(connection)
+            self._known = OrderedDict()
+            self._remember(row[0] for row in connection.execute(
+                "SELECT prompt_id FROM history ORDER BY seq DESC LIMIT ?", (MAX_KNOWN_PROMPTS,)
+            ).fetchall()[::-1])
+            connection.close()
+
+            event_hub.add_listener(self.on_event)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mcp-history-store", daemon=True)
+            self._thread.start()
+            return True
+
+    def _remember(self, prompt_ids: Iterable[str]):
+        """记录已写入的任务ID，超过 MAX_KNOWN_PROMPTS 时丢弃最早的"""
+        for prompt_id in prompt_ids:
+            self._known[prompt_id] = None
+        while len(self._known) > MAX_KNOWN_PROMPTS:
+            self._known.popitem(last=False)
+
+    @staticmethod
+    def _migrate(connection: sqlite3.Connection):
+        """旧版本数据库：为已有记录补建检索词索引（node_timings 由 SCHEMA 创建，旧记录没有节点耗时可补）"""
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with connection:
+            if version < 1:
+                connection.execute("DROP TABLE IF EXISTS history_nodes")
+                for row in connection.execute("SELECT prompt_id, item FROM history").fetchall():
+                    prompt = json.loads(row["item"]).get("prompt") or []
+                    graph = prompt[2] if len(prompt) > 2 and isinstance(prompt[2], dict) else {}
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO history_terms (field, term, prompt_id) VALUES (?, ?, ?)",
+                        [(field, term, row["prompt_id"]) for field, term in extract_terms(graph)],
+                    )
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def stop(self):
+        """停止写入线程（会先写完已排队的任务）"""
+        self._stop.set()
+        self._pending.put(None)
+
+    def on_event(self, event: str, data: Any, sid: Optional[str] = None):
+        """
+        记录节点耗时；任务结束时只把 prompt_id 放入队列，真正的读取和写入在后台线程完成
+
+        executing 消息切换到下一个节点（或节点为空表示执行结束）时，上一个节点的耗时即两条消息的间隔；
+        命中缓存的节点不会收到 executing 消息，不计入统计
+        """
+        if not isinstance(data, dict) or not data.get("prompt_id"):
+            return
+        prompt_id = data["prompt_id"]
+        if event == "executing":
+            self._finish_node(prompt_id, data.get("node"))
+        elif event in ("execution_success", "execution_error", "execution_interrupted"):
+            self._finish_node(prompt_id, None)
+        elif event == TASK_DONE_EVENT:
+            self._finish_node(prompt_id, None)
+            self._pending.put(prompt_id)
+
+    def _finish_node(self, prompt_id: str, next_node: Optional[str]):
+        """结束当前节点的计时，next_node 不为空时开始下一个节点的计时"""
+        now = time.perf_counter()
+        with self._timing_lock:
+            running = self._running_nodes.pop(prompt_id, None)
+            if running is not None and running[0] != next_node:
+                times = self._node_times.get(prompt_id)
+                if times is None:
+                    times = self._node_times[prompt_id] = {}
+                    while len(self._node_times) > MAX_TIMED_PROMPTS:
+                        self._node_times.popitem(last=False)
+                times[running[0]] = times.get(running[0], 0.0) + now - running[1]
+            elif running is not None:
+                # 同一节点的重复消息，继续计时
+                self._running_nodes[prompt_id] = running
+                return
+            if next_node is not None:
+                self._running_nodes[prompt_id] = (str(next_node), now)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        等待已排队的任务写入数据库
+
+        Returns:
+            是否在超时前完成
+        """
+        if not self.running:
+            return False
+        done = threading.Event()
+        self._pending.put(done)
+        return done.wait(timeout)
+
+    def _missing_from_queue(self) -> List[str]:
+        """找出 prompt_queue.history 中尚未写入数据库的任务"""
+        prompt_server = tools_base.prompt_server
+        if prompt_server is None:
+            return []
+        with prompt_server.prompt_queue.mutex:
+            prompt_ids = list(prompt_server.prompt_queue.history.keys())
+        return [prompt_id for prompt_id in prompt_ids if prompt_id not in self._known]
+
+    def _run(self):
+        connection = self._connect()
+        last_sync = float("-inf")
+        while not self._stop.is_set():
+            batch, waiters = [], []
+            try:
+                entry = self._pending.get(timeout=FLUSH_INTERVAL)
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while entry is not None:
+                    if isinstance(entry, threading.Event):
+                        waiters.append(entry)
+                        break
+                    batch.append(entry)
+                    if len(batch) >= BATCH_SIZE:
+                        break
+                    entry = self._pending.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                pass
+
+            try:
+                if time.monotonic() - last_sync >= SYNC_INTERVAL:
+                    last_sync = time.monotonic()
+                    batch.extend(self._missing_from_queue())
+                if batch:
+                    self._write(connection, batch)
+            except Exception as e:
+                self.logger.error(f"写入历史记录数据库失败: {e}")
+            finally:
+                for waiter in waiters:
+                    waiter.set()
+        connection.close()
+
+    def _write(self, connection: sqlite3.Connection, prompt_ids: List[str]):
+        """读取历史记录并在一个事务中批量写入"""
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        records = []
+        timing_rows = []
+        for prompt_id in dict.fromkeys(prompt_ids):
+            with self._timing_lock:
+                timings = self._node_times.pop(prompt_id, None)
+            if prompt_id in self._known:
+                continue
+            item = prompt_queue.get_history(prompt_id=prompt_id).get(prompt_id)
+            if item:
+                record = build_record(prompt_id, item)
+                records.append(record)
+                # 只有成功的任务计入耗时统计，出错或被中断的节点耗时不完整
+                if timings and record["status"] == "success":
+                    timing_rows.extend(build_timing_rows(prompt_id, record["graph"], timings, record["recorded_at"]))
+        if not records:
+            return
+        # 同一批内按完成时间写入，seq 即为完成顺序
+        records.sort(key=lambda record: record["completed_at"])
+
+        with connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO history (prompt_id, number, status, client_id, created_at, started_at,"
+                " completed_at, recorded_at, item) VALUES (:prompt_id, :number, :status, :client_id,"
+                " :created_at, :started_at, :completed_at, :recorded_at, :item)",
+                records,
+            )
+            # 倒排索引与记录在同一事务中增量写入
+            connection.executemany(
+                "INSERT OR IGNORE INTO history_terms (field, term, prompt_id) VALUES (?, ?, ?)",
+                [(field, term, record["prompt_id"]) for record in records for field, term in record["terms"]],
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO node_timings (prompt_id, node_id, class_type, seconds, steps, megapixels,"
+                " recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                timing_rows,
+            )
+            self._trim_timings(connection, {row[2] for row in timing_rows})
+
+            max_rows = get_config("database", "max_rows", 0)
+            if max_rows > 0:
+                self._trim(connection, max_rows)
+
+        self._remember(record["prompt_id"] for record in records)
+        self.stats["written"] += len(records)
+        self.stats["node_timings"] += len(timing_rows)
+        self.stats["batches"] += 1
+        self.stats["last_flush"] = time.time()
+
+    @staticmethod
+    def _trim(connection: sqlite3.Connection, max_rows: int):
+        """只保留最新的 max_rows 条记录"""
+        stale = [row[0] for row in connection.execute(
+            "SELECT prompt_id FROM history ORDER BY seq DESC LIMIT -1 OFFSET ?", (max_rows,)
+        )]
+        HistoryStore._delete_rows(connection, stale)
+
+    @staticmethod
+    def _trim_timings(connection: sqlite3.Connection, class_types: Iterable[str]):
+        """
+        每个节点类型只保留最新的 estimator.max_samples_per_class 条耗时
+
+        节点耗时是统计数据，删除或清空历史记录时保留，只按数量滚动淘汰
+        """
+        limit = get_config("estimator", "max_samples_per_class", 500)
+        for class_type in class_types:
+            connection.execute(
+                "DELETE FROM node_timings WHERE class_type = ? AND recorded_at < (SELECT MIN(recorded_at) FROM"
+                " (SELECT recorded_at FROM node_timings WHERE class_type = ? ORDER BY recorded_at DESC LIMIT ?))",
+                (class_type, class_type, limit),
+            )
+
+    @staticmethod
+    def _delete_rows(connection: sqlite3.Connection, prompt_ids: List[str]) -> int:
+        """删除指定任务的行，返回删除的历史记录条数"""
+        if not prompt_ids:
+            return 0
+        rows = [(prompt_id,) for prompt_id in prompt_ids]
+        deleted = connection.executemany("DELETE FROM history WHERE prompt_id = ?", rows).rowcount
+        connection.executemany("DELETE FROM history_terms WHERE prompt_id = ?", rows)
+        return deleted
+
+    def delete(self, prompt_ids: Optional[List[str]] = None) -> int:
+        """
+        删除指定任务的记录，prompt_ids 为 None 时清空
+
+        Returns:
+            删除的行数
+        """
+        connection = self._reader()
+        with connection:
+            if prompt_ids is None:
+                deleted = connection.execute("DELETE FROM history").rowcount
+                connection.execute("DELETE FROM history_terms")
+            else:
+                deleted = self._delete_rows(connection, prompt_ids)
+        return deleted
+
+    def delete_matching(self, prompt_ids: Optional[List[str]] = None, client_id: Optional[str] = None,
+                        completed_before: Optional[float] = None) -> List[str]:
+        """
+        在一个事务中删除满足所有条件的记录
+
+        Args:
+            prompt_ids: 任务ID集合（可选）
+            client_id: 客户端ID（可选）
+            completed_before: 完成时间上限（秒级时间戳）（可选）
+
+        Returns:
+            被删除的任务ID
+        """
+        sql = "SELECT prompt_id FROM history WHERE 1=1"
+        params: List[Any] = []
+        if client_id:
+            sql += " AND client_id = ?"
+            params.append(client_id)
+        if completed_before is not None:
+            sql += " AND completed_at < ?"
+            params.append(completed_before)
+
+        connection = self._reader()
+        with connection:
+            if prompt_ids is None:
+                deleted = [row[0] for row in connection.execute(sql, params)]
+            else:
+                # 分批使用 IN 查询，避免超过 SQLite 的参数个数限制
+                prompt_ids = list(dict.fromkeys(prompt_ids))
+                deleted = []
+                for start in range(0, len(prompt_ids), 500):
+                    chunk = prompt_ids[start:start + 500]
+                    chunk_sql = f"{sql} AND prompt_id IN ({','.join('?' * len(chunk))})"
+                    deleted.extend(row[0] for row in connection.execute(chunk_sql, params + chunk))
+            self._delete_rows(connection, deleted)
+        return deleted
+
+    @staticmethod
+    def _rows_to_history(rows: Iterable[sqlite3.Row]) -> Dict[str, Any]:
+        return {row["prompt_id"]: json.loads(row["item"]) for row in rows}
+
+    def get(self, prompt_id: str) -> Dict[str, Any]:
+        """按 prompt_id 读取一条记录（ComfyUI 历史记录格式）"""
+        rows = self._reader().execute("SELECT prompt_id, item FROM history WHERE prompt_id = ?", (prompt_id,))
+        return self._rows_to_history(rows)
+
+    def recent(self, max_items: Optional[int] = None) -> Dict[str, Any]:
+        """读取最新的 max_items 条记录，按完成顺序从旧到新排列"""
+        if max_items is None:
+            rows = self._reader().execute("SELECT prompt_id, item FROM history ORDER BY seq")
+        else:
+            rows = self._reader().execute(
+                "SELECT prompt_id, item FROM (SELECT seq, prompt_id, item FROM history ORDER BY seq DESC LIMIT ?)"
+                " ORDER BY seq", (max_items,)
+            )
+        return self._rows_to_history(rows)
+
+    def since(self, since_seq: Optional[int] = None, since_time: Optional[float] = None,
+              limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        按写入顺序读取 since_seq 之后（或 since_time 之后完成）的记录
+
+        Args:
+            since_seq: 上次同步到的序号（不含）
+            since_time: 完成时间下限（秒级时间戳，不含）
+            limit: 最大返回条数
+
+        Returns:
+            history（ComfyUI 历史记录格式）、next_seq 和 has_more
+        """
+        sql = "SELECT seq, prompt_id, item FROM history WHERE seq > ?"
+        params: List[Any] = [since_seq or 0]
+        if since_time is not None:
+            sql += " AND completed_at > ?"
+            params.append(since_time)
+        sql += " ORDER BY seq"
+        if limit is not None:
+            # 多取一条用于判断是否还有后续记录
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        has_more = limit is not None and len(rows) > limit
+        rows = rows[:limit] if limit is not None else rows
+        return {
+            "history": self._rows_to_history(rows),
+            "next_seq": rows[-1]["seq"] if rows else (since_seq or 0),
+            "has_more": has_more,
+        }
+
+    def query(self, status: Optional[str] = None, client_id: Optional[str] = None,
+              node_class: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """按状态、客户端和节点类型查询任务摘要（均走索引）"""
+        sql = ("SELECT seq, prompt_id, number, status, client_id, created_at, started_at, completed_at"
+               " FROM history WHERE 1=1")
+        params: List[Any] = []
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        if client_id:
+            sql += " AND client_id = ?"
+            params.append(client_id)
+        if node_class:
+            sql += " AND prompt_id IN (SELECT prompt_id FROM history_terms WHERE field = 'class' AND term = ?)"
+            params.append(node_class.lower())
+        sql += " ORDER BY seq DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._reader().execute(sql, params)]
+
+    def search(self, text: Optional[str] = None, node_class: Optional[str] = None,
+               model: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        通过倒排索引检索任务，所有条件取交集
+
+        Args:
+            text: 文本输入中包含的词（如提示词片段）
+            node_class: 节点类型（精确匹配，不区分大小写）
+            model: 模型文件名（子串匹配，不区分大小写）
+            limit: 最大返回条数
+
+        Returns:
+            任务摘要列表，最新的在前
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        for token in tokenize(text or ""):
+            clauses.append("SELECT prompt_id FROM history_terms WHERE field = 'text' AND term = ?")
+            params.append(token)
+        if node_class:
+            clauses.append("SELECT prompt_id FROM history_terms WHERE field = 'class' AND term = ?")
+            params.append(node_class.lower())
+        if model:
+            clauses.append("SELECT prompt_id FROM history_terms WHERE field = 'model' AND term LIKE ? ESCAPE '\\'")
+            escaped = model.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if not clauses:
+            return []
+
+        sql = ("SELECT seq, prompt_id, number, status, client_id, created_at, started_at, completed_at"
+               f" FROM history WHERE prompt_id IN ({' INTERSECT '.join(clauses)})"
+               " ORDER BY seq DESC LIMIT ?")
+        params.append(limit)
+        return [dict(row) for row in self._reader().execute(sql, params)]
+
+    def node_timings(self, class_type: str, limit: int = 500) -> List[Dict[str, Any]]:
+        """读取某个节点类型最近的执行耗时（seconds/steps/megapixels），最新的在前"""
+        rows = self._reader().execute(
+            "SELECT seconds, steps, megapixels FROM node_timings WHERE class_type = ?"
+            " ORDER BY recorded_at DESC LIMIT ?", (class_type, limit)
+        )
+        return [dict(row) for row in rows]
+
+# 全局历史记录存储实例
+history_store = HistoryStore()
+
+def get_history_store() -> Optional[HistoryStore]:
+    """按配置返回已启动的历史记录存储，未启用时返回 None"""
+    if not get_config("database", "enabled", False) or get_config("database", "type", "sqlite") != "sqlite":
+        return None
+    if not history_store.running:
+        if tools_base.prompt_server is None:
+            return None
+        history_store.start()
+    return history_store
+
+def start_history_store() -> Dict[str, Any]:
+    """
+    按配置启动历史记录持久化
+
+    Returns:
+        操作结果
+    """
+    try:
+        store = get_history_store()
+        if store is None:
+            return {"status": "disabled", "message": "历史记录数据库未启用"}
+        return {"status": "success", "path": store.path}
+    except Exception as e:
+        return {"error": f"启动历史记录数据库失败: {e}"}
+
+def query_history(status: Optional[str] = None, client_id: Optional[str] = None,
+                  node_class: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    按状态、客户端ID或节点类型查询已持久化的任务
+
+    Args:
+        status: 任务状态（success/error）（可选）
+        client_id: 客户端ID（可选）
+        node_class: 工作流中包含的节点类型（可选）
+        limit: 最大返回条数
+
+    Returns:
+        任务摘要列表（不含完整的工作流和输出）
+    """
+    try:
+        store = get_history_store()
+        if store is None:
+            return {"error": "历史记录数据库未启用"}
+        store.flush()
+        return {"items": store.query(status, client_id, node_class, limit)}
+    except Exception as e:
+        return {"error": f"查询历史记录失败: {e}"}
+
+def search_history(query: Optional[str] = None, node_class: Optional[str] = None,
+                   model: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+    """
+    检索历史任务，例如“使用了模型X的任务”或“提示词包含Y的任务”
+
+    Args:
+        query: 文本输入（提示词等）中包含的内容（可选）
+        node_class: 工作流中包含的节点类型（可选）
+        model: 使用的模型文件名，支持部分匹配（可选）
+        limit: 最大返回条数
+
+    Returns:
+        匹配的任务摘要列表
+    """
+    try:
+        store = get_history_store()
+        if store is None:
+            return {"error": "历史记录数据库未启用"}
+        if not (query or node_class or model):
+            return {"error": "至少需要提供 query、node_class 或 model 之一"}
+        store.flush()
+        return {"items": store.search(query, node_class, model, limit)}
+    except Exception as e:
+        return {"error": f"检索历史记录失败: {e}"}
@@ -2,27 +2,49 @@
 历史记录管理工具 - 直接对接到ComfyUI API方法
 """
 
+import time
 import asyncio
-from typing import Dict, Any, Optional
-from .base_tools import tools_base
+from typing import Dict, Any, Optional, List
+from .base_tools import tools_base, get_config
+from .history_store import get_history_store, item_completed_at
+from .lock_profiler import queue_lock
 
-def get_history(max_items: Optional[int] = None) -> Dict[str, Any]:
+def get_history(max_items: Optional[int] = None, since_seq: Optional[int] = None,
+                since_time: Optional[float] = None) -> Dict[str, Any]:
     """
     获取历史记录
     
     Args:
-        max_items: 最大返回项目数（可选）
+        max_items: 最大返回项目数（可选，从数据库读取时未指定则为 database.max_history_items）
+        since_seq: 只返回序号大于该值的记录（可选，用于增量同步）
+        since_time: 只返回在该时间戳（秒）之后完成的记录（可选）
     
     Returns:
-        历史记录数据
+        历史记录数据；指定since_seq/since_time时返回history、next_seq和has_more
     """
     try:
         # 直接调用ComfyUI的prompt_queue.get_history方法
         if tools_base.prompt_server is None:
             return {"error": "ComfyUI服务器未启动"}
         
+        # 启用持久化时从数据库读取，不受内存中历史记录条数的限制
+        store = get_history_store()
+        if store is not None:
+            store.flush()
+            # 数据库可能保存了远多于内存的历史，未指定条数时也限制单次返回的记录数（更早的记录用 since_seq 分页读取）
+            if max_items is None:
+                max_items = get_config("database", "max_history_items", 1000)
+            if since_seq is not None or since_time is not None:
+                # 增量同步：按写入顺序返回，调用方保存next_seq用于下一次请求
+                return store.since(since_seq, since_time, max_items)
+            return store.recent(max_items)
+        
+        if since_seq is not None or since_time is not None:
+            return {"error": "增量同步需要启用历史记录数据库（database.enabled）"}
+        
         # 直接调用prompt_queue的get_history方法
-        result = tools_base.prompt_server.prompt_queue.get_history(max_items=max_items)
+        with queue_lock("get_history"):
+            result = tools_base.prompt_server.prompt_queue.get_history(max_items=max_items)
         return result
         
     except Exception as e:
@@ -44,7 +66,14 @@ def get_history_by_id(prompt_id: str) -> Dict[str, Any]:
             return {"error": "ComfyUI服务器未启动"}
         
         # 直接调用prompt_queue的get_history方法，传入prompt_id
-        result = tools_base.prompt_server.prompt_queue.get_history(prompt_id=prompt_id)
+        with queue_lock("get_history_by_id"):
+            result = tools_base.prompt_server.prompt_queue.get_history(prompt_id=prompt_id)
+        
+        # 内存中已被清理的记录从数据库读取
+        if not result:
+            store = get_history_store()
+            if store is not None:
+                result = store.get(prompt_id)
         return result
         
     except Exception as e:
@@ -63,7 +92,11 @@ def clear_history() -> Dict[str, str]:
             return {"error": "ComfyUI服务器未启动"}
         
         # 直接调用prompt_queue的wipe_history方法
-        tools_base.prompt_server.prompt_queue.wipe_history()
+        with queue_lock("clear_history"):
+            tools_base.prompt_server.prompt_queue.wipe_history()
+        store = get_history_store()
+        if store is not None:
+            store.delete()
         return {"status": "success", "message": "历史记录已清除"}
         
     except Exception as e:
@@ -85,8 +118,69 @@ def delete_history_item(prompt_id: str) -> Dict[str, str]:
             return {"error": "ComfyUI服务器未启动"}
         
         # 直接调用prompt_queue的delete_history_item方法
-        tools_base.prompt_server.prompt_queue.delete_history_item(prompt_id)
+        with queue_lock("delete_history_item"):
+            tools_base.prompt_server.prompt_queue.delete_history_item(prompt_id)
+        store = get_history_store()
+        if store is not None:
+            store.delete([prompt_id])
         return {"status": "success", "message": f"历史记录项 {prompt_id} 已删除"}
         
     except Exception as e:
-        return {"error": f"删除历史记录失败: {e}"} 
\ No newline at end of file
+        return {"error": f"删除历史记录失败: {e}"}
+
+def delete_history_items(prompt_ids: Optional[List[str]] = None, client_id: Optional[str] = None,
+                         older_than: Optional[float] = None) -> Dict[str, Any]:
+    """
+    批量删除历史记录（内存和数据库各一次加锁/事务）
+    
+    Args:
+        prompt_ids: 要删除的提示ID列表（可选）
+        client_id: 只删除该客户端的记录（可选）
+        older_than: 只删除完成超过该秒数的记录（可选）
+    
+    Returns:
+        操作结果，包含被删除的提示ID
+    """
+    try:
+        if tools_base.prompt_server is None:
+            return {"error": "ComfyUI服务器未启动"}
+        
+        if prompt_ids is None and not client_id and older_than is None:
+            return {"error": "至少需要提供 prompt_ids、client_id 或 older_than 之一"}
+        
+        targets = set(prompt_ids) if prompt_ids is not None else None
+        completed_before = time.time() - older_than if older_than is not None else None
+        
+        def matches(prompt_id, item) -> bool:
+            prompt = item.get("prompt") or ()
+            extra_data = prompt[3] if len(prompt) > 3 and isinstance(prompt[3], dict) else {}
+            if targets is not None and prompt_id not in targets:
+                return False
+            if client_id and extra_data.get("client_id") != client_id:
+                return False
+            if completed_before is not None:
+                completed_at = item_completed_at(item)
+                if completed_at is None or completed_at >= completed_before:
+                    return False
+            return True
+        
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        with queue_lock("delete_history_items"):
+            deleted = [prompt_id for prompt_id, item in prompt_queue.history.items() if matches(prompt_id, item)]
+            for prompt_id in deleted:
+                prompt_queue.history.pop(prompt_id, None)
+        
+        # 数据库中可能保留了内存中已被清理的记录，按同样的条件删除
+        store = get_history_store()
+        if store is not None:
+            store.flush()
+            deleted = list(dict.fromkeys(deleted + store.delete_matching(prompt_ids, client_id, completed_before)))
+        
+        return {
+            "status": "success",
+            "deleted": deleted,
+            "message": f"已删除 {len(deleted)} 条历史记录",
+        }
+        
+    except Exception as e:
+        return {"error": f"批量删除历史记录失败: {e}"}
@@ -0,0 +1,292 @@
+"""
+任务日志 - 提交前把任务追加写入磁盘（JSONL），ComfyUI 重启后重新入队未完成的任务，并支持幂等键
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Iterable
+from .base_tools import tools_base, lazy_import, get_config
+from .events import event_hub, TASK_DONE_EVENT
+
+# 累计多少条结束记录后压缩日志文件
+COMPACT_AFTER = 1000
+
+class JobJournal:
+    """
+    预写式任务日志
+
+    每次提交先写入 submit 记录（含工作流），任务结束、删除或提交失败时追加对应记录；
+    重启后仍处于 pending 状态且不在队列/历史中的任务会用原 prompt_id 重新入队
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self._lock = threading.RLock()
+        # prompt_id -> 日志条目（state 为 pending/done）
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 幂等键 -> prompt_id
+        self._keys: Dict[str, str] = {}
+        self._file = None
+        self._finished_since_compact = 0
+        self.stats = {"submitted": 0, "duplicates": 0, "replayed": 0}
+
+    @staticmethod
+    def default_path() -> str:
+        """日志路径：config.json 中的 journal.path，相对路径以插件根目录为基准"""
+        path = get_config("journal", "path", "mcp_jobs.jsonl")
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+        return path
+
+    @property
+    def started(self) -> bool:
+        return self._file is not None
+
+    def _append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if get_config("journal", "fsync", True):
+            os.fsync(self._file.fileno())
+
+    def _apply(self, record: Dict[str, Any]):
+        """把一条日志记录应用到内存状态"""
+        prompt_id = record.get("prompt_id")
+        op = record.get("op")
+        if not prompt_id:
+            return
+        if op == "submit":
+            self._entries[prompt_id] = {
+                "prompt_id": prompt_id,
+                "key": record.get("key"),
+                "client_id": record.get("client_id"),
+                "time": record.get("time"),
+                "workflow": record.get("workflow"),
+                "state": record.get("state", "pending"),
+            }
+            if record.get("key"):
+                self._keys[record["key"]] = prompt_id
+        elif op == "failed":
+            entry = self._entries.pop(prompt_id, None)
+            if entry is not None and entry["key"]:
+                self._keys.pop(entry["key"], None)
+        elif op == "done":
+            entry = self._entries.get(prompt_id)
+            if entry is not None:
+                entry["state"] = "done"
+                entry["workflow"] = None
+
+    def _compact(self):
+        """重写日志：保留未完成任务，已结束任务只保留保留期内的幂等键"""
+        cutoff = time.time() - get_config("journal", "key_retention", 86400.0)
+        for prompt_id in [prompt_id for prompt_id, entry in self._entries.items()
+                          if entry["state"] != "pending" and (entry["time"] or 0) < cutoff]:
+            entry = self._entries.pop(prompt_id)
+            if entry["key"] and self._keys.get(entry["key"]) == prompt_id:
+                del self._keys[entry["key"]]
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in self._entries.values():
+                record = {"op": "submit", **{k: v for k, v in entry.items() if v is not None}}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._finished_since_compact = 0
+
+    def start(self) -> bool:
+        """读取已有日志、压缩并订阅任务结束事件（重复调用无副作用）"""
+        with self._lock:
+            if self.started:
+                return True
+            self.path = self.path or self.default_path()
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            self._apply(json.loads(line))
+                        except ValueError:
+                            # 崩溃时可能留下写了一半的最后一行
+                            self.logger.warning(f"忽略损坏的任务日志行: {line[:80]!r}")
+            self._compact()
+            event_hub.add_listener(self.on_event)
+            event_hub.install()
+            return True
+
+    def on_event(self, event: str, data: Any, sid: Optional[str] = None):
+        """任务结束时追加 done 记录"""
+        if event == TASK_DONE_EVENT and isinstance(data, dict):
+            self.mark_finished([data.get("prompt_id")], data.get("status_str") or "done")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """按幂等键查找已提交的 prompt_id"""
+        with self._lock:
+            prompt_id = self._keys.get(key)
+            if prompt_id is not None:
+                self.stats["duplicates"] += 1
+            return prompt_id
+
+    def record_submit(self, prompt_id: str, workflow: Dict[str, Any], client_id: Optional[str] = None,
+                      key: Optional[str] = None) -> Optional[str]:
+        """
+        提交前写入 submit 记录
+
+        Returns:
+            幂等键已被占用时返回原 prompt_id，否则返回 None
+        """
+        with self._lock:
+            if key and key in self._keys:
+                self.stats["duplicates"] += 1
+                return self._keys[key]
+            record = {"op": "submit", "prompt_id": prompt_id, "key": key, "client_id": client_id,
+                      "time": time.time(), "workflow": workflow}
+            self._append(record)
+            self._apply(record)
+            self.stats["submitted"] += 1
+            return None
+
+    def record_failed(self, prompt_id: str):
+        """提交被 ComfyUI 拒绝：丢弃条目并释放幂等键，重试时会重新提交"""
+        with self._lock:
+            if prompt_id in self._entries:
+                record = {"op": "failed", "prompt_id": prompt_id}
+                self._append(record)
+                self._apply(record)
+
+    def resolve_unknown(self, prompt_id: str) -> bool:
+        """
+        提交结果未知（post_prompt 超时或抛出异常）时确认任务是否已入队，未入队则按提交失败处理
+
+        已入队的任务保留日志条目，使用相同幂等键的重试会返回该任务而不是重复提交
+
+        Returns:
+            任务是否已在队列、执行中或历史记录中
+        """
+        queued = tools_base.prompt_server is not None and prompt_id in self._known_prompt_ids()
+        if not queued:
+            self.record_failed(prompt_id)
+        return queued
+
+    def mark_finished(self, prompt_ids: Iterable[Optional[str]], status: str = "done"):
+        """任务结束或被删除：追加 done 记录，之后不再重放"""
+        with self._lock:
+            if not self.started:
+                return
+            for prompt_id in prompt_ids:
+                entry = self._entries.get(prompt_id)
+                if entry is None or entry["state"] != "pending":
+                    continue
+                record = {"op": "done", "prompt_id": prompt_id, "status": status}
+                self._append(record)
+                self._apply(record)
+                self._finished_since_compact += 1
+            if self._finished_since_compact >= COMPACT_AFTER:
+                self._compact()
+
+    @staticmethod
+    def _known_prompt_ids() -> Dict[str, bool]:
+        """队列、执行中和历史记录中已有的任务ID -> 是否已结束（在历史记录中）"""
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        with prompt_queue.mutex:
+            known = {item[1]: False for item in prompt_queue.queue}
+            known.update((item[1], False) for item in prompt_queue.currently_running.values())
+            known.update(dict.fromkeys(prompt_queue.history.keys(), True))
+        return known
+
+    def replay(self) -> List[Dict[str, Any]]:
+        """
+        重新提交日志中未完成、且不在队列/历史中的任务（沿用原 prompt_id）
+
+        Returns:
+            每个被重放任务的提交结果
+        """
+        if tools_base.prompt_server is None:
+            return []
+        with self._lock:
+            pending = [dict(entry) for entry in self._entries.values() if entry["state"] == "pending"]
+        if not pending:
+            return []
+
+        known = self._known_prompt_ids()
+        store = lazy_import("tools.history_store").get_history_store()
+        post_prompt = lazy_import("tools.workflow_tools").post_prompt
+        results = []
+        for entry in pending:
+            prompt_id = entry["prompt_id"]
+            if known.get(prompt_id) or (prompt_id not in known and store is not None and store.get(prompt_id)):
+                # 已执行完（结束消息在日志启动前发出）：不再重放
+                self.mark_finished([prompt_id])
+                continue
+            if prompt_id in known:
+                # 仍在队列中或正在执行，结束时会收到任务结束事件
+                continue
+            result = post_prompt(entry["workflow"], entry["client_id"], prompt_id)
+            if isinstance(result, dict) and result.get("prompt_id"):
+                self.stats["replayed"] += 1
+                self.logger.info(f"已重放任务 {prompt_id}")
+            else:
+                self.logger.warning(f"重放任务 {prompt_id} 失败: {result}")
+                self.mark_finished([prompt_id], "replay_failed")
+            results.append({"prompt_id": prompt_id, "result": result})
+        return results
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = sum(1 for entry in self._entries.values() if entry["state"] == "pending")
+            return {
+                "enabled": get_config("journal", "enabled", False),
+                "path": self.path,
+                "pending": pending,
+                "entries": len(self._entries),
+                "idempotency_keys": len(self._keys),
+                **self.stats,
+            }
+
+# 全局任务日志实例
+job_journal = JobJournal()
+
+def get_job_journal() -> Optional[JobJournal]:
+    """按配置返回已启动的任务日志，未启用时返回 None"""
+    if not get_config("journal", "enabled", False):
+        return None
+    if not job_journal.started:
+        if tools_base.prompt_server is None:
+            return None
+        job_journal.start()
+    return job_journal
+
+def start_job_journal() -> Dict[str, Any]:
+    """
+    按配置启动任务日志，并重放上次退出时未完成的任务
+
+    Returns:
+        操作结果，包含重放的任务
+    """
+    try:
+        journal = get_job_journal()
+        if journal is None:
+            return {"status": "disabled", "message": "任务日志未启用"}
+        replayed = journal.replay()
+        return {"status": "success", "path": journal.path, "replayed": replayed}
+    except Exception as e:
+        return {"error": f"启动任务日志失败: {e}"}
+
+def get_job_journal_status() -> Dict[str, Any]:
+    """
+    获取任务日志状态
+
+    Returns:
+        未完成任务数、幂等键数量及提交/重复/重放计数
+    """
+    try:
+        return job_journal.status()
+    except Exception as e:
+        return {"error": f"获取任务日志状态失败: {e}"}
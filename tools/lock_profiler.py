@@ -0,0 +1,143 @@
+"""
+队列锁统计 - 记录各工具等待和持有 prompt_queue.mutex 的时间，标记慢调用，找出拖慢执行线程的 MCP 请求
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any
+from .base_tools import tools_base, get_config
+
+# 保留的最近慢调用数
+MAX_SLOW_CALLS = 100
+
+class LockProfiler:
+    """按工具名累计队列锁的等待/持有时间；同一线程嵌套加锁时只统计最外层"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._slow_calls: "deque[Dict[str, Any]]" = deque(maxlen=MAX_SLOW_CALLS)
+        self.started_at = time.time()
+
+    @contextmanager
+    def acquire(self, tool_name: str, lock):
+        """获取锁并记录等待与持有时间"""
+        depth = getattr(self._local, "depth", 0)
+        if depth > 0 or not get_config("lock_profiler", "enabled", True):
+            # 嵌套加锁（RLock 可重入）不重复统计
+            self._local.depth = depth + 1
+            try:
+                with lock:
+                    yield
+            finally:
+                self._local.depth = depth
+            return
+
+        requested = time.perf_counter()
+        contended = not lock.acquire(blocking=False)
+        if contended:
+            lock.acquire()
+        acquired = time.perf_counter()
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            lock.release()
+            self._record(tool_name, acquired - requested, time.perf_counter() - acquired, contended)
+
+    def _record(self, tool_name: str, wait: float, hold: float, contended: bool):
+        threshold = get_config("lock_profiler", "slow_threshold_ms", 50.0) / 1000
+        slow = wait + hold >= threshold
+        with self._lock:
+            stats = self._stats.get(tool_name)
+            if stats is None:
+                stats = self._stats[tool_name] = {
+                    "calls": 0, "contended": 0, "slow_calls": 0,
+                    "wait_total": 0.0, "wait_max": 0.0, "hold_total": 0.0, "hold_max": 0.0,
+                }
+            stats["calls"] += 1
+            stats["contended"] += contended
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            stats["hold_total"] += hold
+            stats["hold_max"] = max(stats["hold_max"], hold)
+            if slow:
+                stats["slow_calls"] += 1
+                self._slow_calls.append({
+                    "tool": tool_name,
+                    "wait_ms": round(wait * 1000, 3),
+                    "hold_ms": round(hold * 1000, 3),
+                    "at": time.time(),
+                })
+        if slow:
+            self.logger.warning(f"{tool_name} 队列锁慢调用: 等待 {wait * 1000:.1f} ms, 持有 {hold * 1000:.1f} ms")
+
+    def report(self, top: int = 10) -> Dict[str, Any]:
+        """按累计持有时间排序的统计，以及最慢的几次调用"""
+        with self._lock:
+            tools = []
+            for tool_name, stats in self._stats.items():
+                calls = stats["calls"]
+                tools.append({
+                    "tool": tool_name,
+                    "calls": calls,
+                    "contended": stats["contended"],
+                    "slow_calls": stats["slow_calls"],
+                    "wait_total_ms": round(stats["wait_total"] * 1000, 3),
+                    "wait_avg_ms": round(stats["wait_total"] * 1000 / calls, 3),
+                    "wait_max_ms": round(stats["wait_max"] * 1000, 3),
+                    "hold_total_ms": round(stats["hold_total"] * 1000, 3),
+                    "hold_avg_ms": round(stats["hold_total"] * 1000 / calls, 3),
+                    "hold_max_ms": round(stats["hold_max"] * 1000, 3),
+                })
+            slow_calls = sorted(self._slow_calls, key=lambda call: call["wait_ms"] + call["hold_ms"], reverse=True)
+        tools.sort(key=lambda item: item["hold_total_ms"], reverse=True)
+        return {
+            "since": self.started_at,
+            "slow_threshold_ms": get_config("lock_profiler", "slow_threshold_ms", 50.0),
+            "tools": tools,
+            "top_offenders": [item["tool"] for item in tools[:top] if item["hold_total_ms"] > 0],
+            "slowest_calls": slow_calls[:top],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow_calls.clear()
+            self.started_at = time.time()
+
+# 全局队列锁统计实例
+lock_profiler = LockProfiler()
+
+def queue_lock(tool_name: str):
+    """
+    以 tool_name 的名义获取 prompt_queue.mutex 并统计等待/持有时间
+
+    mutex 是 RLock，块内再调用 prompt_queue 自身加锁的方法不会重复等待
+    """
+    return lock_profiler.acquire(tool_name, tools_base.prompt_server.prompt_queue.mutex)
+
+def get_lock_stats(top: int = 10, reset: bool = False) -> Dict[str, Any]:
+    """
+    获取各工具对队列锁的等待/持有时间统计
+
+    Args:
+        top: 返回的最慢调用和主要占用者数量
+        reset: 读取后是否清空统计
+
+    Returns:
+        按累计持有时间排序的各工具统计、主要占用者和最慢的调用
+    """
+    try:
+        report = lock_profiler.report(top)
+        if reset:
+            lock_profiler.reset()
+        return report
+    except Exception as e:
+        return {"error": f"获取队列锁统计失败: {e}"}
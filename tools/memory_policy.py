@@ -0,0 +1,221 @@
+"""
+内存压力策略 - 后台采样内存/显存，在任务间隙自动释放缓存或卸载模型
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+from .base_tools import tools_base, get_config
+from .system_tools import get_system_stats
+
+# 保留的动作日志条数
+MAX_ACTION_LOG = 100
+
+class MemoryPressurePolicy:
+    """
+    根据系统状态中的 RAM/VRAM 空闲比例自动释放内存
+
+    空闲比例低于 low 阈值时触发一次释放，之后直到空闲比例恢复到 recover 阈值以上才会再次触发（滞回）；
+    释放后仍未恢复时，经过 retry_interval 秒冷却再次允许触发
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # 各资源是否允许触发释放
+        self._armed = {"ram": True, "vram": True}
+        # 释放未能恢复内存时，到该时间之前不再触发
+        self._retry_at = {"ram": 0.0, "vram": 0.0}
+        # 已请求、尚未被执行线程处理的释放
+        self._pending: Optional[Dict[str, Any]] = None
+        self.last_sample: Optional[Dict[str, Any]] = None
+        self.actions = deque(maxlen=MAX_ACTION_LOG)
+        self.total_reclaimed = 0
+
+    @staticmethod
+    def thresholds(resource: str) -> Dict[str, float]:
+        """读取某类资源的触发/恢复阈值"""
+        return {
+            "low": get_config("memory_policy", f"{resource}_low_free_ratio", 0.1),
+            "recover": get_config("memory_policy", f"{resource}_recover_free_ratio", 0.25),
+        }
+
+    def sample(self) -> Optional[Dict[str, Any]]:
+        """从系统状态中采样 RAM/VRAM 的空闲字节数和空闲比例"""
+        stats = get_system_stats()
+        if not isinstance(stats, dict) or "error" in stats:
+            return None
+
+        sample = {"time": time.time()}
+        system = stats.get("system", {})
+        if system.get("ram_total"):
+            sample["ram"] = {
+                "free": system.get("ram_free", 0),
+                "total": system["ram_total"],
+                "free_ratio": system.get("ram_free", 0) / system["ram_total"],
+            }
+        devices = [device for device in stats.get("devices", []) if device.get("vram_total")]
+        if devices:
+            device = devices[0]
+            sample["vram"] = {
+                "free": device.get("vram_free", 0),
+                "total": device["vram_total"],
+                "free_ratio": device.get("vram_free", 0) / device["vram_total"],
+            }
+        return sample
+
+    def _flag_pending(self, action: str) -> bool:
+        """执行线程是否还没处理释放请求（ComfyUI 在任务间隙读取并清除 prompt_queue.flags）"""
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        with prompt_queue.mutex:
+            return action in getattr(prompt_queue, "flags", {})
+
+    def _request(self, resource: str, before: Dict[str, Any], action: str) -> Dict[str, Any]:
+        """
+        通过 prompt_queue 标志请求释放，由 ComfyUI 执行线程在两个任务之间完成，不会与正在执行的任务争用模型
+
+        action 为 free_memory（清空节点缓存和显存缓存）或 unload_models（卸载模型）
+        """
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        with prompt_queue.mutex:
+            # prompt_worker 中 unload_models 未设置时取 free_memory 的值，需显式关闭才不会连带卸载模型；
+            # 已有其他来源请求卸载模型时不覆盖
+            if action == "free_memory" and "unload_models" not in getattr(prompt_queue, "flags", {}):
+                prompt_queue.set_flag("unload_models", False)
+            prompt_queue.set_flag(action, True)
+        self._pending = {"resource": resource, "action": action, "before": before, "requested_at": time.time()}
+        self.logger.info(f"内存压力策略: {resource} 空闲比例 {before['free_ratio']:.1%}，请求 {action}")
+        return {**self._pending, "status": "requested"}
+
+    def _settle(self, sample: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """释放请求被执行线程处理后记录效果，并决定是否升级为卸载模型或重新允许触发"""
+        pending = self._pending
+        if self._flag_pending(pending["action"]):
+            return None
+        self._pending = None
+
+        resource, before = pending["resource"], pending["before"]
+        after = sample.get(resource, before)
+        entry = {
+            "time": time.time(),
+            "resource": resource,
+            "action": pending["action"],
+            "wait_seconds": round(time.time() - pending["requested_at"], 3),
+            "free_ratio_before": round(before["free_ratio"], 4),
+            "free_ratio_after": round(after["free_ratio"], 4),
+            "reclaimed_bytes": max(after["free"] - before["free"], 0),
+        }
+        self.actions.append(entry)
+        self.total_reclaimed += entry["reclaimed_bytes"]
+        self.logger.info(f"内存压力策略: {resource} {entry['action']}, 回收 {entry['reclaimed_bytes']} 字节")
+
+        limits = self.thresholds(resource)
+        if (after["free_ratio"] < limits["low"] and pending["action"] == "free_memory"
+                and get_config("memory_policy", "unload_models", True)):
+            # 清空缓存不够，继续卸载模型
+            self._request(resource, after, "unload_models")
+        elif after["free_ratio"] < limits["recover"]:
+            # 释放后仍未恢复到 recover 阈值：冷却后重新允许触发，否则会一直保持未触发状态
+            self._armed[resource] = True
+            self._retry_at[resource] = time.time() + get_config("memory_policy", "retry_interval", 60.0)
+        return entry
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """
+        采样一次并按需请求释放内存
+
+        Returns:
+            本次的释放请求或已完成释放的记录，没有动作时返回 None
+        """
+        with self._lock:
+            if tools_base.prompt_server is None:
+                return None
+            sample = self.sample()
+            if sample is None:
+                return None
+            self.last_sample = sample
+            if self._pending is not None:
+                return self._settle(sample)
+
+            now = time.time()
+            for resource in ("vram", "ram"):
+                current = sample.get(resource)
+                if current is None:
+                    continue
+                limits = self.thresholds(resource)
+                if current["free_ratio"] >= limits["recover"]:
+                    self._armed[resource] = True
+                elif (current["free_ratio"] < limits["low"] and self._armed[resource]
+                      and now >= self._retry_at[resource]):
+                    self._armed[resource] = False
+                    return self._request(resource, current, "free_memory")
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"内存压力策略执行失败: {e}")
+            self._stop.wait(get_config("memory_policy", "interval", 5.0))
+
+    def start(self) -> bool:
+        """启动后台采样线程（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mcp-memory-policy", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """停止后台采样线程"""
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        """获取策略状态和动作日志"""
+        return {
+            "enabled": get_config("memory_policy", "enabled", False),
+            "running": self._thread is not None and self._thread.is_alive(),
+            "armed": dict(self._armed),
+            "retry_at": dict(self._retry_at),
+            "pending": self._pending,
+            "thresholds": {resource: self.thresholds(resource) for resource in ("ram", "vram")},
+            "last_sample": self.last_sample,
+            "total_reclaimed_bytes": self.total_reclaimed,
+            "actions": list(self.actions),
+        }
+
+# 全局内存压力策略实例
+memory_policy = MemoryPressurePolicy()
+
+def start_memory_policy() -> Dict[str, Any]:
+    """
+    按配置启动内存压力策略
+
+    Returns:
+        操作结果
+    """
+    try:
+        if not get_config("memory_policy", "enabled", False):
+            return {"status": "disabled", "message": "memory_policy.enabled 未开启"}
+        memory_policy.start()
+        return {"status": "success", "message": "内存压力策略已启动"}
+    except Exception as e:
+        return {"error": f"启动内存压力策略失败: {e}"}
+
+def get_memory_policy_status() -> Dict[str, Any]:
+    """
+    获取内存压力策略状态
+
+    Returns:
+        最近一次采样、滞回状态、动作日志及累计回收字节数
+    """
+    try:
+        return memory_policy.status()
+    except Exception as e:
+        return {"error": f"获取内存压力策略状态失败: {e}"}
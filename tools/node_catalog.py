@@ -0,0 +1,183 @@
+"""
+节点目录索引 - 预先索引节点名称、显示名、分类和输入/输出类型，支持快速检索节点
+"""
+
+import re
+import bisect
+import threading
+from typing import Dict, Any, Optional, List, Set
+from .base_tools import lazy_import
+from .history_index import tokenize
+
+# 驼峰命名拆分为单词（KSamplerAdvanced -> K Sampler Advanced）
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+def _input_type_name(spec: Any) -> str:
+    """输入定义中的类型名，组合框统一为 COMBO"""
+    input_type = spec[0] if isinstance(spec, (list, tuple)) and spec else spec
+    if isinstance(input_type, (list, tuple)):
+        return "COMBO"
+    return str(input_type)
+
+def describe_node(class_type: str, node_class: Any, display_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    生成节点的精简描述
+
+    Args:
+        class_type: 节点类型名
+        node_class: 节点类
+        display_name: 显示名（可选）
+
+    Returns:
+        节点名、显示名、分类、输入/输出类型
+    """
+    try:
+        input_types = node_class.INPUT_TYPES() or {}
+    except Exception:
+        input_types = {}
+    inputs = {}
+    for section in ("required", "optional"):
+        for input_name, spec in (input_types.get(section) or {}).items():
+            inputs[input_name] = _input_type_name(spec)
+
+    return {
+        "name": class_type,
+        "display_name": display_name or class_type,
+        "category": getattr(node_class, "CATEGORY", "") or "",
+        "inputs": inputs,
+        "outputs": [str(output) for output in (getattr(node_class, "RETURN_TYPES", ()) or ())],
+        "output_node": bool(getattr(node_class, "OUTPUT_NODE", False)),
+    }
+
+class NodeCatalog:
+    """节点目录的倒排索引，节点数量变化（加载了新的自定义节点）时自动重建"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = -1
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self._terms: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._by_input: Dict[str, Set[str]] = {}
+        self._by_output: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def _node_terms(node: Dict[str, Any]) -> Set[str]:
+        text = " ".join([_CAMEL_RE.sub(" ", node["name"]), node["display_name"], node["category"].replace("/", " ")])
+        terms = set(tokenize(text))
+        terms.add(node["name"].lower())
+        return terms
+
+    def _build(self, mappings: Dict[str, Any], display_names: Dict[str, str]):
+        nodes, terms, by_input, by_output = {}, {}, {}, {}
+        for class_type, node_class in mappings.items():
+            node = describe_node(class_type, node_class, display_names.get(class_type))
+            nodes[class_type] = node
+            for term in self._node_terms(node):
+                terms.setdefault(term, set()).add(class_type)
+            for input_type in set(node["inputs"].values()):
+                by_input.setdefault(input_type.upper(), set()).add(class_type)
+            for output_type in set(node["outputs"]):
+                by_output.setdefault(output_type.upper(), set()).add(class_type)
+
+        self.nodes, self._terms = nodes, terms
+        self._vocabulary = sorted(terms)
+        self._by_input, self._by_output = by_input, by_output
+        self._size = len(mappings)
+
+    def refresh(self) -> bool:
+        """
+        节点数量变化时重建索引
+
+        Returns:
+            是否发生了重建
+        """
+        nodes_module = lazy_import("nodes")
+        mappings = nodes_module.NODE_CLASS_MAPPINGS
+        if len(mappings) == self._size:
+            return False
+        with self._lock:
+            if len(mappings) == self._size:
+                return False
+            self._build(dict(mappings), dict(getattr(nodes_module, "NODE_DISPLAY_NAME_MAPPINGS", {})))
+            return True
+
+    def _match_term(self, token: str) -> Set[str]:
+        """按前缀匹配检索词（"samp" 可命中 "sampler"）"""
+        matched: Set[str] = set()
+        start = bisect.bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            matched |= self._terms.get(term, set())
+        return matched
+
+    def search(self, query: Optional[str] = None, input_type: Optional[str] = None,
+               output_type: Optional[str] = None, category: Optional[str] = None,
+               limit: int = 20) -> Dict[str, Any]:
+        """
+        检索节点，所有条件取交集
+
+        Returns:
+            匹配总数和按相关度排序的节点描述
+        """
+        self.refresh()
+        candidates: Optional[Set[str]] = None
+        if input_type:
+            candidates = set(self._by_input.get(input_type.upper(), ()))
+        if output_type:
+            matched = self._by_output.get(output_type.upper(), set())
+            candidates = matched.copy() if candidates is None else candidates & matched
+        if category:
+            prefix = category.lower()
+            matched = {name for name, node in self.nodes.items() if node["category"].lower().startswith(prefix)}
+            candidates = matched if candidates is None else candidates & matched
+
+        scores: Dict[str, int] = {}
+        if query:
+            tokens = tokenize(_CAMEL_RE.sub(" ", query))
+            for token in tokens:
+                matched = self._match_term(token)
+                if candidates is not None:
+                    matched &= candidates
+                for name in matched:
+                    scores[name] = scores.get(name, 0) + 1
+            # 所有检索词都命中的节点才算匹配，完整节点名命中时排在最前
+            exact = query.lower()
+            names = [name for name, score in scores.items() if score == len(tokens)]
+            names.sort(key=lambda name: (name.lower() != exact, len(name), name))
+        else:
+            names = sorted(candidates if candidates is not None else self.nodes)
+
+        return {
+            "total": len(names),
+            "nodes": [self.nodes[name] for name in names[:limit]],
+        }
+
+# 全局节点目录
+node_catalog = NodeCatalog()
+
+def search_nodes(query: Optional[str] = None, input_type: Optional[str] = None,
+                 output_type: Optional[str] = None, category: Optional[str] = None,
+                 limit: int = 20) -> Dict[str, Any]:
+    """
+    检索节点（名称、显示名、分类、输入/输出类型）
+
+    Args:
+        query: 检索文本（可选），匹配节点名、显示名和分类，支持前缀
+        input_type: 只返回有该类型输入的节点（可选，如 IMAGE）
+        output_type: 只返回输出该类型的节点（可选，如 LATENT）
+        category: 分类前缀（可选，如 sampling）
+        limit: 最多返回的节点数
+
+    Returns:
+        匹配总数和精简的节点描述列表
+    """
+    try:
+        if not (query or input_type or output_type or category):
+            return {"error": "至少需要提供 query、input_type、output_type 或 category 之一"}
+        return node_catalog.search(query, input_type, output_type, category, limit)
+    except ImportError:
+        return {"error": "ComfyUI节点模块不可用"}
+    except Exception as e:
+        return {"error": f"检索节点失败: {e}"}
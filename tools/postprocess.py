@@ -0,0 +1,255 @@
+"""
+输出后处理 - 任务完成后在转码子进程中把输出图片转码为配置的变体（缩略图、缩放图等），缓存在输出目录中
+"""
+
+import os
+import sys
+import json
+import queue
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+from .base_tools import tools_base, lazy_import, get_config
+from .events import event_hub, TASK_DONE_EVENT
+from .postprocess_worker import PIL_FORMATS
+
+# 最多保留多少个任务的变体记录
+MAX_TRACKED_PROMPTS = 256
+# 变体保存在输出子目录下的该目录中，可直接用 view_image 查看
+VARIANT_SUBFOLDER = "mcp_variants"
+
+# 转码子进程脚本：只依赖 PIL。multiprocessing 的 spawn/forkserver 子进程会重新导入 ComfyUI 的 main.py，
+# fork 则会在多线程且已加载 CUDA 的进程中复制出子进程，因此用 subprocess 直接启动独立脚本
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "postprocess_worker.py")
+
+def parse_variants(value: str) -> List[Dict[str, Any]]:
+    """
+    解析变体配置，格式为 "名称:格式:最长边:质量"，多个变体用分号分隔
+
+    例: "thumb:webp:256:80;preview:jpeg:1024:85"
+    """
+    variants = []
+    for item in value.split(";"):
+        parts = [part.strip() for part in item.split(":")]
+        if len(parts) < 2 or not parts[0] or parts[1].lower() not in PIL_FORMATS:
+            continue
+        variants.append({
+            "name": parts[0],
+            "format": parts[1].lower(),
+            "max_size": int(parts[2]) if len(parts) > 2 and parts[2] else 0,
+            "quality": int(parts[3]) if len(parts) > 3 and parts[3] else 85,
+        })
+    return variants
+
+class OutputPostProcessor:
+    """
+    订阅任务完成事件，把输出图片的变体转码交给子进程
+
+    任务完成事件在 ComfyUI 执行线程中分发，这里只把 prompt_id 放入队列；读取历史记录、创建目录等
+    由后台线程完成，每个转码线程独占一个转码子进程
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._prompts: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._jobs: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._processes: List[subprocess.Popen] = []
+        # prompt_id -> 变体记录列表
+        self._results: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.stats = {"rendered": 0, "cached": 0, "failed": 0}
+
+    def _ensure_threads(self):
+        """启动调度线程和转码线程（转码子进程在第一次有任务时才启动）"""
+        with self._lock:
+            if self._threads:
+                return
+            self._threads.append(threading.Thread(target=self._dispatch_loop, name="mcp-postprocess", daemon=True))
+            for index in range(max(1, get_config("postprocess", "workers", 2))):
+                self._threads.append(threading.Thread(target=self._render_loop,
+                                                      name=f"mcp-postprocess-worker-{index}", daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def start(self) -> bool:
+        """订阅任务完成事件（重复调用无副作用）"""
+        self._ensure_threads()
+        event_hub.add_listener(self.on_event)
+        return event_hub.install()
+
+    def stop(self):
+        """停止后台线程和转码子进程"""
+        event_hub.remove_listener(self.on_event)
+        with self._lock:
+            threads, self._threads = self._threads, []
+            processes = list(self._processes)
+        if threads:
+            self._prompts.put(None)
+            for _ in threads[1:]:
+                self._jobs.put(None)
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+
+    def on_event(self, event: str, data: Any, sid: Optional[str] = None):
+        """任务完成时只登记 prompt_id，不在执行线程中做任何 I/O"""
+        if event != TASK_DONE_EVENT or not isinstance(data, dict) or data.get("status_str") == "error":
+            return
+        self._prompts.put(data["prompt_id"])
+
+    def _dispatch_loop(self):
+        while True:
+            prompt_id = self._prompts.get()
+            if prompt_id is None:
+                return
+            try:
+                self.process(prompt_id)
+            except Exception as e:
+                self.logger.error(f"安排输出后处理失败: {e}")
+
+    def _spawn(self) -> subprocess.Popen:
+        process = subprocess.Popen([sys.executable, WORKER_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   text=True, encoding="utf-8", bufsize=1)
+        with self._lock:
+            self._processes = [item for item in self._processes if item.poll() is None] + [process]
+        return process
+
+    def _render_loop(self):
+        """逐个把转码请求发给自己的子进程；子进程退出后下一个任务会重新启动"""
+        process: Optional[subprocess.Popen] = None
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            record, request = job
+            try:
+                if process is None or process.poll() is not None:
+                    process = self._spawn()
+                process.stdin.write(json.dumps(request, ensure_ascii=False) + "\n")
+                process.stdin.flush()
+                line = process.stdout.readline()
+                if not line:
+                    raise RuntimeError(f"转码进程已退出（返回码 {process.poll()}）")
+                response = json.loads(line)
+                if not response.get("ok"):
+                    raise RuntimeError(response.get("error"))
+                record["state"] = "done"
+                self.stats["rendered"] += 1
+            except Exception as e:
+                record["state"] = "error"
+                record["error"] = str(e)
+                self.stats["failed"] += 1
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    @staticmethod
+    def _output_images(prompt_id: str) -> List[Dict[str, Any]]:
+        """历史记录中该任务保存到输出目录的图片"""
+        history = tools_base.prompt_server.prompt_queue.get_history(prompt_id=prompt_id)
+        outputs = (history.get(prompt_id) or {}).get("outputs") or {}
+        images = []
+        for node_output in outputs.values():
+            for image in node_output.get("images") or []:
+                if isinstance(image, dict) and image.get("filename") and image.get("type", "output") == "output":
+                    images.append(image)
+        return images
+
+    def process(self, prompt_id: str) -> List[Dict[str, Any]]:
+        """
+        为任务的输出图片生成配置的变体，已存在且比原图新的变体直接复用
+
+        Returns:
+            变体记录（转码在后台进行，state 为 pending/done/error）
+        """
+        variants = parse_variants(get_config("postprocess", "variants", ""))
+        images = self._output_images(prompt_id)
+        if not variants or not images:
+            return []
+
+        self._ensure_threads()
+        output_dir = lazy_import("folder_paths").get_output_directory()
+        records = []
+        for image in images:
+            subfolder = image.get("subfolder") or ""
+            source = os.path.join(output_dir, subfolder, image["filename"])
+            variant_subfolder = os.path.join(subfolder, VARIANT_SUBFOLDER)
+            os.makedirs(os.path.join(output_dir, variant_subfolder), exist_ok=True)
+            stem = os.path.splitext(image["filename"])[0]
+
+            for variant in variants:
+                filename = f"{stem}_{variant['name']}.{variant['format']}"
+                destination = os.path.join(output_dir, variant_subfolder, filename)
+                record = {
+                    "source": image["filename"],
+                    "variant": variant["name"],
+                    "filename": filename,
+                    "subfolder": variant_subfolder,
+                    "type": "output",
+                    "state": "pending",
+                }
+                records.append(record)
+                if os.path.exists(destination) and os.path.getmtime(destination) >= os.path.getmtime(source):
+                    record["state"] = "done"
+                    self.stats["cached"] += 1
+                    continue
+                self._jobs.put((record, {
+                    "source": source,
+                    "destination": destination,
+                    "image_format": variant["format"],
+                    "max_size": variant["max_size"],
+                    "quality": variant["quality"],
+                }))
+
+        with self._lock:
+            self._results[prompt_id] = records
+            while len(self._results) > MAX_TRACKED_PROMPTS:
+                self._results.popitem(last=False)
+        return records
+
+    def get(self, prompt_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            records = self._results.get(prompt_id)
+            return [dict(record) for record in records] if records is not None else None
+
+# 全局输出后处理实例
+output_postprocessor = OutputPostProcessor()
+
+def start_output_postprocess() -> Dict[str, Any]:
+    """
+    按配置启动输出后处理
+
+    Returns:
+        操作结果
+    """
+    try:
+        if not get_config("postprocess", "enabled", False):
+            return {"status": "disabled", "message": "postprocess.enabled 未开启"}
+        output_postprocessor.start()
+        return {"status": "success", "variants": parse_variants(get_config("postprocess", "variants", ""))}
+    except Exception as e:
+        return {"error": f"启动输出后处理失败: {e}"}
+
+def get_output_variants(prompt_id: str, generate: bool = False) -> Dict[str, Any]:
+    """
+    获取任务输出的变体（缩略图等），可用 view_image 按 filename/subfolder 查看
+
+    Args:
+        prompt_id: 任务ID
+        generate: 尚未生成时是否立即安排生成
+
+    Returns:
+        变体列表及转码状态
+    """
+    try:
+        records = output_postprocessor.get(prompt_id)
+        if records is None and generate:
+            output_postprocessor.process(prompt_id)
+            records = output_postprocessor.get(prompt_id)
+        if records is None:
+            return {"error": f"任务 {prompt_id} 没有输出变体"}
+        return {"prompt_id": prompt_id, "variants": records, "stats": dict(output_postprocessor.stats)}
+    except Exception as e:
+        return {"error": f"获取输出变体失败: {e}"}
@@ -0,0 +1,47 @@
+"""
+输出变体转码子进程 - 只依赖 PIL，不导入 ComfyUI 和 tools 包
+
+由 postprocess.py 作为独立脚本启动（fork 后立即 exec，不继承 ComfyUI 的线程和 CUDA 状态），
+从标准输入逐行读取 JSON 请求，处理后向标准输出逐行写回结果
+"""
+
+import os
+import sys
+import json
+
+# PIL 保存格式名
+PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG", "jpg": "JPEG", "png": "PNG"}
+
+def render_variant(source: str, destination: str, image_format: str, max_size: int, quality: int) -> str:
+    """
+    生成一个变体
+
+    Returns:
+        变体文件路径
+    """
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.load()
+        if max_size > 0:
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+        pil_format = PIL_FORMATS[image_format]
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        temp_path = f"{destination}.tmp"
+        image.save(temp_path, pil_format, quality=quality)
+    os.replace(temp_path, destination)
+    return destination
+
+def main():
+    for line in sys.stdin:
+        try:
+            render_variant(**json.loads(line))
+            response = {"ok": True}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+执行进度工具 - 从 PromptServer 消息中跟踪每个任务的进度，并转发为 MCP 进度通知
+"""
+
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, List, Tuple
+from .base_tools import tools_base
+from .events import event_hub, TASK_DONE_EVENT
+
+# 同一会话两次进度通知的最小间隔（秒），繁忙的采样器不会刷满 SSE
+MIN_NOTIFY_INTERVAL = 0.25
+# 最多跟踪的任务数，超出后丢弃最早的记录
+MAX_TRACKED_PROMPTS = 256
+# 等待期间兜底检查历史记录的间隔（秒），覆盖收不到完成消息的任务
+HISTORY_POLL_INTERVAL = 2.0
+
+FINISHED_STATUSES = ("success", "error", "interrupted")
+
+# 进度回调签名: report(progress, total, message)
+ProgressReporter = Callable[[float, Optional[float], Optional[str]], Awaitable[None]]
+
+class ProgressTracker:
+    """记录每个 prompt 的执行节点、采样步数和缓存命中节点"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._node_classes: Dict[str, Dict[str, str]] = {}
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        # 会话 -> 上次发送进度通知的时间，以及正在推送进度的任务数（归零时清除该会话的节流记录）
+        self._last_notify: Dict[str, float] = {}
+        self._session_streams: Dict[str, int] = {}
+
+    def install(self) -> bool:
+        """订阅服务器事件"""
+        event_hub.add_listener(self.on_event)
+        return event_hub.install()
+
+    def _ensure_state(self, prompt_id: str) -> Dict[str, Any]:
+        state = self._states.get(prompt_id)
+        if state is None:
+            state = {
+                "prompt_id": prompt_id,
+                "status": "queued",
+                "node": None,
+                "node_class": None,
+                "step": 0,
+                "steps": None,
+                "completed_nodes": 0,
+                "cached_nodes": [],
+                "total_nodes": None,
+                "error": None,
+                "updated_at": time.time(),
+            }
+            self._states[prompt_id] = state
+            while len(self._states) > MAX_TRACKED_PROMPTS:
+                old_id, _ = self._states.popitem(last=False)
+                self._node_classes.pop(old_id, None)
+        return state
+
+    def watch(self, prompt_id: str, workflow: Optional[Dict[str, Any]] = None):
+        """
+        登记一个任务，记录其节点类型以便在进度中显示
+
+        Args:
+            prompt_id: 任务ID
+            workflow: API 格式的工作流（可选）
+        """
+        with self._lock:
+            state = self._ensure_state(prompt_id)
+            if workflow:
+                self._node_classes[prompt_id] = {
+                    node_id: node.get("class_type") for node_id, node in workflow.items() if isinstance(node, dict)
+                }
+                state["total_nodes"] = len(self._node_classes[prompt_id])
+
+    def on_event(self, event: str, data: Any, sid: Optional[str] = None):
+        """处理 PromptServer 消息（在 ComfyUI 执行线程中调用）"""
+        if not isinstance(data, dict) or not data.get("prompt_id"):
+            return
+
+        prompt_id = data["prompt_id"]
+        with self._lock:
+            state = self._ensure_state(prompt_id)
+            if event == "execution_start":
+                state["status"] = "running"
+            elif event == "execution_cached":
+                state["cached_nodes"] = list(data.get("nodes") or [])
+                state["status"] = "running"
+            elif event == "executing":
+                node = data.get("node")
+                if node is None:
+                    # 节点为空表示该 prompt 执行结束
+                    if state["status"] not in FINISHED_STATUSES:
+                        state["status"] = "success"
+                else:
+                    if state["node"] is not None and state["node"] != node:
+                        state["completed_nodes"] += 1
+                    state["node"] = node
+                    state["node_class"] = self._node_classes.get(prompt_id, {}).get(node)
+                    state["step"] = 0
+                    state["steps"] = None
+                    state["status"] = "running"
+            elif event == "progress":
+                state["step"] = data.get("value", 0)
+                state["steps"] = data.get("max")
+                if data.get("node") is not None:
+                    state["node"] = data["node"]
+                state["status"] = "running"
+            elif event == "execution_success":
+                state["status"] = "success"
+            elif event == "execution_error":
+                state["status"] = "error"
+                state["error"] = data.get("exception_message")
+            elif event == "execution_interrupted":
+                state["status"] = "interrupted"
+            elif event == TASK_DONE_EVENT:
+                if state["status"] not in FINISHED_STATUSES:
+                    state["status"] = "error" if data.get("status_str") == "error" else "success"
+            else:
+                return
+            state["updated_at"] = time.time()
+            waiters = list(self._waiters.get(prompt_id, ()))
+
+        for loop, changed in waiters:
+            loop.call_soon_threadsafe(changed.set)
+
+    def get(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务进度的副本"""
+        with self._lock:
+            state = self._states.get(prompt_id)
+            if state is None:
+                return None
+            return {**state, "cached_nodes": list(state["cached_nodes"])}
+
+    def _check_history(self, prompt_id: str) -> bool:
+        """从历史记录确认任务是否已结束（兜底，覆盖没有 client_id 的任务）"""
+        if tools_base.prompt_server is None:
+            return False
+        history = tools_base.prompt_server.prompt_queue.get_history(prompt_id=prompt_id)
+        item = history.get(prompt_id)
+        if not item:
+            return False
+
+        status_str = (item.get("status") or {}).get("status_str", "success")
+        with self._lock:
+            state = self._ensure_state(prompt_id)
+            if state["status"] in FINISHED_STATUSES:
+                return False
+            state["status"] = "error" if status_str == "error" else "success"
+            state["updated_at"] = time.time()
+        return True
+
+    @staticmethod
+    def _progress_value(state: Dict[str, Any]) -> Tuple[float, Optional[float], str]:
+        """把节点/步数折算为单调递增的进度值"""
+        done = float(state["completed_nodes"] + len(state["cached_nodes"]))
+        if state["steps"]:
+            done += min(state["step"] / state["steps"], 1.0)
+        total = float(state["total_nodes"]) if state["total_nodes"] else None
+        if state["status"] in FINISHED_STATUSES and total is not None:
+            done = total
+        elif total is not None:
+            done = min(done, total)
+
+        parts = [state["status"]]
+        if state["node"] is not None and state["status"] == "running":
+            node_label = state["node"] if not state["node_class"] else f"{state['node']} ({state['node_class']})"
+            parts.append(f"节点 {node_label}")
+            if state["steps"]:
+                parts.append(f"步骤 {state['step']}/{state['steps']}")
+        if state["cached_nodes"]:
+            parts.append(f"缓存节点 {len(state['cached_nodes'])}")
+        if state["error"]:
+            parts.append(state["error"])
+        return done, total, " | ".join(parts)
+
+    async def stream(self, prompt_id: str, report: Optional[ProgressReporter] = None,
+                     session_key: Optional[str] = None, timeout: float = 600.0) -> Dict[str, Any]:
+        """
+        等待任务结束，期间把进度变化转发给 report
+
+        Args:
+            prompt_id: 任务ID
+            report: 异步进度回调（如 FastMCP 的 ctx.report_progress）
+            session_key: 会话标识，同一会话共享节流间隔
+            timeout: 最长等待秒数
+
+        Returns:
+            任务最终（或超时时）的进度状态
+        """
+        self.install()
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        waiter = (loop, changed)
+        session_key = session_key or prompt_id
+
+        with self._lock:
+            self._ensure_state(prompt_id)
+            self._waiters.setdefault(prompt_id, []).append(waiter)
+            self._session_streams[session_key] = self._session_streams.get(session_key, 0) + 1
+
+        deadline = loop.time() + timeout
+        last_history_check = float("-inf")
+        last_sent: Optional[Tuple[float, str]] = None
+        try:
+            while True:
+                changed.clear()
+                state = self.get(prompt_id)
+                finished = state["status"] in FINISHED_STATUSES
+
+                if not finished and loop.time() - last_history_check >= HISTORY_POLL_INTERVAL:
+                    last_history_check = loop.time()
+                    if await asyncio.to_thread(self._check_history, prompt_id):
+                        continue
+
+                if report is not None:
+                    since_last = time.monotonic() - self._last_notify.get(session_key, float("-inf"))
+                    if not finished and since_last < MIN_NOTIFY_INTERVAL:
+                        # 节流：合并这段时间内的所有变化，到期后只发送最新状态
+                        await asyncio.sleep(MIN_NOTIFY_INTERVAL - since_last)
+                        continue
+
+                    progress, total, message = self._progress_value(state)
+                    if last_sent is not None:
+                        progress = max(progress, last_sent[0])
+                    if last_sent != (progress, message):
+                        await report(progress, total, message)
+                        self._last_notify[session_key] = time.monotonic()
+                        last_sent = (progress, message)
+
+                if finished:
+                    return state
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return {**state, "timeout": True}
+                try:
+                    await asyncio.wait_for(changed.wait(), min(remaining, HISTORY_POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(prompt_id, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(prompt_id, None)
+                streams = self._session_streams.get(session_key, 1) - 1
+                if streams > 0:
+                    self._session_streams[session_key] = streams
+                else:
+                    self._session_streams.pop(session_key, None)
+                    self._last_notify.pop(session_key, None)
+
+# 全局进度跟踪实例
+progress_tracker = ProgressTracker()
+
+def get_prompt_progress(prompt_id: str) -> Dict[str, Any]:
+    """
+    获取任务的执行进度
+
+    Args:
+        prompt_id: 任务ID
+
+    Returns:
+        当前执行节点、采样步数、缓存节点等进度信息
+    """
+    try:
+        progress_tracker.install()
+        state = progress_tracker.get(prompt_id)
+        if state is None:
+            return {"error": f"未跟踪到任务 {prompt_id} 的进度"}
+        return state
+    except Exception as e:
+        return {"error": f"获取任务进度失败: {e}"}
+
+async def wait_for_prompt(prompt_id: str, report: Optional[ProgressReporter] = None,
+                          session_key: Optional[str] = None, timeout: float = 600.0) -> Dict[str, Any]:
+    """
+    等待任务结束，并通过 report 回调推送节流后的进度
+
+    Args:
+        prompt_id: 任务ID
+        report: 异步进度回调（可选）
+        session_key: 会话标识（可选），用于按会话节流
+        timeout: 最长等待秒数
+
+    Returns:
+        任务最终的进度状态
+    """
+    try:
+        return await progress_tracker.stream(prompt_id, report, session_key, timeout)
+    except Exception as e:
+        return {"error": f"等待任务失败: {e}"}
@@ -0,0 +1,137 @@
+"""
+队列快照 - 带版本号的共享队列快照，支持增量响应
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+from .base_tools import tools_base
+from .lock_profiler import queue_lock
+
+# 快照有效期（秒），有效期内的并发轮询共享同一份快照，不再重复锁定 prompt_queue
+SNAPSHOT_TTL = 0.5
+# 保留的历史版本数，超出后旧版本无法计算增量，调用方会收到完整列表
+MAX_VERSIONS = 64
+
+class QueueSnapshotCache:
+    """缓存 prompt_queue 的快照，并为每次内容变化分配新的版本号"""
+
+    def __init__(self, ttl: float = SNAPSHOT_TTL, max_versions: int = MAX_VERSIONS):
+        self.ttl = ttl
+        self.max_versions = max_versions
+        # 每个进程使用独立的纪元前缀，ComfyUI 重启后旧版本号自然失效
+        self._epoch = uuid.uuid4().hex[:8]
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._versions: "OrderedDict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]]" = OrderedDict()
+
+    def _read_queue(self) -> Tuple[List[Any], List[Any]]:
+        """从 prompt_queue 读取当前的运行中和等待中任务"""
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        with queue_lock("queue_snapshot"):
+            # 新版本 ComfyUI 提供不做深拷贝的读取方法
+            if hasattr(prompt_queue, "get_current_queue_volatile"):
+                running, pending = prompt_queue.get_current_queue_volatile()
+            else:
+                running, pending = prompt_queue.get_current_queue()
+        return list(running), sorted(pending, key=lambda item: item[0])
+
+    def get(self) -> Dict[str, Any]:
+        """
+        获取当前快照，超过有效期时重新读取队列
+
+        Returns:
+            包含 version、queue_running、queue_pending 的快照
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is not None and now - self._snapshot["taken_at"] < self.ttl:
+                return self._snapshot
+
+            running, pending = self._read_queue()
+            running_ids = tuple(item[1] for item in running)
+            pending_ids = tuple(item[1] for item in pending)
+
+            if self._snapshot is None or (running_ids, pending_ids) != self._versions[self._snapshot["version"]]:
+                self._counter += 1
+                version = f"{self._epoch}:{self._counter}"
+                self._versions[version] = (running_ids, pending_ids)
+                while len(self._versions) > self.max_versions:
+                    self._versions.popitem(last=False)
+            else:
+                version = self._snapshot["version"]
+
+            self._snapshot = {
+                "version": version,
+                "queue_running": running,
+                "queue_pending": pending,
+                "taken_at": now,
+            }
+            return self._snapshot
+
+    def invalidate(self):
+        """使当前快照失效，下次读取时重新获取队列"""
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot["taken_at"] = float("-inf")
+
+    def delta(self, since_version: str) -> Optional[Dict[str, Any]]:
+        """
+        计算自 since_version 以来的队列变化
+
+        Args:
+            since_version: 调用方上次拿到的版本号
+
+        Returns:
+            增量数据；版本号未知或已过期时返回 None
+        """
+        snapshot = self.get()
+        with self._lock:
+            base = self._versions.get(since_version)
+        if base is None:
+            return None
+
+        prev_running, prev_pending = set(base[0]), set(base[1])
+        previous = prev_running | prev_pending
+        current_items = snapshot["queue_running"] + snapshot["queue_pending"]
+        current = {item[1] for item in current_items}
+
+        return {
+            "version": snapshot["version"],
+            "since_version": since_version,
+            "delta": True,
+            "added": [item for item in current_items if item[1] not in previous],
+            "removed": sorted(previous - current),
+            "started": [item[1] for item in snapshot["queue_running"] if item[1] not in prev_running],
+            "queue_running_count": len(snapshot["queue_running"]),
+            "queue_pending_count": len(snapshot["queue_pending"]),
+        }
+
+def queue_snapshot_response(since_version: Optional[str] = None) -> Dict[str, Any]:
+    """
+    生成队列响应：提供 since_version 时返回增量，否则返回完整列表
+
+    Args:
+        since_version: 调用方上次拿到的版本号（可选）
+
+    Returns:
+        带 version 字段的队列数据
+    """
+    if since_version:
+        delta = queue_snapshots.delta(since_version)
+        if delta is not None:
+            return delta
+
+    snapshot = queue_snapshots.get()
+    return {
+        "version": snapshot["version"],
+        "delta": False,
+        "queue_running": snapshot["queue_running"],
+        "queue_pending": snapshot["queue_pending"],
+    }
+
+# 全局队列快照实例
+queue_snapshots = QueueSnapshotCache()
@@ -0,0 +1,114 @@
+"""
+响应大小控制 - 超出预算的工具响应截断为摘要，剩余内容通过续传句柄分段获取
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from .base_tools import get_config
+
+# 最多缓存的续传内容数，超出后丢弃最早的
+MAX_CONTINUATIONS = 32
+# 续传句柄的有效期（秒）
+CONTINUATION_TTL = 600.0
+
+def response_budget(tool_name: str) -> int:
+    """工具的响应字符数预算：responses.<工具名>_max_chars，未配置时使用 responses.max_chars，0 表示不限制"""
+    default = get_config("responses", "max_chars", 200000)
+    return get_config("responses", f"{tool_name}_max_chars", default)
+
+class ContinuationCache:
+    """按 LRU 保存被截断响应的完整文本"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 句柄 -> (创建时间, 工具名, 完整文本)
+        self._items: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+
+    def put(self, tool_name: str, text: str) -> str:
+        handle = uuid.uuid4().hex
+        with self._lock:
+            self._items[handle] = (time.monotonic(), tool_name, text)
+            while len(self._items) > MAX_CONTINUATIONS:
+                self._items.popitem(last=False)
+        return handle
+
+    def get(self, handle: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            item = self._items.get(handle)
+            if item is None:
+                return None
+            if time.monotonic() - item[0] > CONTINUATION_TTL:
+                del self._items[handle]
+                return None
+            self._items.move_to_end(handle)
+            return item[1], item[2]
+
+# 全局续传缓存
+continuations = ContinuationCache()
+
+def _summarize(result: Any) -> Dict[str, Any]:
+    """被截断响应的结构摘要"""
+    if isinstance(result, dict):
+        keys = list(result)
+        return {"type": "dict", "key_count": len(keys), "keys": [str(key) for key in keys[:50]]}
+    if isinstance(result, (list, tuple)):
+        return {"type": "list", "length": len(result)}
+    return {"type": type(result).__name__}
+
+def _page(tool_name: str, handle: str, text: str, offset: int, budget: int) -> Dict[str, Any]:
+    end = offset + budget
+    return {
+        "tool": tool_name,
+        "continuation": handle if end < len(text) else None,
+        "offset": offset,
+        "next_offset": end if end < len(text) else None,
+        "total_chars": len(text),
+        "content": text[offset:end],
+    }
+
+def apply_response_budget(tool_name: str, result: Any) -> str:
+    """
+    把工具结果转换为响应文本，超出预算时返回摘要、第一段内容和续传句柄
+
+    Args:
+        tool_name: 工具名（决定使用哪个预算）
+        result: 工具结果
+
+    Returns:
+        响应文本
+    """
+    text = str(result)
+    budget = response_budget(tool_name)
+    if budget <= 0 or len(text) <= budget:
+        return text
+
+    handle = continuations.put(tool_name, text)
+    page = _page(tool_name, handle, text, 0, budget)
+    page["truncated"] = True
+    page["summary"] = _summarize(result)
+    return str(page)
+
+def get_continuation(handle: str, offset: int = 0, max_chars: Optional[int] = None) -> Dict[str, Any]:
+    """
+    获取被截断响应的后续内容
+
+    Args:
+        handle: 截断响应中的 continuation 句柄
+        offset: 起始字符位置（上一段的 next_offset）
+        max_chars: 本段最多返回的字符数（可选，默认使用原工具的预算）
+
+    Returns:
+        本段内容，以及下一段的 next_offset（没有剩余内容时为 None）
+    """
+    try:
+        item = continuations.get(handle)
+        if item is None:
+            return {"error": f"续传句柄 {handle} 不存在或已过期"}
+        tool_name, text = item
+        budget = max_chars or response_budget(tool_name) or len(text)
+        return _page(tool_name, handle, text, max(offset, 0), budget)
+    except Exception as e:
+        return {"error": f"获取续传内容失败: {e}"}
@@ -0,0 +1,153 @@
+"""
+运行时间预估 - 根据历史记录中各节点类型的执行耗时，预估工作流的运行时间，供调度和准入控制使用
+"""
+
+import json
+import time
+import threading
+import statistics
+from typing import Dict, Any, Optional, List, Tuple
+from .base_tools import tools_base, get_config
+from .graph_tools import analyze_graph, node_features
+from .history_store import get_history_store
+from .lock_profiler import queue_lock
+
+# 节点类型耗时模型的缓存时间（秒），准入控制等频繁调用时不必每次查询数据库
+MODEL_TTL = 30.0
+
+# 特征组合：(有步数, 有图像尺寸)
+Shape = Tuple[bool, bool]
+
+def _shape(steps: Optional[int], megapixels: Optional[float]) -> Shape:
+    return steps is not None, megapixels is not None
+
+def _work(steps: Optional[int], megapixels: Optional[float]) -> float:
+    """工作量：步数 × 百万像素，缺少的特征按 1 计"""
+    return (steps or 1) * (megapixels or 1.0)
+
+class RuntimeEstimator:
+    """
+    按节点类型建立耗时模型：平均耗时，以及按特征组合计算的单位工作量耗时
+
+    采样器等带步数/尺寸的节点按"耗时 / (步数 × 百万像素)"的比率折算，步数或分辨率不同的工作流也能预估
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+    def _build_model(self, samples: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not samples:
+            return None
+        totals: Dict[Shape, List[float]] = {}
+        for sample in samples:
+            total = totals.setdefault(_shape(sample["steps"], sample["megapixels"]), [0.0, 0.0, 0])
+            total[0] += sample["seconds"]
+            total[1] += _work(sample["steps"], sample["megapixels"])
+            total[2] += 1
+        return {
+            "samples": len(samples),
+            "mean_seconds": statistics.mean(sample["seconds"] for sample in samples),
+            "rates": {shape: (seconds / work, count) for shape, (seconds, work, count) in totals.items() if work > 0},
+        }
+
+    def model(self, class_type: str) -> Optional[Dict[str, Any]]:
+        """获取节点类型的耗时模型，没有历史耗时时返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._models.get(class_type)
+            if cached is not None and cached[0] > now:
+                return cached[1]
+        store = get_history_store()
+        if store is None:
+            return None
+        samples = store.node_timings(class_type, get_config("estimator", "max_samples_per_class", 500))
+        model = self._build_model(samples)
+        with self._lock:
+            self._models[class_type] = (now + MODEL_TTL, model)
+        return model
+
+    def estimate_node(self, class_type: str, steps: Optional[int], megapixels: Optional[float]) -> Dict[str, Any]:
+        """预估单个节点的耗时，basis 说明依据：scaled（按工作量折算）、mean（平均耗时）、default（无历史）"""
+        model = self.model(class_type)
+        if model is None:
+            return {"seconds": get_config("estimator", "default_node_seconds", 0.1), "basis": "default", "samples": 0}
+        shape = _shape(steps, megapixels)
+        rate = model["rates"].get(shape)
+        if rate is not None and any(shape):
+            return {"seconds": rate[0] * _work(steps, megapixels), "basis": "scaled", "samples": rate[1]}
+        return {"seconds": model["mean_seconds"], "basis": "mean", "samples": model["samples"]}
+
+    def estimate(self, prompt: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        预估工作流的运行时间（不考虑 ComfyUI 的节点缓存，即全部节点都重新执行）
+
+        Args:
+            prompt: API 格式的工作流
+
+        Returns:
+            总耗时、各节点耗时及依据、没有历史耗时的节点类型
+        """
+        features = node_features(prompt)
+        # 只统计会被执行的节点（输出节点的上游）；没有输出节点时统计全部节点
+        order = analyze_graph(prompt)["order"] or list(features)
+        nodes = []
+        unknown = set()
+        for node_id in order:
+            feature = features[node_id]
+            estimate = self.estimate_node(feature["class_type"], feature["steps"], feature["megapixels"])
+            if estimate["basis"] == "default":
+                unknown.add(feature["class_type"])
+            nodes.append({
+                "node": node_id,
+                "class_type": feature["class_type"],
+                "steps": feature["steps"],
+                "megapixels": round(feature["megapixels"], 4) if feature["megapixels"] is not None else None,
+                "seconds": round(estimate["seconds"], 3),
+                "basis": estimate["basis"],
+                "samples": estimate["samples"],
+            })
+        known = len(nodes) - sum(1 for node in nodes if node["basis"] == "default")
+        return {
+            "estimated_seconds": round(sum(node["seconds"] for node in nodes), 3),
+            "coverage": round(known / len(nodes), 3) if nodes else 0.0,
+            "nodes": nodes,
+            "unknown_classes": sorted(unknown),
+        }
+
+    def running_seconds(self) -> Optional[float]:
+        """当前执行中任务的预估总耗时（不扣除已执行时间），没有执行中的任务时返回 None"""
+        prompt_server = tools_base.prompt_server
+        if prompt_server is None:
+            return None
+        with queue_lock("estimate_workflow"):
+            graphs = [item[2] for item in prompt_server.prompt_queue.currently_running.values()]
+        if not graphs:
+            return None
+        return sum(self.estimate(graph)["estimated_seconds"] for graph in graphs)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+# 全局运行时间预估实例
+runtime_estimator = RuntimeEstimator()
+
+def estimate_workflow(workflow_json: str) -> Dict[str, Any]:
+    """
+    根据历史节点耗时预估工作流的运行时间
+
+    Args:
+        workflow_json: 工作流JSON字符串
+
+    Returns:
+        预估总耗时（秒）、有历史耗时的节点比例、各节点的预估耗时及依据
+    """
+    try:
+        if get_history_store() is None:
+            return {"error": "历史记录数据库未启用"}
+        return runtime_estimator.estimate(json.loads(workflow_json))
+    except json.JSONDecodeError as e:
+        return {"error": f"无效的JSON格式: {e}"}
+    except Exception as e:
+        return {"error": f"预估运行时间失败: {e}"}
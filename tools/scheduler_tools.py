@@ -0,0 +1,185 @@
+"""
+调度工具 - 按模型亲和性重排等待中的工作流，减少模型切换
+"""
+
+import heapq
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+from .base_tools import tools_base, get_config
+from .queue_snapshot import queue_snapshots
+from .lock_profiler import queue_lock
+
+# 模型加载节点及其模型文件输入
+MODEL_LOADER_INPUTS = {
+    "CheckpointLoaderSimple": ("ckpt_name",),
+    "CheckpointLoader": ("ckpt_name",),
+    "UNETLoader": ("unet_name",),
+    "CLIPLoader": ("clip_name",),
+    "DualCLIPLoader": ("clip_name1", "clip_name2"),
+    "TripleCLIPLoader": ("clip_name1", "clip_name2", "clip_name3"),
+    "VAELoader": ("vae_name",),
+    "LoraLoader": ("lora_name",),
+    "LoraLoaderModelOnly": ("lora_name",),
+    "ControlNetLoader": ("control_net_name",),
+    "CLIPVisionLoader": ("clip_name",),
+    "UpscaleModelLoader": ("model_name",),
+}
+
+ModelSignature = Tuple[Tuple[str, str], ...]
+
+def model_signature(prompt: Dict[str, Any]) -> ModelSignature:
+    """
+    提取工作流使用的模型文件集合
+
+    Args:
+        prompt: API 格式的工作流
+
+    Returns:
+        排序后的 (节点类型, 模型文件) 元组，可直接比较
+    """
+    models = set()
+    for node in prompt.values():
+        if not isinstance(node, dict):
+            continue
+        input_names = MODEL_LOADER_INPUTS.get(node.get("class_type"))
+        if not input_names:
+            continue
+        inputs = node.get("inputs", {})
+        for input_name in input_names:
+            value = inputs.get(input_name)
+            # 连线输入（[node_id, index]）不是固定的模型文件
+            if isinstance(value, str):
+                models.add((node["class_type"], value))
+    return tuple(sorted(models))
+
+def count_model_swaps(signatures: List[ModelSignature], current: Optional[ModelSignature] = None) -> int:
+    """统计按顺序执行时需要切换模型的次数"""
+    swaps = 0
+    previous = current
+    for signature in signatures:
+        if previous is not None and signature != previous:
+            swaps += 1
+        previous = signature
+    return swaps
+
+class ModelAffinityScheduler:
+    """在公平窗口内把使用相同模型的任务排到一起"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # prompt_id -> 被其他任务插队的次数，达到上限后该任务必须优先执行
+        self._deferrals: Dict[str, int] = {}
+        self._last_signature: Optional[ModelSignature] = None
+        self.stats = {"runs": 0, "reordered_jobs": 0, "swaps_avoided": 0}
+
+    def _plan(self, pending: List[Any], signatures: Dict[str, ModelSignature],
+              current: Optional[ModelSignature], max_deferrals: int) -> List[Any]:
+        """贪心排序：优先保持当前模型，被推迟过多的任务强制优先"""
+        remaining = list(pending)
+        ordered = []
+        while remaining:
+            starved = [item for item in remaining if self._deferrals.get(item[1], 0) >= max_deferrals]
+            if starved:
+                chosen = starved[0]
+            else:
+                same_model = [item for item in remaining if signatures[item[1]] == current]
+                chosen = same_model[0] if same_model else remaining[0]
+
+            # 排在被选任务之前的任务都被推迟了一次
+            for item in remaining[:remaining.index(chosen)]:
+                self._deferrals[item[1]] = self._deferrals.get(item[1], 0) + 1
+
+            remaining.remove(chosen)
+            ordered.append(chosen)
+            current = signatures[chosen[1]]
+        return ordered
+
+    def reorder(self, window: Optional[int] = None, max_deferrals: Optional[int] = None) -> Dict[str, Any]:
+        """
+        重排队列头部 window 个等待中的任务
+
+        Args:
+            window: 公平窗口大小，只在队首的这些任务之间重排
+            max_deferrals: 单个任务最多被推迟的次数
+
+        Returns:
+            重排结果及避免的模型切换次数
+        """
+        window = window or get_config("scheduler", "fairness_window", 8)
+        max_deferrals = max_deferrals or get_config("scheduler", "max_deferrals", 3)
+        prompt_queue = tools_base.prompt_server.prompt_queue
+
+        with self._lock, queue_lock("reorder_queue"):
+            running = list(prompt_queue.currently_running.values())
+            if running:
+                self._last_signature = model_signature(running[-1][2])
+            current = self._last_signature
+
+            pending = sorted(prompt_queue.queue, key=lambda item: item[0])
+            head, tail = pending[:window], pending[window:]
+            signatures = {item[1]: model_signature(item[2]) for item in head}
+            ordered = self._plan(head, signatures, current, max_deferrals)
+
+            before = count_model_swaps([signatures[item[1]] for item in head], current)
+            after = count_model_swaps([signatures[item[1]] for item in ordered], current)
+
+            moved = [new[1] for new, old in zip(ordered, head) if new[1] != old[1]]
+            if moved:
+                # 复用窗口内原有的编号，只调整任务与编号的对应关系
+                numbers = [item[0] for item in head]
+                prompt_queue.queue = [(number,) + tuple(item[1:]) for number, item in zip(numbers, ordered)] + tail
+                heapq.heapify(prompt_queue.queue)
+                prompt_queue.server.queue_updated()
+
+            # 清理已离开队列的任务的推迟计数
+            queued_ids = {item[1] for item in pending}
+            self._deferrals = {pid: count for pid, count in self._deferrals.items() if pid in queued_ids}
+
+            self.stats["runs"] += 1
+            self.stats["reordered_jobs"] += len(moved)
+            self.stats["swaps_avoided"] += max(before - after, 0)
+
+        if moved:
+            queue_snapshots.invalidate()
+
+        return {
+            "status": "success",
+            "window": window,
+            "reordered": len(moved),
+            "swaps_before": before,
+            "swaps_after": after,
+            "swaps_avoided": max(before - after, 0),
+            "order": [item[1] for item in ordered],
+        }
+
+# 全局调度器实例
+model_scheduler = ModelAffinityScheduler()
+
+def reorder_queue_by_model(window: Optional[int] = None) -> Dict[str, Any]:
+    """
+    按模型亲和性重排等待中的任务
+
+    Args:
+        window: 公平窗口大小（可选，默认读取配置 scheduler.fairness_window）
+
+    Returns:
+        重排结果，包含避免的模型切换次数
+    """
+    try:
+        if tools_base.prompt_server is None:
+            return {"error": "ComfyUI服务器未启动"}
+        return model_scheduler.reorder(window)
+    except Exception as e:
+        return {"error": f"重排队列失败: {e}"}
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    """
+    获取模型亲和性调度统计
+
+    Returns:
+        重排次数、调整的任务数和累计避免的模型切换次数
+    """
+    return {
+        "enabled": get_config("scheduler", "model_affinity", False),
+        **model_scheduler.stats,
+    }
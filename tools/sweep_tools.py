@@ -0,0 +1,360 @@
+"""
+参数扫描工具 - 按轴（如 3.inputs.seed）展开笛卡尔积，限制同时在队列中的任务数，结果按网格收集
+"""
+
+import json
+import copy
+import time
+import uuid
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Set
+from .base_tools import tools_base, lazy_import
+from .events import event_hub, TASK_DONE_EVENT
+from .lock_profiler import queue_lock
+
+# 最多保留的扫描记录数，超出后丢弃最早已结束的
+MAX_SWEEPS = 32
+# 单次扫描最多的组合数
+MAX_COMBINATIONS = 10000
+# 等待名额期间核对在途任务的间隔（秒），回收被 clear_queue/delete_queue_item 等删除、不会再完成的任务
+RECONCILE_INTERVAL = 5.0
+
+def parse_axis_path(workflow: Dict[str, Any], path: str) -> Tuple[str, str]:
+    """
+    解析轴路径 "<节点ID>.inputs.<输入名>"
+
+    Returns:
+        (节点ID, 输入名)
+
+    Raises:
+        ValueError: 路径格式错误或节点/输入不存在
+    """
+    parts = path.split(".", 2)
+    if len(parts) != 3 or parts[1] != "inputs":
+        raise ValueError(f"轴路径格式应为 <节点ID>.inputs.<输入名>: {path}")
+    node_id, _, input_name = parts
+    node = workflow.get(node_id)
+    if not isinstance(node, dict):
+        raise ValueError(f"节点 {node_id} 不存在: {path}")
+    if input_name not in node.get("inputs", {}):
+        raise ValueError(f"节点 {node_id} ({node.get('class_type')}) 没有输入 {input_name}")
+    return node_id, input_name
+
+class Sweep:
+    """一次参数扫描：后台线程按顺序生成组合并提交，任务完成事件回收在途名额"""
+
+    def __init__(self, workflow: Dict[str, Any], axes: List[Tuple[str, str, str, List[Any]]],
+                 max_in_flight: int, client_id: Optional[str]):
+        self.sweep_id = uuid.uuid4().hex
+        self.workflow = workflow
+        self.axes = axes
+        self.max_in_flight = max(1, max_in_flight)
+        self.client_id = client_id
+        self.shape = [len(values) for _, _, _, values in axes]
+        self.total = 1
+        for size in self.shape:
+            self.total *= size
+        self.cells: List[Dict[str, Any]] = []
+        self.state = "running"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+        self._condition = threading.Condition()
+        self._cancelled = False
+        self.logger = logging.getLogger(__name__)
+
+    def _combinations(self):
+        """按需生成 (网格坐标, 轴值)，不预先展开整个笛卡尔积"""
+        indices = itertools.product(*(range(size) for size in self.shape))
+        for index in indices:
+            yield index, [values[i] for (_, _, _, values), i in zip(self.axes, index)]
+
+    def _build(self, values: List[Any]) -> Dict[str, Any]:
+        workflow = copy.deepcopy(self.workflow)
+        for (_, node_id, input_name, _), value in zip(self.axes, values):
+            workflow[node_id]["inputs"][input_name] = value
+        return workflow
+
+    def _submit(self, workflow: Dict[str, Any], prompt_id: str) -> Dict[str, Any]:
+        """提交一个组合；被准入控制拒绝时按 retry_after 等待后重试"""
+        submit_workflow = lazy_import("tools.workflow_tools").submit_workflow
+        while True:
+            result = submit_workflow(json.dumps(workflow), self.client_id, prompt_id)
+            retry_after = result.get("retry_after") if isinstance(result, dict) else None
+            if retry_after is None or self._cancelled:
+                return result
+            with self._condition:
+                self._condition.wait(retry_after)
+
+    def _wait_below(self, limit: int):
+        """等待在途任务数小于 limit；超时未变化时核对一次在途任务"""
+        while True:
+            with self._condition:
+                if len(self._in_flight) < limit or self._cancelled:
+                    return
+                if self._condition.wait(RECONCILE_INTERVAL):
+                    continue
+            self.reconcile()
+
+    def reconcile(self):
+        """
+        已提交但既不在队列中、也不在执行中的任务：在历史记录中的按完成处理（完成事件丢失），
+        否则视为已被删除，释放在途名额
+        """
+        with self._condition:
+            submitted = [prompt_id for prompt_id, cell in self._in_flight.items() if cell.get("submitted")]
+        if not submitted:
+            return
+        active = active_prompt_ids()
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        deleted = []
+        for prompt_id in submitted:
+            if prompt_id in active:
+                continue
+            item = prompt_queue.get_history(prompt_id=prompt_id).get(prompt_id)
+            if item is not None:
+                self.on_done(prompt_id, (item.get("status") or {}).get("status_str"))
+            else:
+                deleted.append(prompt_id)
+        if deleted:
+            self.mark_deleted(deleted)
+
+    def run(self):
+        try:
+            for index, values in self._combinations():
+                self._wait_below(self.max_in_flight)
+                if self._cancelled:
+                    break
+
+                # 预先生成 prompt_id 并登记，任务在提交返回之前就完成时也能被回收
+                prompt_id = str(uuid.uuid4())
+                cell = {
+                    "index": list(index),
+                    "values": {path: value for (path, _, _, _), value in zip(self.axes, values)},
+                    "prompt_id": prompt_id,
+                    "status": "queued",
+                    "outputs": [],
+                }
+                with self._condition:
+                    self.cells.append(cell)
+                    self._in_flight[prompt_id] = cell
+
+                result = self._submit(self._build(values), prompt_id)
+                with self._condition:
+                    if isinstance(result, dict) and result.get("prompt_id"):
+                        # 提交成功后才参与核对，提交过程中任务还不在队列里
+                        cell["submitted"] = True
+                    else:
+                        self._in_flight.pop(prompt_id, None)
+                        cell["status"] = "error"
+                        cell["error"] = result.get("error") if isinstance(result, dict) else str(result)
+
+            self._wait_below(1)
+            self.state = "cancelled" if self._cancelled else "completed"
+        except Exception as e:
+            self.logger.error(f"参数扫描 {self.sweep_id} 失败: {e}")
+            self.state = "error"
+        finally:
+            self.finished_at = time.time()
+
+    def on_done(self, prompt_id: str, status_str: Optional[str]) -> bool:
+        """任务完成：收集输出图片并释放在途名额（读取历史记录时不持有条件锁）"""
+        with self._condition:
+            if prompt_id not in self._in_flight:
+                return False
+        outputs = collect_images(prompt_id)
+        with self._condition:
+            cell = self._in_flight.pop(prompt_id, None)
+            if cell is None:
+                return False
+            cell["status"] = "error" if status_str == "error" else "success"
+            cell["outputs"] = outputs
+            self._condition.notify_all()
+            return True
+
+    def has_in_flight(self) -> bool:
+        with self._condition:
+            return bool(self._in_flight)
+
+    def cancel(self) -> List[str]:
+        """停止提交新组合，返回仍在队列中的任务ID"""
+        with self._condition:
+            self._cancelled = True
+            self._condition.notify_all()
+            return list(self._in_flight)
+
+    def mark_deleted(self, prompt_ids: List[str]):
+        """已从队列中删除的任务不再等待完成"""
+        with self._condition:
+            for prompt_id in prompt_ids:
+                cell = self._in_flight.pop(prompt_id, None)
+                if cell is not None:
+                    cell["status"] = "deleted"
+            self._condition.notify_all()
+
+    def summary(self, include_cells: bool = True) -> Dict[str, Any]:
+        with self._condition:
+            counts: Dict[str, int] = {}
+            for cell in self.cells:
+                counts[cell["status"]] = counts.get(cell["status"], 0) + 1
+            result = {
+                "sweep_id": self.sweep_id,
+                "state": self.state,
+                "axes": [{"path": path, "values": values} for path, _, _, values in self.axes],
+                "shape": self.shape,
+                "total": self.total,
+                "submitted": len(self.cells),
+                "in_flight": len(self._in_flight),
+                "status_counts": counts,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+            if include_cells:
+                result["grid"] = [dict(cell) for cell in self.cells]
+            return result
+
+def active_prompt_ids() -> Set[str]:
+    """队列中等待和正在执行的任务ID（同一次加锁内取得，任务在两者之间移动时不会漏掉）"""
+    prompt_queue = tools_base.prompt_server.prompt_queue
+    with queue_lock("start_sweep"):
+        active = {item[1] for item in prompt_queue.queue}
+        active.update(item[1] for item in prompt_queue.currently_running.values())
+    return active
+
+def collect_images(prompt_id: str) -> List[Dict[str, Any]]:
+    """从历史记录中收集任务的输出图片"""
+    history = tools_base.prompt_server.prompt_queue.get_history(prompt_id=prompt_id)
+    outputs = (history.get(prompt_id) or {}).get("outputs") or {}
+    images = []
+    for node_id, node_output in outputs.items():
+        for image in node_output.get("images") or []:
+            if isinstance(image, dict):
+                images.append({"node": node_id, **image})
+    return images
+
+class SweepManager:
+    """保存所有扫描，并把任务完成事件分发给对应的扫描"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sweeps: "OrderedDict[str, Sweep]" = OrderedDict()
+        self._installed = False
+
+    def _install(self):
+        if not self._installed:
+            event_hub.add_listener(self.on_event)
+            event_hub.install()
+            self._installed = True
+
+    def on_event(self, event: str, data: Any, sid: Optional[str] = None):
+        if event != TASK_DONE_EVENT or not isinstance(data, dict):
+            return
+        # 取消后扫描不再提交新组合，但已在队列中的任务仍要收集输出
+        with self._lock:
+            sweeps = [sweep for sweep in self._sweeps.values() if sweep.has_in_flight()]
+        for sweep in sweeps:
+            if sweep.on_done(data.get("prompt_id"), data.get("status_str")):
+                break
+
+    def start(self, sweep: Sweep):
+        with self._lock:
+            self._install()
+            self._sweeps[sweep.sweep_id] = sweep
+            finished = [sweep_id for sweep_id, item in self._sweeps.items()
+                        if item.state != "running" and not item.has_in_flight()]
+            while len(self._sweeps) > MAX_SWEEPS and finished:
+                del self._sweeps[finished.pop(0)]
+        threading.Thread(target=sweep.run, name=f"mcp-sweep-{sweep.sweep_id[:8]}", daemon=True).start()
+
+    def get(self, sweep_id: str) -> Optional[Sweep]:
+        with self._lock:
+            return self._sweeps.get(sweep_id)
+
+# 全局扫描管理实例
+sweep_manager = SweepManager()
+
+def start_sweep(workflow_json: str, axes: Dict[str, List[Any]], max_in_flight: int = 2,
+                client_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    启动参数扫描
+
+    Args:
+        workflow_json: 基础工作流JSON字符串
+        axes: 轴路径 -> 取值列表，如 {"3.inputs.seed": [1, 2], "3.inputs.cfg": [4.0, 7.0]}
+        max_in_flight: 同时在队列中的最大任务数
+        client_id: 客户端ID（可选）
+
+    Returns:
+        扫描ID、网格形状和组合总数
+    """
+    try:
+        if tools_base.prompt_server is None:
+            return {"error": "ComfyUI服务器未启动"}
+        workflow = json.loads(workflow_json)
+        if not axes:
+            return {"error": "至少需要一个扫描轴"}
+
+        parsed = []
+        for path, values in axes.items():
+            if not isinstance(values, list) or not values:
+                return {"error": f"轴 {path} 的取值必须是非空列表"}
+            node_id, input_name = parse_axis_path(workflow, path)
+            parsed.append((path, node_id, input_name, values))
+
+        sweep = Sweep(workflow, parsed, max_in_flight, client_id)
+        if sweep.total > MAX_COMBINATIONS:
+            return {"error": f"组合数 {sweep.total} 超过上限 {MAX_COMBINATIONS}"}
+        sweep_manager.start(sweep)
+        return sweep.summary(include_cells=False)
+    except json.JSONDecodeError as e:
+        return {"error": f"无效的JSON格式: {e}"}
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"启动参数扫描失败: {e}"}
+
+def get_sweep_result(sweep_id: str) -> Dict[str, Any]:
+    """
+    获取参数扫描的进度和网格结果
+
+    Args:
+        sweep_id: 扫描ID
+
+    Returns:
+        扫描状态，grid 中每个单元包含网格坐标、轴值、prompt_id、状态和输出图片
+    """
+    try:
+        sweep = sweep_manager.get(sweep_id)
+        if sweep is None:
+            return {"error": f"扫描 {sweep_id} 不存在"}
+        return sweep.summary()
+    except Exception as e:
+        return {"error": f"获取扫描结果失败: {e}"}
+
+def cancel_sweep(sweep_id: str, delete_queued: bool = True) -> Dict[str, Any]:
+    """
+    取消参数扫描，停止提交剩余组合
+
+    Args:
+        sweep_id: 扫描ID
+        delete_queued: 是否同时从队列中删除已提交但未执行的任务
+
+    Returns:
+        操作结果
+    """
+    try:
+        sweep = sweep_manager.get(sweep_id)
+        if sweep is None:
+            return {"error": f"扫描 {sweep_id} 不存在"}
+        pending = sweep.cancel()
+        deleted = []
+        if delete_queued and pending:
+            result = lazy_import("tools.workflow_tools").delete_queue_items(prompt_ids=pending)
+            deleted = result.get("deleted", [])
+            sweep.mark_deleted(deleted)
+        return {"status": "success", "sweep_id": sweep_id, "deleted": deleted}
+    except Exception as e:
+        return {"error": f"取消参数扫描失败: {e}"}
@@ -6,6 +6,7 @@ import asyncio
 import concurrent.futures
 from typing import Dict, Any, Optional
 from .base_tools import tools_base
+from .queue_snapshot import queue_snapshot_response
 
 def run_async_safely(async_func):
     """
@@ -175,38 +176,22 @@ def get_object_info_by_node(node_class: str) -> Dict[str, Any]:
     except Exception as e:
         return {"error": f"获取节点信息失败: {e}"}
 
-def get_queue_status() -> Dict[str, Any]:
+def get_queue_status(since_version: Optional[str] = None) -> Dict[str, Any]:
     """
     获取队列状态信息
     
+    Args:
+        since_version: 上次响应中的version（可选），提供时只返回新增、移除和开始执行的任务
+    
     Returns:
-        队列状态信息
+        队列状态信息，附带version字段
     """
     try:
-        # 创建模拟请求对象
-        mock_request = tools_base.create_mock_request()
-        
-        # 直接调用ComfyUI的get_queue方法
-        async def async_get_queue():
-            try:
-                get_queue_method = tools_base.get_server_method("get_queue")
-                response = await get_queue_method(mock_request)
-                
-                # 从响应中提取数据
-                if hasattr(response, 'body'):
-                    import json
-                    response_data = json.loads(response.body.decode('utf-8'))
-                else:
-                    response_data = response
-                
-                return response_data
-            except Exception as e:
-                return {"error": str(e)}
+        if tools_base.prompt_server is None:
+            return {"error": "ComfyUI服务器未启动"}
         
-        # 运行异步函数
-        result = run_async_safely(async_get_queue)
-        
-        return result
+        # 使用共享的短时快照代替每次调用get_queue路由
+        return queue_snapshot_response(since_version)
         
     except Exception as e:
         return {"error": f"获取队列状态失败: {e}"}
@@ -0,0 +1,344 @@
+"""
+工作流模板工具 - 把 workflow_api/ 中的每个工作流暴露为带类型参数的独立工具
+"""
+
+import os
+import re
+import json
+import copy
+import inspect
+import keyword
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple, Callable
+from .base_tools import lazy_import, get_config
+from .graph_tools import is_link
+
+# 插件根目录
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 组合框选项不超过该数量时在参数描述中列出
+MAX_LISTED_CHOICES = 32
+
+_NON_IDENTIFIER_RE = re.compile(r"\W+", re.ASCII)
+
+# ComfyUI 输入类型 -> Python 类型
+INPUT_TYPE_MAP = {
+    "INT": int,
+    "FLOAT": float,
+    "STRING": str,
+    "BOOLEAN": bool,
+}
+
+def template_dir() -> str:
+    """模板目录，相对路径相对于插件目录解析"""
+    directory = get_config("templates", "directory", "workflow_api")
+    return directory if os.path.isabs(directory) else os.path.join(PLUGIN_DIR, directory)
+
+def _identifier(text: str) -> str:
+    """转换为合法的小写标识符（非 ASCII 字符被替换，关键字加下划线后缀）"""
+    name = _NON_IDENTIFIER_RE.sub("_", text).strip("_").lower()
+    if not name or name[0].isdigit():
+        name = f"w_{name}"
+    return f"{name}_" if keyword.iskeyword(name) else name
+
+def template_tool_name(filename: str) -> str:
+    """模板文件对应的工具名"""
+    return f"run_{_identifier(os.path.splitext(filename)[0])}_tool"
+
+def _input_spec(class_type: str, input_name: str) -> Optional[Tuple[Any, Dict[str, Any]]]:
+    """从节点定义（与 object_info 同源）中读取输入的类型和选项"""
+    try:
+        node_class = lazy_import("nodes").NODE_CLASS_MAPPINGS.get(class_type)
+        if node_class is None:
+            return None
+        input_types = node_class.INPUT_TYPES()
+    except Exception:
+        return None
+    for section in ("required", "optional"):
+        spec = (input_types.get(section) or {}).get(input_name)
+        if spec:
+            options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+            return spec[0], options
+    return None
+
+def _parameter_type(value: Any, spec: Optional[Tuple[Any, Dict[str, Any]]]) -> Tuple[type, Optional[List[Any]]]:
+    """确定参数的 Python 类型，组合框返回 (str, 选项列表)"""
+    if spec is not None:
+        input_type, options = spec
+        if isinstance(input_type, (list, tuple)):
+            return str, list(input_type)
+        if input_type == "COMBO":
+            return str, list(options.get("options") or [])
+        if input_type in INPUT_TYPE_MAP:
+            return INPUT_TYPE_MAP[input_type], None
+    # 节点定义不可用时按模板中的值推断
+    if isinstance(value, bool):
+        return bool, None
+    if isinstance(value, int):
+        return int, None
+    if isinstance(value, float):
+        return float, None
+    return str, None
+
+def derive_parameters(workflow: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    从工作流的字面量输入推导工具参数
+
+    Args:
+        workflow: API 格式的工作流
+
+    Returns:
+        参数列表，包含参数名、对应节点/输入、类型、默认值和描述
+    """
+    literals = []
+    for node_id, node in sorted(workflow.items(), key=lambda item: (len(str(item[0])), str(item[0]))):
+        if not isinstance(node, dict) or "class_type" not in node:
+            continue
+        for input_name, value in node.get("inputs", {}).items():
+            if not is_link(value) and isinstance(value, (str, int, float, bool)):
+                literals.append((str(node_id), node, input_name, value))
+
+    # 输入名对应的标识符在工作流中唯一时直接作为参数名，否则加上节点ID
+    # （不同输入名可能得到同一标识符，如 "a-b" 与 "a_b"，或全部为非 ASCII 字符）
+    name_counts: Dict[str, int] = {}
+    for _, _, input_name, _ in literals:
+        name = _identifier(input_name)
+        name_counts[name] = name_counts.get(name, 0) + 1
+
+    parameters = []
+    reserved = {"client_id"}
+    for node_id, node, input_name, value in literals:
+        name = _identifier(input_name)
+        if name_counts[name] > 1 or name in reserved:
+            name = f"{name.rstrip('_')}_{_NON_IDENTIFIER_RE.sub('_', node_id)}"
+        # 加上节点ID后仍可能与其他参数重名，再追加序号
+        base, index = name, 2
+        while name in reserved:
+            name = f"{base}_{index}"
+            index += 1
+        reserved.add(name)
+
+        spec = _input_spec(node["class_type"], input_name)
+        param_type, choices = _parameter_type(value, spec)
+        title = (node.get("_meta") or {}).get("title") or node["class_type"]
+        description = f"{title} ({node['class_type']} #{node_id}).{input_name}"
+        if choices and len(choices) <= MAX_LISTED_CHOICES:
+            description += f"，可选: {', '.join(str(choice) for choice in choices)}"
+
+        try:
+            default = value if param_type is str else param_type(value)
+        except (TypeError, ValueError):
+            param_type, default = type(value), value
+
+        parameters.append({
+            "name": name,
+            "node": node_id,
+            "input": input_name,
+            "type": param_type,
+            "default": default,
+            "description": description,
+        })
+    return parameters
+
+class TemplateRegistry:
+    """扫描模板目录，缓存每个模板的参数定义，并在文件变化时通知重新注册"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # 工具名 -> 模板定义
+        self._templates: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _load(self, path: str, signature: Tuple[int, int]) -> Dict[str, Any]:
+        with open(path, 'r', encoding='utf-8') as f:
+            workflow = json.load(f)
+        filename = os.path.basename(path)
+        return {
+            "name": template_tool_name(filename),
+            "file": filename,
+            "signature": signature,
+            "workflow": workflow,
+            "parameters": derive_parameters(workflow),
+        }
+
+    def scan(self) -> Dict[str, List]:
+        """
+        重新扫描模板目录，只解析新增或修改过的文件
+
+        Returns:
+            {"changed": [新增或修改的模板定义], "removed": [已删除的工具名]}
+        """
+        directory = template_dir()
+        found: Dict[str, Tuple[str, Tuple[int, int]]] = {}
+        if os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                found[template_tool_name(filename)] = (path, (stat.st_mtime_ns, stat.st_size))
+
+        changed = []
+        with self._lock:
+            removed = [name for name in self._templates if name not in found]
+            for name in removed:
+                del self._templates[name]
+            for name, (path, signature) in found.items():
+                current = self._templates.get(name)
+                if current is not None and current["signature"] == signature:
+                    continue
+                try:
+                    template = self._load(path, signature)
+                except (OSError, ValueError) as e:
+                    self.logger.warning(f"无法解析工作流模板 {path}: {e}")
+                    continue
+                self._templates[name] = template
+                changed.append(template)
+        return {"changed": changed, "removed": removed}
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._templates.get(name)
+
+    def templates(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._templates.values())
+
+    def watch(self, on_change: Callable[[Dict[str, List]], None], interval: Optional[float] = None) -> bool:
+        """
+        启动后台线程定期扫描模板目录，有变化时调用 on_change（重复调用无副作用）
+
+        Args:
+            on_change: 变化回调，参数同 scan() 的返回值
+            interval: 扫描间隔（秒），默认读取 templates.poll_interval
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        interval = interval or get_config("templates", "poll_interval", 5.0)
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    changes = self.scan()
+                    if changes["changed"] or changes["removed"]:
+                        on_change(changes)
+                except Exception as e:
+                    self.logger.error(f"扫描工作流模板失败: {e}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="mcp-template-watcher", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """停止后台扫描线程"""
+        self._stop.set()
+
+# 全局模板注册表
+template_registry = TemplateRegistry()
+
+def run_template(name: str, values: Dict[str, Any], client_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    用参数填充工作流模板并提交执行
+
+    Args:
+        name: 模板工具名
+        values: 参数名 -> 值，未提供的参数使用模板中的值
+        client_id: 客户端ID（可选）
+
+    Returns:
+        包含prompt_id和number的响应字典
+    """
+    try:
+        template = template_registry.get(name)
+        if template is None:
+            return {"error": f"工作流模板 {name} 不存在"}
+
+        workflow = copy.deepcopy(template["workflow"])
+        for parameter in template["parameters"]:
+            value = values.get(parameter["name"])
+            if value is not None:
+                workflow[parameter["node"]]["inputs"][parameter["input"]] = value
+
+        submit_workflow = lazy_import("tools.workflow_tools").submit_workflow
+        result = submit_workflow(json.dumps(workflow), client_id)
+        if isinstance(result, dict):
+            result["template"] = template["file"]
+        return result
+    except Exception as e:
+        return {"error": f"运行工作流模板失败: {e}"}
+
+def build_template_function(template: Dict[str, Any], invoker: Any = None) -> Callable[..., str]:
+    """
+    为模板生成带类型签名的工具函数（参数 schema 由签名推导）
+
+    Args:
+        template: 模板定义
+        invoker: 工具调用方式（可选），工作进程模式下经 RPC 调用 run_template
+
+    Returns:
+        可直接注册为 MCP 工具的函数
+    """
+    from pydantic import Field
+    from typing import Annotated
+
+    name = template["name"]
+
+    def template_tool(**kwargs) -> str:
+        client_id = kwargs.pop("client_id", None)
+        if invoker is not None:
+            return str(invoker.call("run_template", name, kwargs, client_id))
+        return str(run_template(name, kwargs, client_id))
+
+    parameters = []
+    annotations: Dict[str, Any] = {}
+    for parameter in template["parameters"]:
+        annotation = Annotated[parameter["type"], Field(description=parameter["description"])]
+        parameters.append(inspect.Parameter(
+            parameter["name"], inspect.Parameter.KEYWORD_ONLY, default=parameter["default"], annotation=annotation
+        ))
+        annotations[parameter["name"]] = annotation
+    parameters.append(inspect.Parameter(
+        "client_id", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Optional[str]
+    ))
+    annotations["client_id"] = Optional[str]
+    annotations["return"] = str
+
+    template_tool.__name__ = name
+    template_tool.__signature__ = inspect.Signature(parameters, return_annotation=str)
+    template_tool.__annotations__ = annotations
+    template_tool.__doc__ = f"运行工作流模板 {template['file']}，未提供的参数使用模板中的值"
+    return template_tool
+
+def list_workflow_templates() -> Dict[str, Any]:
+    """
+    列出已注册的工作流模板及其参数
+
+    Returns:
+        模板列表
+    """
+    try:
+        if not template_registry.templates():
+            template_registry.scan()
+        return {
+            "templates": [
+                {
+                    "tool": template["name"],
+                    "file": template["file"],
+                    "parameters": [
+                        {
+                            "name": parameter["name"],
+                            "type": parameter["type"].__name__,
+                            "default": parameter["default"],
+                            "description": parameter["description"],
+                        }
+                        for parameter in template["parameters"]
+                    ],
+                }
+                for template in template_registry.templates()
+            ]
+        }
+    except Exception as e:
+        return {"error": f"获取工作流模板失败: {e}"}
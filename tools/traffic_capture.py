@@ -0,0 +1,154 @@
+"""
+工具调用录制 - 把每次 MCP 工具调用（参数、耗时、响应大小）写入 JSONL 文件，供 scripts/replay_mcp_traffic.py 回放
+
+较长的字符串参数（工作流JSON、base64图片等）按内容哈希只保存一次，后续调用引用 {"$blob": 哈希}
+"""
+
+import os
+import gzip
+import json
+import time
+import queue
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, Set
+from .base_tools import get_config
+
+class TrafficRecorder:
+    """后台线程批量写入录制文件，工具调用本身只把记录放入队列"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.path: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self._queue: "queue.SimpleQueue[Dict[str, Any]]" = queue.SimpleQueue()
+        self._blobs: Set[str] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._full = False
+        self.stats = {"calls": 0, "blobs": 0, "dropped": 0}
+
+    def start(self, path: str) -> bool:
+        """开始录制（重复调用无副作用）；路径以 .gz 结尾时使用 gzip 压缩"""
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        self.path = path
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._write_loop, name="mcp-traffic-capture", daemon=True)
+        self._thread.start()
+        self._queue.put({"type": "start", "ts": time.time(), "pid": os.getpid()})
+        return True
+
+    def _pack(self, value: Any, min_chars: int, records: list) -> Any:
+        """把长字符串替换为 blob 引用，首次出现时附带 blob 记录"""
+        if isinstance(value, str) and len(value) >= min_chars:
+            digest = hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+            if digest not in self._blobs:
+                self._blobs.add(digest)
+                self.stats["blobs"] += 1
+                records.append({"type": "blob", "id": digest, "data": value})
+            return {"$blob": digest}
+        if isinstance(value, dict):
+            return {key: self._pack(item, min_chars, records) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._pack(item, min_chars, records) for item in value]
+        return value
+
+    def record(self, tool: str, arguments: Dict[str, Any], started: float, duration: float,
+               response_chars: int, error: Optional[str] = None):
+        """记录一次工具调用（started 为 time.monotonic() 时间）"""
+        if self.started_at is None or self._full:
+            return
+        records: list = []
+        arguments = self._pack(arguments or {}, get_config("capture", "blob_min_chars", 1024), records)
+        call = {
+            "type": "call",
+            "t": round(started - self.started_at, 6),
+            "tool": tool,
+            "args": arguments,
+            "ms": round(duration * 1000, 3),
+            "chars": response_chars,
+        }
+        if error:
+            call["error"] = error
+        records.append(call)
+        self.stats["calls"] += 1
+        for item in records:
+            self._queue.put(item)
+
+    def _open(self):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, "at", encoding="utf-8")
+        return open(self.path, "a", encoding="utf-8")
+
+    def _write_loop(self):
+        max_bytes = get_config("capture", "max_mb", 100.0) * 1024 * 1024
+        flush_interval = get_config("capture", "flush_interval", 1.0)
+        with self._open() as f:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + flush_interval
+                while time.monotonic() < deadline:
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                if self._full:
+                    self.stats["dropped"] += len(batch)
+                    continue
+                for item in batch:
+                    f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":"), default=str))
+                    f.write("\n")
+                f.flush()
+                if os.path.getsize(self.path) >= max_bytes:
+                    self._full = True
+                    self.logger.warning(f"录制文件 {self.path} 已达到 capture.max_mb，停止录制")
+
+    def middleware(self):
+        """
+        创建 FastMCP 中间件，记录经过 MCP 协议的每次工具调用
+
+        Returns:
+            FastMCP Middleware 实例
+        """
+        from fastmcp.server.middleware import Middleware
+
+        recorder = self
+
+        class TrafficCaptureMiddleware(Middleware):
+            async def on_call_tool(self, context, call_next):
+                started = time.monotonic()
+                try:
+                    result = await call_next(context)
+                except Exception as e:
+                    recorder.record(context.message.name, context.message.arguments, started,
+                                    time.monotonic() - started, 0, f"{type(e).__name__}: {e}")
+                    raise
+                chars = sum(len(getattr(item, "text", "") or "") for item in getattr(result, "content", []) or [])
+                recorder.record(context.message.name, context.message.arguments, started,
+                                time.monotonic() - started, chars)
+                return result
+
+        return TrafficCaptureMiddleware()
+
+# 全局录制实例
+traffic_recorder = TrafficRecorder()
+
+def start_traffic_capture() -> Dict[str, Any]:
+    """
+    按配置开始录制工具调用
+
+    Returns:
+        操作结果
+    """
+    try:
+        if not get_config("capture", "enabled", False):
+            return {"status": "disabled", "message": "capture.enabled 未开启"}
+        path = get_config("capture", "path", "mcp_traffic.jsonl.gz")
+        if not os.path.isabs(path):
+            # 相对路径相对于插件目录
+            path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+        traffic_recorder.start(path)
+        return {"status": "success", "path": path}
+    except Exception as e:
+        return {"error": f"启动工具调用录制失败: {e}"}
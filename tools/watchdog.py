@@ -0,0 +1,196 @@
+"""
+进程内健康检查 - 测量 ComfyUI 事件循环延迟、执行线程进度和队列推进情况，取代对自身 HTTP 接口的轮询
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+from .base_tools import tools_base, get_config
+from .events import event_hub, TASK_DONE_EVENT
+from .lock_profiler import queue_lock
+
+# 说明执行线程在推进的消息
+PROGRESS_EVENTS = {
+    "execution_start", "execution_cached", "executing", "executed", "progress",
+    "execution_success", "execution_error", "execution_interrupted", TASK_DONE_EVENT,
+}
+
+class ServerWatchdog:
+    """
+    后台线程定期向服务器事件循环投递探针（call_soon_threadsafe），以探针被执行的延迟作为事件循环延迟；
+    同时订阅服务器消息，记录执行线程最近一次推进的时间
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.started_at: Optional[float] = None
+        # 事件循环探针
+        self._probe_sent: Optional[float] = None
+        self.last_lag: Optional[float] = None
+        self.max_lag = 0.0
+        self.avg_lag: Optional[float] = None
+        self.last_probe_at: Optional[float] = None
+        self.stall_count = 0
+        self._stall_logged = False
+        # 执行进度
+        self.last_progress_at: Optional[float] = None
+        self.last_completed_at: Optional[float] = None
+        self.completed = 0
+
+    def on_event(self, event: str, data: Any, sid: Optional[str] = None):
+        """执行消息说明执行线程在推进"""
+        if event not in PROGRESS_EVENTS:
+            return
+        now = time.monotonic()
+        self.last_progress_at = now
+        if event == TASK_DONE_EVENT:
+            self.last_completed_at = now
+            self.completed += 1
+
+    def _probe_done(self, sent: float):
+        """在事件循环中执行：记录延迟"""
+        lag = time.monotonic() - sent
+        with self._lock:
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.avg_lag = lag if self.avg_lag is None else self.avg_lag * 0.9 + lag * 0.1
+            self.last_probe_at = time.monotonic()
+            if self._probe_sent == sent:
+                self._probe_sent = None
+            if self._stall_logged:
+                self.logger.warning(f"事件循环已恢复，卡顿 {lag:.2f} 秒")
+                self._stall_logged = False
+
+    def _tick(self):
+        prompt_server = tools_base.prompt_server
+        loop = getattr(prompt_server, "loop", None)
+        if loop is None or loop.is_closed():
+            return
+        threshold = get_config("watchdog", "stall_threshold", 2.0)
+        now = time.monotonic()
+        with self._lock:
+            pending_probe = self._probe_sent
+        if pending_probe is not None:
+            # 上一个探针还没执行：事件循环被阻塞
+            stalled_for = now - pending_probe
+            if stalled_for >= threshold and not self._stall_logged:
+                self.stall_count += 1
+                self._stall_logged = True
+                self.logger.warning(f"事件循环已卡顿 {stalled_for:.2f} 秒")
+            return
+        with self._lock:
+            self._probe_sent = now
+        loop.call_soon_threadsafe(self._probe_done, now)
+
+    def _run(self):
+        while not self._stop.wait(get_config("watchdog", "interval", 1.0)):
+            try:
+                self._tick()
+            except Exception as e:
+                self.logger.error(f"健康检查探针失败: {e}")
+
+    def start(self) -> bool:
+        """启动后台探针线程并订阅服务器消息（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        event_hub.add_listener(self.on_event)
+        event_hub.install()
+        self.started_at = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mcp-watchdog", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """停止后台探针线程"""
+        self._stop.set()
+
+    def health(self) -> Dict[str, Any]:
+        """
+        汇总健康状态
+
+        status 为 ok、degraded（事件循环延迟超过阈值的一半，或执行中的任务长时间没有推进）或 stalled（事件循环卡顿）
+        """
+        now = time.monotonic()
+        threshold = get_config("watchdog", "stall_threshold", 2.0)
+        progress_timeout = get_config("watchdog", "progress_timeout", 300.0)
+        prompt_server = tools_base.prompt_server
+
+        with self._lock:
+            probe_age = now - self._probe_sent if self._probe_sent is not None else None
+            loop_info = {
+                "lag_ms": round(self.last_lag * 1000, 3) if self.last_lag is not None else None,
+                "avg_lag_ms": round(self.avg_lag * 1000, 3) if self.avg_lag is not None else None,
+                "max_lag_ms": round(self.max_lag * 1000, 3),
+                "pending_probe_seconds": round(probe_age, 3) if probe_age is not None else None,
+                "stall_count": self.stall_count,
+            }
+        loop_stalled = probe_age is not None and probe_age >= threshold
+
+        executor_info: Dict[str, Any] = {"running": 0, "pending": 0}
+        no_progress = False
+        if prompt_server is not None:
+            prompt_queue = prompt_server.prompt_queue
+            with queue_lock("get_health"):
+                executor_info["running"] = len(prompt_queue.currently_running)
+                executor_info["pending"] = len(prompt_queue.queue)
+            since_progress = now - self.last_progress_at if self.last_progress_at is not None else None
+            executor_info["seconds_since_progress"] = round(since_progress, 3) if since_progress is not None else None
+            executor_info["seconds_since_completion"] = (
+                round(now - self.last_completed_at, 3) if self.last_completed_at is not None else None
+            )
+            executor_info["completed"] = self.completed
+            no_progress = (executor_info["running"] > 0 and since_progress is not None
+                           and since_progress >= progress_timeout)
+            executor_info["stalled"] = no_progress
+
+        if loop_stalled:
+            status = "stalled"
+        elif no_progress or (self.last_lag is not None and self.last_lag >= threshold / 2):
+            status = "degraded"
+        else:
+            status = "ok"
+
+        return {
+            "status": status,
+            "server_running": prompt_server is not None,
+            "server_listening": prompt_server is not None and hasattr(prompt_server, "address"),
+            "watchdog_running": self._thread is not None and self._thread.is_alive(),
+            "uptime_seconds": round(now - self.started_at, 3) if self.started_at is not None else None,
+            "loop": loop_info,
+            "executor": executor_info,
+        }
+
+# 全局健康检查实例
+server_watchdog = ServerWatchdog()
+
+def start_watchdog() -> Dict[str, Any]:
+    """
+    按配置启动进程内健康检查
+
+    Returns:
+        操作结果
+    """
+    try:
+        if not get_config("watchdog", "enabled", True):
+            return {"status": "disabled", "message": "watchdog.enabled 未开启"}
+        server_watchdog.start()
+        return {"status": "success", "message": "健康检查已启动"}
+    except Exception as e:
+        return {"error": f"启动健康检查失败: {e}"}
+
+def get_health() -> Dict[str, Any]:
+    """
+    获取服务器健康状态（进程内检查，不发起 HTTP 请求）
+
+    Returns:
+        总体状态、事件循环延迟、执行线程和队列进度
+    """
+    try:
+        return server_watchdog.health()
+    except Exception as e:
+        return {"error": f"获取健康状态失败: {e}"}
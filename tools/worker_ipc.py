@@ -0,0 +1,262 @@
+"""
+MCP 工作进程通信 - 工具调用的进程内/跨进程两种实现
+
+进程内模式直接调用工具函数；工作进程模式下 ComfyUI 进程只运行一个 RPC 服务端（Unix 套接字），
+FastMCP 的 HTTP/SSE 处理、参数校验和响应序列化都在工作进程中完成，不再与执行线程争用 GIL
+"""
+
+import os
+import sys
+import time
+import atexit
+import asyncio
+import logging
+import secrets
+import tempfile
+import threading
+import subprocess
+from multiprocessing.connection import Listener, Client, Connection
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from .base_tools import lazy_import, get_config
+
+# 工作进程通过环境变量获取套接字路径和认证密钥
+SOCKET_ENV = "COMFYUI_MCP_WORKER_SOCKET"
+AUTHKEY_ENV = "COMFYUI_MCP_WORKER_AUTHKEY"
+
+ProgressReporter = Callable[[float, Optional[float], Optional[str]], Awaitable[None]]
+
+def _scan_templates(full: bool = False) -> Dict[str, List]:
+    """扫描模板目录；full 为真时返回全部模板（重启后的工作进程需要重新注册所有模板工具）"""
+    registry = lazy_import("tools.template_tools").template_registry
+    changes = registry.scan()
+    if full:
+        return {"changed": registry.templates(), "removed": []}
+    return changes
+
+def _internal_methods() -> Dict[str, Callable[..., Any]]:
+    """工具以外、工作进程需要调用的方法"""
+    return {"scan_templates": _scan_templates}
+
+class LocalInvoker:
+    """进程内模式：直接调用 tools 中的函数"""
+
+    def call(self, name: str, *args, **kwargs) -> Any:
+        method = _internal_methods().get(name) or getattr(lazy_import("tools"), name)
+        return method(*args, **kwargs)
+
+    async def call_async(self, name: str, *args, report: Optional[ProgressReporter] = None, **kwargs) -> Any:
+        return await getattr(lazy_import("tools"), name)(*args, report=report, **kwargs)
+
+    def watch_templates(self, on_change: Callable[[Dict[str, List]], None]) -> bool:
+        return lazy_import("tools.template_tools").template_registry.watch(on_change)
+
+class RpcShim:
+    """
+    ComfyUI 进程内的 RPC 服务端：每个连接一个线程，按顺序处理请求
+
+    请求为 (kind, name, args, kwargs)，kind 为 call 或 call_async；
+    响应为 ("result", 值)、("error", 信息)，call_async 执行期间还会发送 ("progress", (进度, 总量, 说明))
+    """
+
+    def __init__(self, path: str, authkey: bytes):
+        self.path = path
+        self.authkey = authkey
+        self.logger = logging.getLogger(__name__)
+        self._listener: Optional[Listener] = None
+        self.stats = {"connections": 0, "calls": 0, "errors": 0}
+
+    def start(self):
+        """开始监听（套接字只允许当前用户访问，连接还需通过 authkey 的 HMAC 认证）"""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._listener = Listener(self.path, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.path, 0o600)
+        threading.Thread(target=self._accept, name="mcp-rpc-shim", daemon=True).start()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _accept(self):
+        while self._listener is not None:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if self._listener is None:
+                    return
+                # 认证失败等单个连接的错误不影响继续监听
+                self.logger.warning(f"RPC 连接被拒绝: {e}")
+                continue
+            self.stats["connections"] += 1
+            threading.Thread(target=self._serve, args=(conn,), name="mcp-rpc-conn", daemon=True).start()
+
+    def _serve(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    kind, name, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                self.stats["calls"] += 1
+                try:
+                    result = self._dispatch(conn, kind, name, args, kwargs)
+                    conn.send(("result", result))
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    try:
+                        conn.send(("error", f"{type(e).__name__}: {e}"))
+                    except (EOFError, OSError):
+                        return
+
+    @staticmethod
+    def _dispatch(conn: Connection, kind: str, name: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        tools = lazy_import("tools")
+        method = _internal_methods().get(name)
+        if method is None:
+            # 只允许调用 tools 公开的函数
+            if name not in tools.__all__:
+                raise AttributeError(f"未知的工具 {name}")
+            method = getattr(tools, name)
+        if kind == "call":
+            return method(*args, **kwargs)
+
+        if kwargs.pop("report", False):
+            async def report(progress: float, total: Optional[float] = None, message: Optional[str] = None):
+                conn.send(("progress", (progress, total, message)))
+            kwargs["report"] = report
+        return asyncio.run(method(*args, **kwargs))
+
+class RpcClient:
+    """工作进程中的 RPC 客户端，接口与 LocalInvoker 相同；连接复用，并发调用各占一个连接"""
+
+    def __init__(self, path: str, authkey: bytes):
+        self.path = path
+        self.authkey = authkey
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._idle: List[Connection] = []
+
+    @classmethod
+    def from_env(cls) -> "RpcClient":
+        return cls(os.environ[SOCKET_ENV], bytes.fromhex(os.environ[AUTHKEY_ENV]))
+
+    def _acquire(self) -> Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return Client(self.path, family="AF_UNIX", authkey=self.authkey)
+
+    def _release(self, conn: Connection):
+        with self._lock:
+            self._idle.append(conn)
+
+    def _request(self, kind: str, name: str, args: tuple, kwargs: Dict[str, Any],
+                 on_progress: Optional[Callable[[tuple], None]] = None) -> Any:
+        # 空闲连接可能已被对端关闭，发送失败时换新连接重试一次
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.send((kind, name, args, kwargs))
+                break
+            except (EOFError, OSError):
+                conn.close()
+                if attempt:
+                    raise
+        try:
+            while True:
+                tag, value = conn.recv()
+                if tag == "progress":
+                    if on_progress is not None:
+                        on_progress(value)
+                    continue
+                self._release(conn)
+                if tag == "error":
+                    return {"error": f"{name} 调用失败: {value}"}
+                return value
+        except BaseException:
+            conn.close()
+            raise
+
+    def call(self, name: str, *args, **kwargs) -> Any:
+        try:
+            return self._request("call", name, args, kwargs)
+        except (EOFError, OSError) as e:
+            return {"error": f"无法连接 ComfyUI 进程: {e}"}
+
+    async def call_async(self, name: str, *args, report: Optional[ProgressReporter] = None, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+
+        def on_progress(value: tuple):
+            asyncio.run_coroutine_threadsafe(report(*value), loop)
+
+        kwargs["report"] = report is not None
+        try:
+            return await asyncio.to_thread(self._request, "call_async", name, args, kwargs,
+                                           on_progress if report is not None else None)
+        except (EOFError, OSError) as e:
+            return {"error": f"无法连接 ComfyUI 进程: {e}"}
+
+    def watch_templates(self, on_change: Callable[[Dict[str, List]], None]) -> bool:
+        """模板目录由 ComfyUI 进程扫描，这里定期拉取变化"""
+        interval = get_config("templates", "poll_interval", 5.0)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                changes = self.call("scan_templates")
+                if isinstance(changes, dict) and (changes.get("changed") or changes.get("removed")):
+                    try:
+                        on_change(changes)
+                    except Exception as e:
+                        self.logger.error(f"更新工作流模板工具失败: {e}")
+
+        threading.Thread(target=run, name="mcp-template-watcher", daemon=True).start()
+        return True
+
+# 工作进程脚本（插件根目录下的 mcp_worker.py）
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp_worker.py")
+
+class McpWorkerSupervisor:
+    """在 ComfyUI 进程内启动 RPC 服务端和 MCP 工作进程，工作进程意外退出时按 mcp.restart_delay 重启"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.path = get_config("mcp", "socket_path", "") or os.path.join(
+            tempfile.mkdtemp(prefix="comfyui-mcp-"), "rpc.sock"
+        )
+        self.authkey = secrets.token_bytes(32)
+        self.shim = RpcShim(self.path, self.authkey)
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self._stopping = False
+
+    def _spawn(self) -> subprocess.Popen:
+        env = dict(os.environ)
+        env[SOCKET_ENV] = self.path
+        env[AUTHKEY_ENV] = self.authkey.hex()
+        return subprocess.Popen([sys.executable, WORKER_SCRIPT], env=env, cwd=os.path.dirname(WORKER_SCRIPT))
+
+    def _supervise(self):
+        delay = get_config("mcp", "restart_delay", 5.0)
+        while not self._stopping:
+            self.process = self._spawn()
+            code = self.process.wait()
+            if self._stopping:
+                return
+            self.restarts += 1
+            self.logger.error(f"MCP 工作进程已退出（返回码 {code}），{delay} 秒后重启")
+            time.sleep(delay)
+
+    def start(self):
+        self.shim.start()
+        atexit.register(self.stop)
+        threading.Thread(target=self._supervise, name="mcp-worker-supervisor", daemon=True).start()
+
+    def stop(self):
+        self._stopping = True
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+        self.shim.stop()
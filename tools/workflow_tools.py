@@ -3,12 +3,85 @@
 """
 
 import json
+import time
+import logging
 import uuid
+import heapq
 import asyncio
-from typing import Dict, Any, Optional
-from .base_tools import tools_base
+from typing import Dict, Any, Optional, List
+from .base_tools import tools_base, lazy_import, get_config
 
-def submit_workflow(workflow_json: str, client_id: Optional[str] = None, prompt_id: Optional[str] = None) -> Dict[str, Any]:
+# 调度、日志、准入等模块在首次调用对应工具时才导入，不拖慢 MCP 启动
+
+def _queue_lock(tool_name: str):
+    """带等待/持有耗时统计的 prompt_queue 锁"""
+    return lazy_import("tools.lock_profiler").queue_lock(tool_name)
+
+def _invalidate_snapshots():
+    """队列变化后让共享快照失效"""
+    lazy_import("tools.queue_snapshot").queue_snapshots.invalidate()
+
+def post_prompt(workflow_data: Dict[str, Any], client_id: Optional[str] = None,
+                prompt_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    把工作流交给ComfyUI的post_prompt入队（不做准入控制、剪除和日志记录）
+    
+    Args:
+        workflow_data: API 格式的工作流
+        client_id: 客户端ID（可选）
+        prompt_id: 提示ID（可选）
+    
+    Returns:
+        ComfyUI的响应字典
+    """
+    # 准备请求数据
+    request_data = {
+        "prompt": workflow_data
+    }
+    
+    if client_id:
+        request_data["client_id"] = client_id
+    
+    if prompt_id:
+        request_data["prompt_id"] = prompt_id
+    
+    # 创建模拟请求对象
+    mock_request = tools_base.create_mock_request(json_data=request_data)
+    
+    # 直接调用ComfyUI的post_prompt方法
+    # 注意：这里需要异步调用，但我们用同步方式包装
+    async def async_submit():
+        try:
+            # 获取post_prompt方法
+            post_prompt_method = tools_base.get_server_method("post_prompt")
+            response = await post_prompt_method(mock_request)
+            
+            # 从响应中提取数据
+            if hasattr(response, 'body'):
+                response_data = json.loads(response.body.decode('utf-8'))
+            else:
+                response_data = response
+            
+            return response_data
+        except Exception as e:
+            return {"error": str(e)}
+    
+    # 运行异步函数 - 使用线程安全的方式
+    try:
+        # 尝试获取当前事件循环
+        loop = asyncio.get_running_loop()
+        # 如果已经有事件循环在运行，使用线程池
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            future = executor.submit(lambda: asyncio.run(async_submit()))
+            return future.result(timeout=30)  # 30秒超时
+    except RuntimeError:
+        # 如果没有事件循环在运行，直接运行
+        return asyncio.run(async_submit())
+
+def submit_workflow(workflow_json: str, client_id: Optional[str] = None, prompt_id: Optional[str] = None,
+                    prune: bool = True, idempotency_key: Optional[str] = None,
+                    reorder: bool = True) -> Dict[str, Any]:
     """
     提交工作流执行请求
     
@@ -16,58 +89,82 @@ def submit_workflow(workflow_json: str, client_id: Optional[str] = None, prompt_
         workflow_json: 工作流JSON字符串
         client_id: 客户端ID（可选）
         prompt_id: 提示ID（可选）
+        prune: 是否在提交前剪除不影响输出节点的节点
+        idempotency_key: 幂等键（可选），相同的键重复提交时返回首次提交的prompt_id；需启用任务日志
+        reorder: 启用模型亲和性调度时是否在入队后重排队列（批量规划已排好顺序的提交传 False）
     
     Returns:
-        包含prompt_id和number的响应字典
+        包含prompt_id和number的响应字典；被准入控制拒绝时包含retry_after（秒）
     """
     try:
+        # 幂等重试（例如客户端超时后重发）直接返回首次提交的任务
+        journal = lazy_import("tools.job_journal").get_job_journal()
+        if idempotency_key and journal is None:
+            # 幂等键依赖任务日志去重，未启用时拒绝提交，避免客户端误以为重试是安全的
+            return {"error": "idempotency_key 需要启用任务日志（config.json 中 journal.enabled）"}
+        if idempotency_key:
+            existing = journal.lookup(idempotency_key)
+            if existing:
+                return {"prompt_id": existing, "duplicate": True}
+        
         # 解析工作流JSON
         workflow_data = json.loads(workflow_json)
         
-        # 准备请求数据
-        request_data = {
-            "prompt": workflow_data
-        }
+        # 图分析：剪除不会影响输出的节点，提前发现环和悬空连线
+        graph_report = None
+        if prune:
+            workflow_data, analysis = lazy_import("tools.graph_tools").prune_graph(workflow_data)
+            if analysis["output_nodes"] and not analysis["valid"]:
+                return {"error": "工作流图存在环或悬空连线", "graph_analysis": analysis}
+            graph_report = {
+                "pruned_nodes": analysis["pruned_nodes"],
+                "node_count": analysis["node_count"] - len(analysis["pruned_nodes"]),
+            }
         
-        if client_id:
-            request_data["client_id"] = client_id
+        # 准入控制：队列饱和或客户端超出速率时直接拒绝，附带 retry_after
+        # 放在解析和图校验之后，格式错误的提交不消耗客户端的速率令牌
+        rejection = lazy_import("tools.admission").admission_controller.admit(client_id)
+        if rejection is not None:
+            return rejection
+        
+        # 预写日志：先生成prompt_id并落盘，ComfyUI重启后可以用同一ID重新入队
+        if journal is not None:
+            prompt_id = prompt_id or str(uuid.uuid4())
+            existing = journal.record_submit(prompt_id, workflow_data, client_id, idempotency_key)
+            if existing:
+                return {"prompt_id": existing, "duplicate": True}
+        
+        try:
+            result = post_prompt(workflow_data, client_id, prompt_id)
+        except Exception:
+            # 超时等情况下无法确定任务是否已入队：未入队的释放幂等键，已入队的保留（重启后也不会重放）
+            if journal is not None:
+                journal.resolve_unknown(prompt_id)
+            raise
         
-        if prompt_id:
-            request_data["prompt_id"] = prompt_id
+        if journal is not None and not (isinstance(result, dict) and result.get("prompt_id")):
+            journal.record_failed(prompt_id)
         
-        # 创建模拟请求对象
-        mock_request = tools_base.create_mock_request(json_data=request_data)
+        if graph_report is not None and isinstance(result, dict):
+            result["graph_analysis"] = graph_report
         
-        # 直接调用ComfyUI的post_prompt方法
-        # 注意：这里需要异步调用，但我们用同步方式包装
-        async def async_submit():
+        if isinstance(result, dict) and result.get("prompt_id"):
+            # 新任务入队后让共享快照失效，提交后立即轮询队列也能看到该任务
+            _invalidate_snapshots()
+            
+            # 登记任务，供进度跟踪显示节点类型；任务已经入队，登记失败只记录日志
             try:
-                # 获取post_prompt方法
-                post_prompt_method = tools_base.get_server_method("post_prompt")
-                response = await post_prompt_method(mock_request)
-                
-                # 从响应中提取数据
-                if hasattr(response, 'body'):
-                    response_data = json.loads(response.body.decode('utf-8'))
-                else:
-                    response_data = response
-                
-                return response_data
+                lazy_import("tools.progress_tools").progress_tracker.watch(result["prompt_id"], workflow_data)
             except Exception as e:
-                return {"error": str(e)}
-        
-        # 运行异步函数 - 使用线程安全的方式
-        try:
-            # 尝试获取当前事件循环
-            loop = asyncio.get_running_loop()
-            # 如果已经有事件循环在运行，使用线程池
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(lambda: asyncio.run(async_submit()))
-                result = future.result(timeout=30)  # 30秒超时
-        except RuntimeError:
-            # 如果没有事件循环在运行，直接运行
-            result = asyncio.run(async_submit())
+                logging.getLogger(__name__).warning(f"登记任务进度跟踪失败: {e}")
+            
+            # 启用模型亲和性调度时，新任务入队后在公平窗口内重排
+            # 任务已经入队，重排失败只记录日志，不能让客户端以为提交失败而重复提交
+            if reorder and get_config("scheduler", "model_affinity", False):
+                try:
+                    lazy_import("tools.scheduler_tools").model_scheduler.reorder()
+                except Exception as e:
+                    logging.getLogger(__name__).warning(f"提交后按模型重排队列失败: {e}")
         
         return result
         
@@ -76,12 +173,15 @@ def submit_workflow(workflow_json: str, client_id: Optional[str] = None, prompt_
     except Exception as e:
         return {"error": f"提交工作流失败: {e}"}
 
-def get_queue_info() -> Dict[str, Any]:
+def get_queue_info(since_version: Optional[str] = None) -> Dict[str, Any]:
     """
     获取队列信息
     
+    Args:
+        since_version: 上次响应中的version（可选），提供时只返回此后的队列变化
+    
     Returns:
-        队列状态信息
+        队列状态信息，附带version字段
     """
     try:
         # 直接调用ComfyUI的get_queue_info方法
@@ -90,10 +190,18 @@ def get_queue_info() -> Dict[str, Any]:
         
         # 直接调用PromptServer的get_queue_info方法
         queue_info = tools_base.prompt_server.get_queue_info()
+        # 运行中/等待中任务来自共享快照，并发轮询不会各自锁定prompt_queue
+        queue_info.update(lazy_import("tools.queue_snapshot").queue_snapshot_response(since_version))
         return queue_info
     except Exception as e:
         return {"error": f"获取队列信息失败: {e}"}
 
+def _journal_deleted(prompt_ids: List[str]):
+    """被删除的任务不再在重启后重放"""
+    journal = lazy_import("tools.job_journal").get_job_journal()
+    if journal is not None:
+        journal.mark_finished(prompt_ids, "deleted")
+
 def clear_queue() -> Dict[str, str]:
     """
     清除队列中的所有任务
@@ -107,7 +215,12 @@ def clear_queue() -> Dict[str, str]:
             return {"error": "ComfyUI服务器未启动"}
         
         # 直接调用prompt_queue的wipe_queue方法
-        tools_base.prompt_server.prompt_queue.wipe_queue()
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        with _queue_lock("clear_queue"):
+            queued = [item[1] for item in prompt_queue.queue]
+            prompt_queue.wipe_queue()
+        _invalidate_snapshots()
+        _journal_deleted(queued)
         return {"status": "success", "message": "队列已清除"}
         
     except Exception as e:
@@ -132,8 +245,11 @@ def delete_queue_item(prompt_id: str) -> Dict[str, str]:
         delete_func = lambda a: a[1] == prompt_id
         
         # 直接调用prompt_queue的delete_queue_item方法
-        result = tools_base.prompt_server.prompt_queue.delete_queue_item(delete_func)
+        with _queue_lock("delete_queue_item"):
+            result = tools_base.prompt_server.prompt_queue.delete_queue_item(delete_func)
         if result:
+            _invalidate_snapshots()
+            _journal_deleted([prompt_id])
             return {"status": "success", "message": f"任务 {prompt_id} 已删除"}
         else:
             return {"error": f"任务 {prompt_id} 不存在或删除失败"}
@@ -141,6 +257,63 @@ def delete_queue_item(prompt_id: str) -> Dict[str, str]:
     except Exception as e:
         return {"error": f"删除任务失败: {e}"}
 
+def delete_queue_items(prompt_ids: Optional[List[str]] = None, client_id: Optional[str] = None,
+                       older_than: Optional[float] = None) -> Dict[str, Any]:
+    """
+    批量删除队列中等待的任务（一次加锁、一次遍历）
+    
+    Args:
+        prompt_ids: 要删除的任务ID列表（可选）
+        client_id: 只删除该客户端提交的任务（可选）
+        older_than: 只删除入队超过该秒数的任务（可选，依赖extra_data中的create_time）
+    
+    Returns:
+        操作结果，包含被删除的任务ID
+    """
+    try:
+        if tools_base.prompt_server is None:
+            return {"error": "ComfyUI服务器未启动"}
+        
+        if prompt_ids is None and not client_id and older_than is None:
+            return {"error": "至少需要提供 prompt_ids、client_id 或 older_than 之一"}
+        
+        targets = set(prompt_ids) if prompt_ids is not None else None
+        created_before = (time.time() - older_than) * 1000 if older_than is not None else None
+        
+        def matches(item) -> bool:
+            extra_data = item[3] if len(item) > 3 and isinstance(item[3], dict) else {}
+            if targets is not None and item[1] not in targets:
+                return False
+            if client_id and extra_data.get("client_id") != client_id:
+                return False
+            if created_before is not None:
+                create_time = extra_data.get("create_time")
+                if create_time is None or create_time >= created_before:
+                    return False
+            return True
+        
+        prompt_queue = tools_base.prompt_server.prompt_queue
+        with _queue_lock("delete_queue_items"):
+            kept, removed = [], []
+            for item in prompt_queue.queue:
+                (removed if matches(item) else kept).append(item)
+            if removed:
+                heapq.heapify(kept)
+                prompt_queue.queue = kept
+                prompt_queue.server.queue_updated()
+        
+        if removed:
+            _invalidate_snapshots()
+            _journal_deleted([item[1] for item in removed])
+        return {
+            "status": "success",
+            "deleted": [item[1] for item in removed],
+            "message": f"已删除 {len(removed)} 个任务",
+        }
+        
+    except Exception as e:
+        return {"error": f"批量删除任务失败: {e}"}
+
 def interrupt_processing() -> Dict[str, str]:
     """
     中断当前处理
@@ -150,7 +323,7 @@ def interrupt_processing() -> Dict[str, str]:
     """
     try:
         # 直接调用ComfyUI的nodes.interrupt_processing方法
-        import nodes
+        nodes = lazy_import("nodes")
         nodes.interrupt_processing()
         return {"status": "success", "message": "处理已中断"}
         
@@ -170,17 +343,21 @@ def free_memory(unload_models: bool = False, free_memory_param: bool = False) ->
     """
     try:
         # 直接调用ComfyUI的内存释放功能
-        import nodes
+        nodes = lazy_import("nodes")
         
         if unload_models:
-            # 卸载模型
-            nodes.unload_all_models()
+            # 卸载模型（nodes 未提供时使用 comfy.model_management 的实现）
+            unload_all_models = getattr(nodes, "unload_all_models", None)
+            if unload_all_models is None:
+                unload_all_models = lazy_import("comfy.model_management").unload_all_models
+            unload_all_models()
         
         if free_memory_param:
             # 释放内存
             import gc
             gc.collect()
-            import torch
+            # torch 导入开销大，仅在真正需要释放显存时才加载
+            torch = lazy_import("torch")
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
         
@@ -1,7 +1,74 @@
 import json
 import os
+import hashlib
 import logging
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# 已解析的 workflow 缓存: 路径 -> ((mtime_ns, size), 内容哈希, 解析结果)
+# 文件的修改时间和大小都未变化时直接复用，不再重复读取和解析
+_workflow_cache: Dict[str, Tuple[Tuple[int, int], str, Optional[Any]]] = {}
+_workflow_cache_lock = threading.Lock()
+
+def resolve_workflow_path(workflow_file: str) -> str:
+    """workflow 文件路径相对于插件目录解析"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, workflow_file)
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def get_workflow_hash(path: str) -> str:
+    """
+    获取 workflow 文件的内容哈希（按 mtime+size 缓存，未变化时不重新读取文件）
+
+    Args:
+        path: workflow 文件路径
+
+    Returns:
+        文件内容的 sha256
+    """
+    signature = _file_signature(path)
+    with _workflow_cache_lock:
+        cached = _workflow_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    with _workflow_cache_lock:
+        # 只记录哈希，解析推迟到 load_cached_workflow 真正需要时
+        _workflow_cache[path] = (signature, digest, None)
+    return digest
+
+def load_cached_workflow(path: str) -> Tuple[Any, str]:
+    """
+    读取并解析 workflow 文件，文件未变化时返回缓存的解析结果
+
+    Args:
+        path: workflow 文件路径
+
+    Returns:
+        (解析后的 workflow, 内容哈希)
+
+    Raises:
+        json.JSONDecodeError: 文件不是合法的 JSON
+    """
+    signature = _file_signature(path)
+    with _workflow_cache_lock:
+        cached = _workflow_cache.get(path)
+        if cached is not None and cached[0] == signature and cached[2] is not None:
+            return cached[2], cached[1]
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    workflow_data = json.loads(content.decode('utf-8'))
+    with _workflow_cache_lock:
+        _workflow_cache[path] = (signature, digest, workflow_data)
+    return workflow_data, digest
 
 class WorkflowLoader:
     """
@@ -49,9 +116,7 @@ class WorkflowLoader:
             if auto_load == "disable":
                 return ("Workflow loading disabled",)
             
-            # 获取当前文件所在目录
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            workflow_path = os.path.join(current_dir, workflow_file)
+            workflow_path = resolve_workflow_path(workflow_file)
             
             # 检查 workflow 文件是否存在
             if not os.path.exists(workflow_path):
@@ -59,10 +124,12 @@ class WorkflowLoader:
                 self.logger.error(error_msg)
                 return (f"❌ {error_msg}",)
             
-            # 读取 workflow 文件
+            # 读取 workflow 文件（文件未变化时复用缓存的解析结果）
             try:
-                with open(workflow_path, 'r', encoding='utf-8') as f:
-                    workflow_data = json.load(f)
+                if force_reload == "enable":
+                    with _workflow_cache_lock:
+                        _workflow_cache.pop(workflow_path, None)
+                workflow_data, _ = load_cached_workflow(workflow_path)
                 
                 # 这里可以添加 workflow 加载逻辑
                 # 例如：发送到 ComfyUI 的 API 或存储到全局变量中
@@ -89,10 +156,19 @@ class WorkflowLoader:
     def IS_CHANGED(s, auto_load, workflow_file, force_reload="disable"):
         """
         控制节点何时重新执行
+
+        返回文件内容哈希，只有文件内容变化时节点才会重新执行；
+        force_reload 时返回 NaN（NaN 与自身不相等），每次都重新执行
         """
         if force_reload == "enable":
-            return "force_reload"
-        return ""
+            return float("nan")
+        if auto_load == "disable":
+            return ""
+        try:
+            return get_workflow_hash(resolve_workflow_path(workflow_file))
+        except OSError:
+            # 文件不存在时交给 load_workflow 报告错误
+            return "missing"
 
 # 创建节点映射
 NODE_CLASS_MAPPINGS = {